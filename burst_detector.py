@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+關鍵字爆量偵測 - 依類別維護每小時關鍵字/Cashtag 計數
+以 EWMA 滾動基準計算當前時段的 z-score，找出真正異常的熱門話題；
+輪替爬蟲每天只爬部分類別，基準只取該類別有被爬取的日期，避免類別輪替進來就被當成爆量
+"""
+
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional
+from keyword_tokenizer import extract_tokens
+
+HOUR_FORMAT = '%Y-%m-%dT%H'
+
+
+def hour_bucket(created_at: Optional[str]) -> Optional[str]:
+    """將推文時間轉為小時桶鍵值 (YYYY-MM-DDTHH)"""
+    if not created_at or len(created_at) < 13:
+        return None
+    return created_at[:13]
+
+
+class KeywordBurstDetector:
+    def __init__(self, retention_hours: int = 7 * 24, alpha: float = 0.1, min_variance: float = 1.0):
+        """
+        初始化爆量偵測器
+
+        Args:
+            retention_hours: 保留的小時桶數量（同時是基準的最長回溯範圍）
+            alpha: EWMA 平滑係數，越大越重視近期
+            min_variance: 基準變異數下限，避免新詞因變異數為0而得到無限大的分數
+        """
+        self.retention_hours = retention_hours
+        self.alpha = alpha
+        self.min_variance = min_variance
+        # hour -> {'categories': {category: {token: count}}, 'ids': {category: [tweet_id, ...]}}
+        self.hours: Dict[str, Dict[str, Any]] = {}
+
+    def ingest_tweets(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        爬取時逐條更新每小時計數（同一條推文在同一類別只計算一次；
+        被多個類別查詢到的推文在各類別各計一次，與關鍵字熱度草圖一致）
+
+        Returns:
+            新增的推文數量
+        """
+        seen = {(category, tweet_id) for bucket in self.hours.values()
+                for category, ids in bucket['ids'].items() for tweet_id in ids}
+        tweet_hours = [hour_bucket(tweet.get('created_at')) for tweets in tweets_data.values() for tweet in tweets]
+        known_hours = [hour for hour in tweet_hours if hour] + list(self.hours)
+        if not known_hours:
+            return 0
+        cutoff = self._cutoff(max(known_hours))
+
+        added = 0
+        for category, tweets in tweets_data.items():
+            for tweet in tweets:
+                hour = hour_bucket(tweet.get('created_at'))
+                tweet_id = str(tweet.get('tweet_id', ''))
+                if hour is None or hour < cutoff or (category, tweet_id) in seen:
+                    continue
+
+                bucket = self.hours.setdefault(hour, {'categories': {}, 'ids': {}})
+                counts = bucket['categories'].setdefault(category, {})
+                for token in set(extract_tokens(tweet.get('text', ''))):
+                    counts[token] = counts.get(token, 0) + 1
+                bucket['ids'].setdefault(category, []).append(tweet_id)
+                seen.add((category, tweet_id))
+                added += 1
+
+        self.prune()
+        return added
+
+    def _cutoff(self, latest_hour: str) -> str:
+        """保留範圍內最早的小時桶"""
+        latest = datetime.strptime(latest_hour, HOUR_FORMAT)
+        return (latest - timedelta(hours=self.retention_hours - 1)).strftime(HOUR_FORMAT)
+
+    def prune(self):
+        """清除超過保留範圍的小時桶"""
+        if not self.hours:
+            return
+        cutoff = self._cutoff(max(self.hours))
+        self.hours = {hour: bucket for hour, bucket in self.hours.items() if hour >= cutoff}
+
+    def detect_bursts(self, current_hours: int = 1, now: Optional[str] = None, top_n: int = 10,
+                      min_count: int = 3, min_score: float = 3.0, cashtags_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        偵測當前時段的爆量關鍵字（各類別分別與自己的基準比較）
+
+        Args:
+            current_hours: 當前時段包含的小時數
+            now: 當前時段最後一個小時 (YYYY-MM-DDTHH，UTC，與推文時間一致)，預設為目前時間
+            top_n: 回傳數量
+            min_count: 當前時段最少出現次數
+            min_score: 最低 z-score
+            cashtags_only: 只回傳 Cashtag
+
+        Returns:
+            依 z-score 排序的列表，每項包含 token、category、count、baseline、score
+        """
+        if not self.hours:
+            return []
+
+        end = datetime.strptime(now, HOUR_FORMAT) if now else datetime.now(timezone.utc).replace(tzinfo=None)
+        end = end.replace(minute=0, second=0, microsecond=0)
+        current = [(end - timedelta(hours=i)).strftime(HOUR_FORMAT) for i in range(current_hours)]
+        baseline = []
+        hour = end - timedelta(hours=self.retention_hours - 1)
+        while hour <= end - timedelta(hours=current_hours):
+            baseline.append(hour.strftime(HOUR_FORMAT))
+            hour += timedelta(hours=1)
+
+        # 類別有推文的日期視為當天有爬取該類別（HOUR_FORMAT 前10字為日期）
+        crawled_days: Dict[str, set] = {}
+        for hour_key, bucket in self.hours.items():
+            for category in bucket['categories']:
+                crawled_days.setdefault(category, set()).add(hour_key[:10])
+
+        empty: Dict[str, int] = {}
+        bursts = []
+        for category, days in crawled_days.items():
+            current_counts: Dict[str, int] = {}
+            for hour_key in current:
+                for token, count in self.hours.get(hour_key, {}).get('categories', {}).get(category, {}).items():
+                    current_counts[token] = current_counts.get(token, 0) + count
+
+            # 只與該類別有被爬取的日期比較；沒有可比較的日期時無法判斷
+            baseline_counts = [self.hours.get(hour_key, {}).get('categories', {}).get(category, empty)
+                               for hour_key in baseline if hour_key[:10] in days]
+            if not current_counts or not baseline_counts:
+                continue
+
+            for token, count in current_counts.items():
+                if count < min_count or (cashtags_only and not token.startswith('$')):
+                    continue
+
+                # 以每小時計數的 EWMA 作為基準，時段有多小時則按比例放大
+                mean, variance = 0.0, 0.0
+                for counts in baseline_counts:
+                    value = counts.get(token, 0)
+                    diff = value - mean
+                    mean += self.alpha * diff
+                    variance = (1 - self.alpha) * (variance + self.alpha * diff * diff)
+
+                expected = mean * current_hours
+                spread = math.sqrt(max(variance, self.min_variance) * current_hours)
+                score = (count - expected) / spread
+                if score >= min_score:
+                    bursts.append({
+                        'token': token,
+                        'category': category,
+                        'count': count,
+                        'baseline': round(expected, 2),
+                        'score': round(score, 2)
+                    })
+
+        bursts.sort(key=lambda item: item['score'], reverse=True)
+        return bursts[:top_n]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'retention_hours': self.retention_hours,
+            'alpha': self.alpha,
+            'min_variance': self.min_variance,
+            'hours': self.hours
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KeywordBurstDetector':
+        detector = cls(data['retention_hours'], data['alpha'], data['min_variance'])
+        detector.hours = data['hours']
+        return detector
+
+    def save(self, path: str = 'keyword_burst_state.json'):
+        """保存每小時計數"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = 'keyword_burst_state.json', **kwargs) -> 'KeywordBurstDetector':
+        """載入每小時計數，檔案不存在時建立新的偵測器"""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
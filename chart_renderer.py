@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+無頭圖表渲染 - 使用 Agg 畫布直接輸出 PNG，不呼叫 plt.show()
+每張圖在常駐的工作行程池中平行渲染，工作行程快取圖表模板，跨次呼叫重複使用
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+CHART_TITLES = {
+    'category_counts': '各類別推文數量',
+    'engagement_scatter': '互動度分布',
+    'category_engagement': '各類別平均互動度',
+    'verified_ratio': '各類別認證用戶比例'
+}
+
+# 總覽圖的 2x2 排列順序
+OVERVIEW_KINDS = ['category_counts', 'engagement_scatter', 'category_engagement', 'verified_ratio']
+
+# 工作行程的啟動方式：呼叫端可能是多執行緒行程（排程器 fork 出的流程執行緒），
+# fork 會複製其他執行緒持有的鎖而卡住，因此改由 forkserver（不支援時 spawn）啟動
+_MP_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# 每個工作行程內的圖表模板快取：kind -> (Figure, Axes)
+_figure_cache: Dict[str, Tuple[Figure, Any]] = {}
+
+# 常駐工作行程池（跨 render_all 呼叫沿用，模板快取才有效）
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """取得常駐工作行程池，需要的行程數改變時重建"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown()
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_MP_START_METHOD))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_pool():
+    """關閉常駐工作行程池（程式結束時自動呼叫）"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor, _executor_workers = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _get_axes(kind: str, figsize: Tuple[float, float] = (8, 6)):
+    """取得快取的圖表模板並清空內容"""
+    cached = _figure_cache.get(kind)
+    if cached is None:
+        fig = Figure(figsize=figsize, layout='tight')
+        FigureCanvasAgg(fig)
+        cached = _figure_cache[kind] = (fig, fig.add_subplot(111))
+    fig, ax = cached
+    ax.clear()
+    return fig, ax
+
+
+def bin_scatter(x: np.ndarray, y: np.ndarray, max_points: int, bins: int = 60) -> Dict[str, List[float]]:
+    """
+    大量數據點時，改以對數座標的二維分箱表示
+
+    Returns:
+        包含 x、y、size 的字典；未超過 max_points 時 size 為空
+    """
+    if len(x) <= max_points:
+        return {'x': x.tolist(), 'y': y.tolist(), 'size': []}
+
+    # log 座標無法顯示0，統一平移1
+    log_x, log_y = np.log10(x + 1), np.log10(y + 1)
+    counts, x_edges, y_edges = np.histogram2d(log_x, log_y, bins=bins)
+    x_index, y_index = np.nonzero(counts)
+    x_centers = 10 ** ((x_edges[x_index] + x_edges[x_index + 1]) / 2) - 1
+    y_centers = 10 ** ((y_edges[y_index] + y_edges[y_index + 1]) / 2) - 1
+    return {'x': x_centers.tolist(), 'y': y_centers.tolist(), 'size': counts[x_index, y_index].tolist()}
+
+
+def prepare_chart_payloads(df: pd.DataFrame, max_points: int = 5000) -> Dict[str, Dict[str, Any]]:
+    """在主行程先做完彙總，只把少量數據傳給工作行程"""
+    category_counts = df['category'].value_counts()
+    engagement = df.groupby('category', observed=True)[['like_count', 'retweet_count', 'reply_count']].mean()
+    verified_ratio = df.groupby('category', observed=True)['verified'].mean() * 100
+
+    scatter = bin_scatter(df['like_count'].to_numpy(dtype=float), df['retweet_count'].to_numpy(dtype=float), max_points)
+    if not scatter['size']:
+        scatter['colors'] = pd.Categorical(df['category']).codes.tolist()
+
+    return {
+        'category_counts': {'labels': [str(c) for c in category_counts.index], 'values': category_counts.values.tolist()},
+        'engagement_scatter': scatter,
+        'category_engagement': {
+            'labels': [str(c) for c in engagement.index],
+            'likes': engagement['like_count'].tolist(),
+            'retweets': engagement['retweet_count'].tolist(),
+            'replies': engagement['reply_count'].tolist()
+        },
+        'verified_ratio': {'labels': [str(c) for c in verified_ratio.index], 'values': verified_ratio.fillna(0).tolist()}
+    }
+
+
+def draw_chart(ax, kind: str, payload: Dict[str, Any]):
+    """在指定的座標軸上繪製單一圖表"""
+    if kind == 'category_counts':
+        positions = range(len(payload['values']))
+        ax.bar(positions, payload['values'])
+        ax.set_xticks(positions)
+        ax.set_xticklabels(payload['labels'], rotation=45, ha='right')
+        ax.set_ylabel('推文數')
+    elif kind == 'engagement_scatter':
+        if payload['size']:
+            # 分箱後以點的大小表示該格的推文數
+            sizes = np.sqrt(np.asarray(payload['size'])) * 4
+            ax.scatter(payload['x'], payload['y'], s=sizes, alpha=0.6)
+        else:
+            ax.scatter(payload['x'], payload['y'], alpha=0.6, c=payload.get('colors'))
+        ax.set_xlabel('讚數')
+        ax.set_ylabel('轉推數')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+    elif kind == 'category_engagement':
+        positions = range(len(payload['labels']))
+        width = 0.25
+        ax.bar([x - width for x in positions], payload['likes'], width, label='平均讚數', alpha=0.8)
+        ax.bar(positions, payload['retweets'], width, label='平均轉推數', alpha=0.8)
+        ax.bar([x + width for x in positions], payload['replies'], width, label='平均回復數', alpha=0.8)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(payload['labels'], rotation=45, ha='right')
+        ax.legend()
+        ax.set_ylabel('互動次數')
+    elif kind == 'verified_ratio':
+        if sum(payload['values']) > 0:
+            ax.pie(payload['values'], labels=payload['labels'], autopct='%1.1f%%', startangle=90)
+    else:
+        raise ValueError(f"未知的圖表類型: {kind}")
+    ax.set_title(CHART_TITLES[kind])
+
+
+def render_chart(kind: str, payload: Dict[str, Any], path: str, dpi: int = 100) -> Tuple[str, float]:
+    """渲染單張圖表並保存（工作行程入口）"""
+    start = time.perf_counter()
+    fig, ax = _get_axes(kind)
+    draw_chart(ax, kind, payload)
+    fig.savefig(path, dpi=dpi)
+    return path, time.perf_counter() - start
+
+
+def draw_overview(fig, payloads: Dict[str, Dict[str, Any]]):
+    """在指定的 Figure 上以 2x2 排列繪製總覽圖"""
+    fig.suptitle('Web3 Twitter 趨勢分析', fontsize=16, fontweight='bold')
+    for ax, kind in zip(fig.subplots(2, 2).flat, OVERVIEW_KINDS):
+        draw_chart(ax, kind, payloads[kind])
+
+
+def render_overview(payloads: Dict[str, Dict[str, Any]], path: str, dpi: int = 300) -> Tuple[str, float]:
+    """以 Agg 畫布渲染 2x2 總覽圖並保存，不經過 pyplot，不受目前後端影響"""
+    start = time.perf_counter()
+    fig = Figure(figsize=(15, 12), layout='tight')
+    FigureCanvasAgg(fig)
+    draw_overview(fig, payloads)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return path, time.perf_counter() - start
+
+
+def render_all(payloads: Dict[str, Dict[str, Any]], output_dir: str = 'charts', dpi: int = 100,
+               workers: Optional[int] = None, prefix: str = 'web3_') -> Dict[str, Dict[str, Any]]:
+    """
+    平行渲染所有圖表
+
+    Args:
+        payloads: prepare_chart_payloads 的輸出
+        output_dir: 輸出目錄
+        dpi: 圖片解析度
+        workers: 工作行程數量，1 表示在目前行程內依序渲染（同樣沿用模板快取）
+        prefix: 檔名前綴
+
+    Returns:
+        kind -> {'path': 檔案路徑, 'seconds': 渲染秒數}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(kind, payload, os.path.join(output_dir, f"{prefix}{kind}.png")) for kind, payload in payloads.items()]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+
+    if workers <= 1:
+        results = [render_chart(kind, payload, path, dpi) for kind, payload, path in jobs]
+    else:
+        executor = _get_executor(workers)
+        futures = [executor.submit(render_chart, kind, payload, path, dpi) for kind, payload, path in jobs]
+        results = [future.result() for future in futures]
+
+    return {kind: {'path': path, 'seconds': seconds} for (kind, _, _), (path, seconds) in zip(jobs, results)}
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Cashtag/Hashtag 共現圖 - 按日期分桶的稀疏共現矩陣
+爬取時增量更新，可快速查詢某個標籤的關聯標籤與聯動資產群集
+"""
+
+import json
+import os
+from typing import Dict, List, Any, Optional, Tuple
+from keyword_tokenizer import extract_tokens
+
+
+def extract_tags(text: str) -> List[str]:
+    """提取推文中的 Cashtag 與 Hashtag（已轉為大寫並去重）"""
+    return sorted({token for token in extract_tokens(text) if token[0] in '$#' and len(token) > 1})
+
+
+class CooccurrenceGraph:
+    def __init__(self, retention_days: Optional[int] = 90):
+        """
+        初始化共現圖
+
+        Args:
+            retention_days: 保留最近幾天的桶，None 表示不清除
+        """
+        self.retention_days = retention_days
+        # day -> {'nodes': {tag: count}, 'edges': {tag: {other: count}}, 'ids': {tweet_id, ...}}
+        self.days: Dict[str, Dict[str, Any]] = {}
+
+    def _bucket(self, day: str) -> Dict[str, Any]:
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = {'nodes': {}, 'edges': {}, 'ids': set()}
+        return bucket
+
+    def add_tweet(self, day: str, tags: List[str], tweet_id: Optional[str] = None) -> bool:
+        """
+        加入一條推文的標籤
+
+        Returns:
+            是否有更新（同一條推文只計算一次）
+        """
+        bucket = self._bucket(day)
+        if tweet_id is not None:
+            if tweet_id in bucket['ids']:
+                return False
+            bucket['ids'].add(tweet_id)
+
+        nodes, edges = bucket['nodes'], bucket['edges']
+        for tag in tags:
+            nodes[tag] = nodes.get(tag, 0) + 1
+        # 只記錄同一推文內的標籤配對，成本與每條推文的標籤數平方成正比（通常很小）
+        for i, tag in enumerate(tags):
+            for other in tags[i + 1:]:
+                tag_edges, other_edges = edges.setdefault(tag, {}), edges.setdefault(other, {})
+                tag_edges[other] = tag_edges.get(other, 0) + 1
+                other_edges[tag] = other_edges.get(tag, 0) + 1
+        return True
+
+    def ingest_tweets(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """爬取時增量更新（依推文建立日期分桶）"""
+        added = 0
+        for tweets in tweets_data.values():
+            for tweet in tweets:
+                tags = extract_tags(tweet.get('text', ''))
+                if not tags:
+                    continue
+                day = (tweet.get('created_at') or '')[:10] or 'unknown'
+                tweet_id = str(tweet['tweet_id']) if tweet.get('tweet_id') is not None else None
+                if self.add_tweet(day, tags, tweet_id):
+                    added += 1
+        self.prune()
+        return added
+
+    def prune(self):
+        """清除超過保留天數的桶"""
+        if not self.retention_days:
+            return
+        keep = set(sorted(self.days)[-self.retention_days:])
+        self.days = {day: bucket for day, bucket in self.days.items() if day in keep}
+
+    def _window(self, start: Optional[str], end: Optional[str]) -> List[Dict[str, Any]]:
+        return [
+            bucket for day, bucket in self.days.items()
+            if (start is None or day >= start) and (end is None or day <= end)
+        ]
+
+    def top_neighbours(self, tag: str, k: int = 10, start: Optional[str] = None,
+                       end: Optional[str] = None, min_count: int = 2) -> List[Dict[str, Any]]:
+        """
+        查詢與某標籤最常一起出現的標籤
+
+        Args:
+            tag: 標籤（例如 $ETH、#DEFI，不分大小寫）
+            k: 回傳數量
+            start: 起始日期 (YYYY-MM-DD，含)
+            end: 結束日期 (YYYY-MM-DD，含)
+            min_count: 最少共現次數
+
+        Returns:
+            依共現次數排序的列表，每項包含 tag、count、jaccard
+        """
+        tag = tag.upper()
+        window = self._window(start, end)
+        tag_count = sum(bucket['nodes'].get(tag, 0) for bucket in window)
+        if not tag_count:
+            return []
+
+        counts: Dict[str, int] = {}
+        for bucket in window:
+            for other, count in bucket['edges'].get(tag, {}).items():
+                counts[other] = counts.get(other, 0) + count
+
+        neighbours = []
+        for other, count in counts.items():
+            if count < min_count:
+                continue
+            other_count = sum(bucket['nodes'].get(other, 0) for bucket in window)
+            neighbours.append({
+                'tag': other,
+                'count': count,
+                'jaccard': round(count / (tag_count + other_count - count), 3)
+            })
+        neighbours.sort(key=lambda item: (item['count'], item['jaccard']), reverse=True)
+        return neighbours[:k]
+
+    def related_clusters(self, start: Optional[str] = None, end: Optional[str] = None, min_count: int = 3,
+                         min_jaccard: float = 0.2, min_size: int = 2) -> List[List[Tuple[str, int]]]:
+        """
+        找出經常一起出現的標籤群集（聯動資產）
+
+        只走訪現有的邊，以聯集-查找合併強關聯的標籤
+
+        Returns:
+            依總出現次數排序的群集，每個群集為 [(標籤, 出現次數), ...]
+        """
+        window = self._window(start, end)
+        node_counts: Dict[str, int] = {}
+        edge_counts: Dict[Tuple[str, str], int] = {}
+        for bucket in window:
+            for tag, count in bucket['nodes'].items():
+                node_counts[tag] = node_counts.get(tag, 0) + count
+            for tag, neighbours in bucket['edges'].items():
+                for other, count in neighbours.items():
+                    if tag < other:
+                        edge_counts[(tag, other)] = edge_counts.get((tag, other), 0) + count
+
+        parent = {tag: tag for tag in node_counts}
+
+        def find(tag: str) -> str:
+            while parent[tag] != tag:
+                parent[tag] = parent[parent[tag]]
+                tag = parent[tag]
+            return tag
+
+        for (tag, other), count in edge_counts.items():
+            jaccard = count / (node_counts[tag] + node_counts[other] - count)
+            if count >= min_count and jaccard >= min_jaccard:
+                parent[find(other)] = find(tag)
+
+        groups: Dict[str, List[Tuple[str, int]]] = {}
+        for tag, count in node_counts.items():
+            groups.setdefault(find(tag), []).append((tag, count))
+
+        clusters = [sorted(group, key=lambda item: item[1], reverse=True) for group in groups.values() if len(group) >= min_size]
+        clusters.sort(key=lambda group: sum(count for _, count in group), reverse=True)
+        return clusters
+
+    def to_dict(self) -> Dict[str, Any]:
+        """以 (詞彙表, 邊列表) 的精簡格式輸出"""
+        days = {}
+        for day, bucket in self.days.items():
+            vocabulary = sorted(bucket['nodes'])
+            index = {tag: i for i, tag in enumerate(vocabulary)}
+            edges = [
+                [index[tag], index[other], count]
+                for tag, neighbours in bucket['edges'].items()
+                for other, count in neighbours.items()
+                if tag < other
+            ]
+            days[day] = {
+                'vocabulary': vocabulary,
+                'counts': [bucket['nodes'][tag] for tag in vocabulary],
+                'edges': edges,
+                'ids': sorted(bucket['ids'])
+            }
+        return {'retention_days': self.retention_days, 'days': days}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CooccurrenceGraph':
+        graph = cls(retention_days=data.get('retention_days'))
+        for day, item in data['days'].items():
+            vocabulary = item['vocabulary']
+            edges: Dict[str, Dict[str, int]] = {}
+            for i, j, count in item['edges']:
+                edges.setdefault(vocabulary[i], {})[vocabulary[j]] = count
+                edges.setdefault(vocabulary[j], {})[vocabulary[i]] = count
+            graph.days[day] = {
+                'nodes': dict(zip(vocabulary, item['counts'])),
+                'edges': edges,
+                'ids': set(item['ids'])
+            }
+        return graph
+
+    def save(self, path: str = 'cooccurrence_graph_state.json'):
+        """保存共現圖"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = 'cooccurrence_graph_state.json', **kwargs) -> 'CooccurrenceGraph':
+        """載入共現圖，檔案不存在時建立新的共現圖"""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
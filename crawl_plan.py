@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+可續跑的爬取計畫 - 將一次爬取拆成逐賽道的步驟保存在 SQLite
+每個步驟完成後記錄下一步最早可執行的時間並結束，由排程器到時再喚起，
+等待期間不佔用行程；多個計畫（不同日期或不同爬蟲）可交錯執行
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional
+
+# 執行中的步驟若超過租約時間仍未回報（例如行程被終止），視為中斷並重新執行
+LEASE_SECONDS = 600
+
+# 同一步驟最多嘗試次數（含重試與錯誤），超過後計畫標記為 failed
+MAX_STEP_ATTEMPTS = 5
+
+# 步驟發生未預期錯誤時，下次嘗試前的等待秒數（之後每次加倍）
+ERROR_BACKOFF_SECONDS = 60
+
+
+class CrawlPlanStore:
+    def __init__(self, db_path: str = 'crawl_plans.db'):
+        """
+        初始化爬取計畫資料庫
+
+        Args:
+            db_path: SQLite 資料庫路徑（排程器與爬蟲行程共用）
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """建立資料表"""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_plans (
+                    plan_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    run_date TEXT NOT NULL,
+                    steps TEXT NOT NULL,
+                    results TEXT NOT NULL DEFAULT '{}',
+                    cursor INTEGER NOT NULL DEFAULT 0,
+                    attempt INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'active',
+                    not_before REAL NOT NULL,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_plans_due ON crawl_plans (status, not_before)")
+
+    def _row_to_plan(self, row) -> Dict[str, Any]:
+        return {
+            'plan_id': row[0],
+            'kind': row[1],
+            'run_date': row[2],
+            'steps': json.loads(row[3]),
+            'results': json.loads(row[4]),
+            'cursor': row[5],
+            'attempt': row[6],
+            'status': row[7],
+            'not_before': row[8]
+        }
+
+    def create(self, plan_id: str, kind: str, run_date: str, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """建立計畫（已存在時不覆蓋），回傳目前的計畫"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR IGNORE INTO crawl_plans (plan_id, kind, run_date, steps, not_before, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (plan_id, kind, run_date, json.dumps(steps, ensure_ascii=False), now, now, now))
+        return self.get(plan_id)
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT plan_id, kind, run_date, steps, results, cursor, attempt, status, not_before
+                FROM crawl_plans WHERE plan_id = ?
+            """, (plan_id,)).fetchone()
+        return self._row_to_plan(row) if row else None
+
+    def claim(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取得到期的計畫並鎖定目前步驟
+
+        Returns:
+            計畫字典；尚未到期、已完成或其他行程執行中時回傳 None
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute("""
+                UPDATE crawl_plans SET lease_until = ?, updated_at = ?
+                WHERE plan_id = ? AND status = 'active' AND not_before <= ?
+                  AND (lease_until IS NULL OR lease_until < ?)
+                RETURNING plan_id, kind, run_date, steps, results, cursor, attempt, status, not_before
+            """, (now + LEASE_SECONDS, now, plan_id, now, now)).fetchone()
+        return self._row_to_plan(row) if row else None
+
+    def complete_step(self, plan: Dict[str, Any], result: Any, delay: float = 0.0):
+        """記錄步驟結果並前進到下一步（最後一步完成時計畫結束）"""
+        step = plan['steps'][plan['cursor']]
+        results = dict(plan['results'])
+        results[step['category']] = result
+        cursor = plan['cursor'] + 1
+        status = 'done' if cursor >= len(plan['steps']) else 'active'
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                UPDATE crawl_plans
+                SET results = ?, cursor = ?, attempt = 0, status = ?, not_before = ?, lease_until = NULL, updated_at = ?
+                WHERE plan_id = ?
+            """, (json.dumps(results, ensure_ascii=False), cursor, status, now + delay, now, plan['plan_id']))
+
+    def retry_step(self, plan: Dict[str, Any], delay: float) -> str:
+        """
+        目前步驟稍後重試（達到嘗試上限時計畫標記為 failed）
+
+        Returns:
+            新的狀態（active 或 failed）
+        """
+        status = 'failed' if plan['attempt'] + 1 >= MAX_STEP_ATTEMPTS else 'active'
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                UPDATE crawl_plans SET attempt = attempt + 1, status = ?, not_before = ?, lease_until = NULL, updated_at = ?
+                WHERE plan_id = ?
+            """, (status, now + delay, now, plan['plan_id']))
+        return status
+
+    def expire_stale(self, today: Optional[str] = None) -> int:
+        """將執行日期已過仍未完成的計畫標記為 failed（隔天會建立新的計畫）"""
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        with self.lock, self.conn:
+            return self.conn.execute("""
+                UPDATE crawl_plans SET status = 'failed', lease_until = NULL, updated_at = ?
+                WHERE status = 'active' AND run_date < ?
+            """, (time.time(), today)).rowcount
+
+    def due_plans(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """已到期、可以繼續的計畫（依建立順序）"""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT plan_id, kind, run_date, steps, results, cursor, attempt, status, not_before
+                FROM crawl_plans
+                WHERE status = 'active' AND not_before <= ? AND (lease_until IS NULL OR lease_until < ?)
+                  AND (? IS NULL OR kind = ?)
+                ORDER BY created_at
+            """, (now, now, kind, kind)).fetchall()
+        return [self._row_to_plan(row) for row in rows]
+
+    def next_due(self, kind: Optional[str] = None) -> Optional[float]:
+        """最近一個未完成計畫可以繼續的時間"""
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT MIN(MAX(not_before, COALESCE(lease_until, 0)))
+                FROM crawl_plans WHERE status = 'active' AND (? IS NULL OR kind = ?)
+            """, (kind, kind)).fetchone()
+        return row[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def run_due_steps(store: CrawlPlanStore, plan_id: str,
+                  execute_step: Callable[[Dict[str, Any], int], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    執行計畫中所有已到期的步驟，遇到需要等待的步驟即返回（不睡眠）
+
+    Args:
+        store: 計畫資料庫
+        plan_id: 計畫 ID
+        execute_step: 以 (步驟, 第幾次嘗試) 呼叫，回傳 {'result': 結果, 'delay': 下一步前的等待秒數}
+                      或 {'retry_in': 重試前的等待秒數}
+
+    Returns:
+        執行後的計畫（status 為 done 時 results 為完整結果；failed 表示步驟超過嘗試上限或已過期；
+        否則 not_before 為下次可繼續的時間）
+    """
+    while True:
+        plan = store.claim(plan_id)
+        if plan is None:
+            return store.get(plan_id)
+        try:
+            outcome = execute_step(plan['steps'][plan['cursor']], plan['attempt'])
+        except Exception:
+            # 錯誤也計入嘗試次數並退避，避免同一步驟被反覆喚起
+            store.retry_step(plan, ERROR_BACKOFF_SECONDS * 2 ** plan['attempt'])
+            raise
+        if 'retry_in' in outcome:
+            store.retry_step(plan, outcome['retry_in'])
+        else:
+            store.complete_step(plan, outcome['result'], outcome.get('delay', 0.0))
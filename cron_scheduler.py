@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Cron 排程 - 依 cron 表達式計算下一次執行時間並睡到該時間點
+每個任務的上次成功執行時間保存在 JSON，失敗的任務退避後重試；重啟後依補跑策略處理錯過的執行
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any, Optional
+
+import pytz
+
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+DAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# 補跑策略：skip 只執行寬限時間內的排程，once 錯過多次也只補跑一次，all 逐次補跑（上限 max_catchup）
+CATCHUP_POLICIES = ('skip', 'once', 'all')
+
+
+def _parse_field(field: str, low: int, high: int, names: Dict[str, int]) -> set:
+    values = set()
+    for part in field.lower().split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"無效的間隔: {field}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = names.get(start_text, None), names.get(end_text, None)
+            start = int(start_text) if start is None else start
+            end = int(end_text) if end is None else end
+        else:
+            start = names[part] if part in names else int(part)
+            # 「5/15」表示從5開始每15
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"超出範圍的欄位: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    def __init__(self, expression: str, timezone: str = 'Asia/Taipei'):
+        """
+        解析5欄位 cron 表達式（分 時 日 月 週），支援 *、列表、範圍、間隔與月份/星期名稱
+
+        Args:
+            expression: cron 表達式，例如 "0 8 * * *"
+            timezone: 解讀表達式的時區
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表達式需要5個欄位: {expression}")
+        self.expression = expression
+        self.tz = pytz.timezone(timezone)
+        self.minutes = _parse_field(fields[0], *FIELD_RANGES[0], {})
+        self.hours = _parse_field(fields[1], *FIELD_RANGES[1], {})
+        self.days = _parse_field(fields[2], *FIELD_RANGES[2], {})
+        self.months = _parse_field(fields[3], *FIELD_RANGES[3], MONTH_NAMES)
+        # 星期日可寫為0或7
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], *FIELD_RANGES[4], DAY_NAMES)}
+        # 與 cron 相同：日與週都有限制時，符合任一即可
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def _day_matches(self, day: datetime) -> bool:
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        計算晚於指定時間的下一次執行時間
+
+        逐欄位跳到下一個符合的月、日、時、分，不逐分鐘掃描
+
+        Returns:
+            帶時區的執行時間
+        """
+        local = moment.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=366 * 5)
+        while local < limit:
+            if local.month not in self.months:
+                year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+                local = datetime(year, month, 1)
+                continue
+            if not self._day_matches(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+                continue
+            if local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            if local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+                continue
+            return self.tz.normalize(self.tz.localize(local))
+        raise ValueError(f"cron 表達式沒有可執行的時間: {self.expression}")
+
+
+class JobStore:
+    def __init__(self, path: str = 'scheduler_jobs.json'):
+        """
+        每個任務的執行紀錄（上次排程時間、狀態、耗時、下次執行時間）
+
+        Args:
+            path: JSON 狀態檔路徑
+        """
+        self.path = path
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.jobs = json.load(f)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                # 損毀的狀態檔保留備查，以空白紀錄重新開始（各任務依 baseline 決定是否補跑）
+                logging.getLogger(__name__).error(f"任務紀錄 {path} 損毀，另存為 {path}.corrupt: {e}")
+                os.replace(path, f"{path}.corrupt")
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return self.jobs.setdefault(name, {})
+
+    def last_run(self, name: str) -> Optional[datetime]:
+        value = self.jobs.get(name, {}).get('last_run')
+        return datetime.fromisoformat(value) if value else None
+
+    def retry_at(self, name: str) -> Optional[datetime]:
+        value = self.jobs.get(name, {}).get('retry_at')
+        return datetime.fromisoformat(value) if value else None
+
+    def update(self, name: str, **fields):
+        """更新任務紀錄並保存"""
+        record = self.get(name)
+        for key, value in fields.items():
+            record[key] = value.isoformat() if isinstance(value, datetime) else value
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class CronScheduler:
+    def __init__(self, store: Optional[JobStore] = None, timezone: str = 'Asia/Taipei',
+                 misfire_grace_seconds: float = 300, max_sleep_seconds: float = 3600,
+                 error_backoff_seconds: float = 60):
+        """
+        初始化排程器
+
+        Args:
+            store: 任務執行紀錄
+            timezone: cron 表達式的時區
+            misfire_grace_seconds: 排程時間過後仍視為準時的秒數（skip 策略使用）
+            max_sleep_seconds: 單次睡眠上限，避免系統時間調整後睡過頭
+            error_backoff_seconds: 主循環發生錯誤後的第一次等待秒數（連續錯誤時加倍）
+        """
+        self.store = store or JobStore()
+        self.timezone = timezone
+        self.misfire_grace = timedelta(seconds=misfire_grace_seconds)
+        self.max_sleep_seconds = max_sleep_seconds
+        self.error_backoff_seconds = error_backoff_seconds
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.continuations: Dict[str, Dict[str, Any]] = {}
+        self.logger = logging.getLogger(__name__)
+        # 主循環最近一次活動的時間（存活檢查使用；每個任務開始與結束時也會更新）
+        self.last_tick = time.time()
+
+    def now(self) -> datetime:
+        return datetime.now(pytz.timezone(self.timezone))
+
+    def add_job(self, name: str, expression: str, func: Callable[[], Any], catchup: str = 'once',
+                max_catchup: int = 3, baseline: Optional[datetime] = None, retry_seconds: float = 300):
+        """
+        註冊任務
+
+        Args:
+            name: 任務名稱（執行紀錄的鍵）
+            expression: cron 表達式
+            func: 任務函數，回傳 False 表示失敗
+            catchup: 錯過執行時的補跑策略（skip / once / all）
+            max_catchup: all 策略最多補跑的次數（只保留最近的幾次）
+            baseline: 沒有執行紀錄時視為上次執行的時間，預設為現在（不補跑）
+            retry_seconds: 失敗後重試前的等待秒數（連續失敗時加倍，上限 max_sleep_seconds）
+        """
+        if catchup not in CATCHUP_POLICIES:
+            raise ValueError(f"未知的補跑策略: {catchup}")
+        self.jobs[name] = {
+            'expression': CronExpression(expression, self.timezone),
+            'func': func,
+            'catchup': catchup,
+            'max_catchup': max_catchup,
+            'retry_seconds': retry_seconds
+        }
+        if self.store.last_run(name) is None:
+            self.store.update(name, last_run=baseline or self.now())
+        self.store.update(name, cron=expression, catchup=catchup, next_run=self.next_run(name))
+
+    def add_continuation(self, name: str, func: Callable[[], Any], due: Callable[[], Optional[float]],
+                         retry_seconds: float = 60):
+        """
+        註冊延續任務：不依 cron，而是在 due() 回傳的時間到達時執行
+        （例如爬取計畫的下一個步驟；重啟後會從 due() 接續）
+
+        Args:
+            name: 任務名稱（執行紀錄的鍵）
+            func: 任務函數，回傳 False 表示失敗
+            due: 回傳最早可執行時間（epoch 秒）；沒有待執行的項目時回傳 None
+            retry_seconds: 執行後仍然到期（例如任務失敗）時，再次執行前的等待秒數
+        """
+        self.continuations[name] = {'func': func, 'due': due, 'retry_seconds': retry_seconds, 'not_before': 0.0}
+
+    def continuation_due(self, name: str) -> Optional[float]:
+        """延續任務的下一次執行時間"""
+        continuation = self.continuations[name]
+        try:
+            due = continuation['due']()
+        except Exception as e:
+            self.logger.warning(f"查詢延續任務 {name} 失敗: {e}")
+            due = time.time() + continuation['retry_seconds']
+        return None if due is None else max(due, continuation['not_before'])
+
+    def next_run(self, name: str) -> datetime:
+        """任務的下一次排程時間（可能早於現在，表示有錯過的執行；失敗的任務為重試時間）"""
+        scheduled = self.jobs[name]['expression'].next_after(self.store.last_run(name))
+        retry_at = self.store.retry_at(name)
+        return retry_at if retry_at is not None and retry_at > scheduled else scheduled
+
+    def due_runs(self, name: str, now: datetime) -> List[datetime]:
+        """
+        依補跑策略決定現在要執行的排程時間
+
+        Returns:
+            要執行的排程時間列表（可能為空）
+        """
+        job = self.jobs[name]
+        expression = job['expression']
+        first = expression.next_after(self.store.last_run(name))
+        retry_at = self.store.retry_at(name)
+        if first > now or (retry_at is not None and retry_at > now):
+            return []
+
+        if job['catchup'] == 'all':
+            runs = []
+            moment = first
+            while moment <= now:
+                runs.append(moment)
+                moment = expression.next_after(moment)
+                if len(runs) > job['max_catchup']:
+                    runs.pop(0)
+            return runs
+
+        latest = expression.next_after(now - self.misfire_grace - timedelta(minutes=1))
+        if latest > now:
+            # 寬限時間內沒有排程：全都是錯過的執行
+            if job['catchup'] == 'skip':
+                self.logger.info(f"⏭️ 跳過錯過的任務 {name} (原定 {first.strftime('%Y-%m-%d %H:%M')})")
+                self.store.update(name, last_run=now, failures=0, retry_at=None, next_run=expression.next_after(now))
+                return []
+            return [now]
+        # 寬限時間內有多次排程時只執行最近一次
+        following = expression.next_after(latest)
+        while following <= now:
+            latest, following = following, expression.next_after(following)
+        return [latest]
+
+    def run_job(self, name: str, scheduled: datetime) -> bool:
+        """執行任務並記錄結果"""
+        job = self.jobs[name]
+        self.logger.info(f"▶️ 執行任務 {name} (排程 {scheduled.strftime('%Y-%m-%d %H:%M')})")
+        self.last_tick = time.time()
+        started = self.now()
+        start = time.perf_counter()
+        try:
+            ok = job['func']() is not False
+            error = None
+        except Exception as e:
+            ok = False
+            error = str(e)
+            self.logger.error(f"任務 {name} 錯誤: {error}")
+        duration = time.perf_counter() - start
+        self.last_tick = time.time()
+        self.store.update(name, last_started=started, last_status='success' if ok else 'failed',
+                          last_duration=round(duration, 3), last_error=error)
+        if ok:
+            self.store.update(name, last_run=scheduled, failures=0, retry_at=None)
+            self.logger.info(f"✅ 任務 {name} 完成 ({duration:.1f}s)")
+        else:
+            # 失敗時不推進 last_run，錯過的排程依補跑策略在退避後重試
+            failures = self.store.get(name).get('failures', 0) + 1
+            delay = min(job['retry_seconds'] * 2 ** (failures - 1), self.max_sleep_seconds)
+            self.store.update(name, failures=failures, retry_at=self.now() + timedelta(seconds=delay))
+            self.logger.info(f"❌ 任務 {name} 失敗 ({duration:.1f}s)，{delay:.0f} 秒後重試（第 {failures} 次失敗）")
+        self.store.update(name, next_run=self.next_run(name))
+        return ok
+
+    def run_pending(self) -> int:
+        """
+        執行所有到期的任務（依排程時間順序）
+
+        Returns:
+            執行的次數
+        """
+        now = self.now()
+        pending = sorted((scheduled, name) for name in self.jobs for scheduled in self.due_runs(name, now))
+        failed = set()
+        runs = 0
+        for scheduled, name in pending:
+            # 同一任務失敗後，其餘補跑的排程等重試時再執行
+            if name in failed:
+                continue
+            if not self.run_job(name, scheduled):
+                failed.add(name)
+            runs += 1
+
+        for name, continuation in self.continuations.items():
+            due = self.continuation_due(name)
+            if due is None or due > time.time():
+                continue
+            self.run_continuation(name)
+            runs += 1
+            # 執行後仍然到期表示沒有進展，稍後再試，避免空轉
+            due = self.continuation_due(name)
+            if due is not None and due <= time.time():
+                continuation['not_before'] = time.time() + continuation['retry_seconds']
+        return runs
+
+    def run_continuation(self, name: str) -> bool:
+        """執行延續任務並記錄結果"""
+        continuation = self.continuations[name]
+        self.logger.info(f"▶️ 繼續任務 {name}")
+        self.last_tick = time.time()
+        started = self.now()
+        start = time.perf_counter()
+        try:
+            ok = continuation['func']() is not False
+            error = None
+        except Exception as e:
+            ok = False
+            error = str(e)
+            self.logger.error(f"任務 {name} 錯誤: {error}")
+        duration = time.perf_counter() - start
+        self.last_tick = time.time()
+        self.store.update(name, last_started=started, last_status='success' if ok else 'failed',
+                          last_duration=round(duration, 3), last_error=error)
+        self.logger.info(f"{'✅' if ok else '❌'} 任務 {name} {'完成' if ok else '失敗'} ({duration:.1f}s)")
+        return ok
+
+    def seconds_until_next(self) -> float:
+        """距離最近一個任務排程的秒數"""
+        times = [self.next_run(name).timestamp() for name in self.jobs]
+        times += [due for due in map(self.continuation_due, self.continuations) if due is not None]
+        if not times:
+            return self.max_sleep_seconds
+        return max(0.0, min(times) - time.time())
+
+    def run_forever(self):
+        """執行到期任務後睡到下一個排程時間"""
+        for name in self.jobs:
+            self.logger.info(f"🗓️ 任務 {name} ({self.jobs[name]['expression'].expression}) "
+                             f"下次執行: {self.next_run(name).strftime('%Y-%m-%d %H:%M')}")
+        errors = 0
+        while True:
+            try:
+                self.last_tick = time.time()
+                self.run_pending()
+                self.last_tick = time.time()
+                sleep_seconds = min(self.seconds_until_next(), self.max_sleep_seconds)
+                errors = 0
+            except Exception as e:
+                # 任務以外的錯誤（例如狀態檔無法寫入）不中止排程，退避後重試
+                errors += 1
+                sleep_seconds = min(self.error_backoff_seconds * 2 ** (errors - 1), self.max_sleep_seconds)
+                self.logger.error(f"排程器錯誤（第 {errors} 次），{sleep_seconds:.0f} 秒後重試: {e}")
+            time.sleep(sleep_seconds)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+每日彙總表 - 按日期、類別增量維護推文統計
+爬取時更新，週報/月報只需加總少量彙總列，不必重新掃描原始推文
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+
+class DailyRollupStore:
+    def __init__(self, db_path: str = 'daily_rollups.db'):
+        """
+        初始化每日彙總表
+
+        Args:
+            db_path: SQLite 資料庫路徑
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        """建立資料表"""
+        with self.conn:
+            # 每條推文最後一次記錄的指標，用於重複爬取時計算差額
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_tweets (
+                    tweet_id TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    like_count INTEGER NOT NULL,
+                    retweet_count INTEGER NOT NULL,
+                    reply_count INTEGER NOT NULL,
+                    verified INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_tweets_day ON rollup_tweets (day)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_rollups (
+                    day TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    tweet_count INTEGER NOT NULL DEFAULT 0,
+                    like_sum INTEGER NOT NULL DEFAULT 0,
+                    retweet_sum INTEGER NOT NULL DEFAULT 0,
+                    reply_sum INTEGER NOT NULL DEFAULT 0,
+                    verified_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, category)
+                )
+            """)
+
+    def _apply(self, day: str, category: str, sign: int, row: tuple):
+        """將一條推文的指標加入（sign=1）或移出（sign=-1）彙總列"""
+        like_count, retweet_count, reply_count, verified = row
+        self.conn.execute("""
+            INSERT INTO daily_rollups (day, category, tweet_count, like_sum, retweet_sum, reply_sum, verified_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, category) DO UPDATE SET
+                tweet_count = tweet_count + excluded.tweet_count,
+                like_sum = like_sum + excluded.like_sum,
+                retweet_sum = retweet_sum + excluded.retweet_sum,
+                reply_sum = reply_sum + excluded.reply_sum,
+                verified_count = verified_count + excluded.verified_count
+        """, (day, category, sign, sign * like_count, sign * retweet_count, sign * reply_count, sign * verified))
+
+    def ingest_tweets(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        增量更新彙總表
+
+        同一條推文重複出現時只套用指標差額，保留最新的互動數
+
+        Returns:
+            新增的推文數量
+        """
+        new_tweets = 0
+        with self.conn:
+            for category, tweets in tweets_data.items():
+                for tweet in tweets:
+                    tweet_id = str(tweet.get('tweet_id', ''))
+                    if not tweet_id:
+                        continue
+
+                    day = (tweet.get('created_at') or '')[:10] or 'unknown'
+                    row = (
+                        int(tweet.get('like_count', 0) or 0),
+                        int(tweet.get('retweet_count', 0) or 0),
+                        int(tweet.get('reply_count', 0) or 0),
+                        1 if tweet.get('verified') else 0
+                    )
+
+                    previous = self.conn.execute(
+                        "SELECT day, category, like_count, retweet_count, reply_count, verified FROM rollup_tweets WHERE tweet_id = ?",
+                        (tweet_id,)
+                    ).fetchone()
+
+                    if previous is None:
+                        new_tweets += 1
+                    elif (previous[0], previous[1]) + tuple(previous[2:]) == (day, category) + row:
+                        continue
+                    else:
+                        self._apply(previous[0], previous[1], -1, tuple(previous[2:]))
+
+                    self._apply(day, category, 1, row)
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO rollup_tweets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (tweet_id, day, category) + row
+                    )
+        return new_tweets
+
+    def prune_tweets(self, retention_days: int = 90, today: Optional[str] = None) -> int:
+        """
+        刪除超過保留天數的逐條推文紀錄（彙總列保留；這麼舊的推文不會再被爬到，不需要差額）
+
+        Returns:
+            刪除的紀錄數量
+        """
+        today_date = datetime.strptime(today, '%Y-%m-%d') if today else datetime.now()
+        cutoff = (today_date - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        with self.conn:
+            return self.conn.execute("DELETE FROM rollup_tweets WHERE day < ?", (cutoff,)).rowcount
+
+    def category_stats(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        查詢日期範圍內各類別統計（欄位對應 analyze_trending_topics 與 generate_category_report）
+
+        Args:
+            start: 起始日期 (YYYY-MM-DD，含)
+            end: 結束日期 (YYYY-MM-DD，含)
+        """
+        rows = self.conn.execute("""
+            SELECT category, SUM(tweet_count), SUM(like_sum), SUM(retweet_sum), SUM(reply_sum), SUM(verified_count)
+            FROM daily_rollups
+            WHERE (? IS NULL OR day >= ?) AND (? IS NULL OR day <= ?)
+            GROUP BY category
+            HAVING SUM(tweet_count) > 0
+            ORDER BY category
+        """, (start, start, end, end)).fetchall()
+
+        stats = {}
+        for category, tweet_count, like_sum, retweet_sum, reply_sum, verified_count in rows:
+            stats[category] = {
+                'tweet_count': tweet_count,
+                'avg_likes': like_sum / tweet_count,
+                'avg_retweets': retweet_sum / tweet_count,
+                'avg_replies': reply_sum / tweet_count,
+                'verified_users': verified_count,
+                'verified_ratio': (verified_count / tweet_count) * 100,
+                'engagement_score': (like_sum + retweet_sum + reply_sum) / tweet_count
+            }
+        return stats
+
+    def period_stats(self, days: int, end: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """查詢截至 end（預設今天）的最近N天統計，例如 days=7 為週報、days=30 為月報"""
+        end_date = datetime.strptime(end, '%Y-%m-%d') if end else datetime.now()
+        start = (end_date - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        return self.category_stats(start, end_date.strftime('%Y-%m-%d'))
+
+    def daily_series(self, category: str) -> List[Dict[str, Any]]:
+        """取得單一類別的每日彙總列"""
+        rows = self.conn.execute("""
+            SELECT day, tweet_count, like_sum, retweet_sum, reply_sum, verified_count
+            FROM daily_rollups WHERE category = ? AND tweet_count > 0 ORDER BY day
+        """, (category,)).fetchall()
+        columns = ['day', 'tweet_count', 'like_sum', 'retweet_sum', 'reply_sum', 'verified_count']
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    store = DailyRollupStore()
+
+    for title, days in [("最近7天", 7), ("最近30天", 30)]:
+        print(f"\n=== {title} ===")
+        stats = store.period_stats(days)
+        if not stats:
+            print("尚無彙總數據")
+            continue
+        for category, category_stats in stats.items():
+            print(f"{category}: {category_stats['tweet_count']} 條推文，"
+                  f"平均讚數 {category_stats['avg_likes']:.1f}，"
+                  f"認證比例 {category_stats['verified_ratio']:.1f}%，"
+                  f"互動度 {category_stats['engagement_score']:.1f}")
+
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ import logging
 from datetime import datetime
 from twitter_smart_crawler import SmartWeb3Crawler
 from news_reporter import Web3NewsReporter
+from pipeline_dag import StagedPipeline
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -58,99 +59,104 @@ def run_daily_pipeline():
         logger.info("或執行 python3 test_apis.py 自動設定")
         return False
     
-    success_count = 0
-    total_steps = 3
+    crawler = SmartWeb3Crawler(TWITTER_BEARER_TOKEN)
+    reporter = Web3NewsReporter(
+        openai_api_key=OPENAI_API_KEY,
+        line_access_token=LINE_ACCESS_TOKEN, 
+        line_user_id=LINE_USER_ID,
+        line_api_base=os.getenv('LINE_API_BASE', 'https://api.line.me')
+    )
     
-    try:
-        # ===== 步驟1：智能爬取Twitter數據 =====
+    # ===== 步驟1：智能爬取Twitter數據 =====
+    def crawl():
         logger.info("📊 步驟1/3：智能爬取Twitter精選內容...")
-        
-        crawler = SmartWeb3Crawler(TWITTER_BEARER_TOKEN)
         tweets_data = crawler.crawl_by_priority()  # 使用智能優先級爬取
         
         if not any(tweets for tweets in tweets_data.values()):
             logger.warning("⚠️  未爬取到任何推文數據，可能受到API限制")
             # 嘗試加載之前的智能爬取數據
             import glob
-            import os
+            import json
             json_files = glob.glob("smart_web3_tweets_*.json") + glob.glob("web3_tweets_*.json")
-            if json_files:
-                latest_file = max(json_files, key=os.path.getctime)
-                logger.info(f"使用之前的數據文件: {latest_file}")
-                import json
-                with open(latest_file, 'r', encoding='utf-8') as f:
-                    tweets_data = json.load(f)
-            else:
-                logger.error("❌ 沒有可用的推文數據")
-                return False
+            if not json_files:
+                raise ValueError("沒有可用的推文數據")
+            latest_file = max(json_files, key=os.path.getctime)
+            logger.info(f"使用之前的數據文件: {latest_file}")
+            with open(latest_file, 'r', encoding='utf-8') as f:
+                tweets_data = json.load(f)
         
-        # 保存數據
+        total_tweets = sum(len(tweets) for tweets in tweets_data.values())
+        logger.info(f"✅ 步驟1完成：成功爬取 {total_tweets} 條推文")
+        return tweets_data
+    
+    # 保存數據（與分析、報告平行）
+    def export(tweets_data):
         crawler.save_to_json(tweets_data)
-        crawler.save_to_csv(tweets_data) 
-        
-        # 生成分析
+        crawler.save_to_csv(tweets_data)
+    
+    def analyze(tweets_data):
         analysis = crawler.analyze_trending_topics(tweets_data)
         crawler.save_to_json(analysis, "web3_analysis.json")
-        
-        total_tweets = sum(len(tweets) for tweets in tweets_data.values())
-        logger.info(f"✅ 步驟1完成：成功爬取 {total_tweets} 條推文")
-        success_count += 1
-        
-        # ===== 步驟2：生成新聞報告 =====
+        return analysis
+    
+    # ===== 步驟2：生成新聞報告 =====
+    def generate_report(tweets_data):
         logger.info("🤖 步驟2/3：使用OpenAI生成新聞報告...")
-        
-        reporter = Web3NewsReporter(
-            openai_api_key=OPENAI_API_KEY,
-            line_access_token=LINE_ACCESS_TOKEN, 
-            line_user_id=LINE_USER_ID
-        )
-        
-        # 生成報告（不自動發送）
         report = reporter.analyze_tweets_with_openai(tweets_data)
-        
         if not report or "錯誤" in report:
-            logger.error("❌ 新聞報告生成失敗")
-            return False
+            raise ValueError("新聞報告生成失敗")
         
         # 保存報告
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         report_filename = f"web3_news_report_{timestamp}.txt"
-        
         with open(report_filename, 'w', encoding='utf-8') as f:
             f.write(report)
         
         logger.info(f"✅ 步驟2完成：報告已保存到 {report_filename}")
-        success_count += 1
-        
-        # ===== 步驟3：發送到LINE =====
+        return {'report': report, 'report_file': report_filename}
+    
+    # ===== 步驟3：發送到LINE =====
+    def deliver(report):
         logger.info("📱 步驟3/3：發送到LINE...")
-        
-        line_success = reporter.send_to_line(report)
-        
-        if line_success:
-            logger.info("✅ 步驟3完成：報告已發送到LINE")
-            success_count += 1
-        else:
-            logger.error("❌ LINE發送失敗")
-        
-        # ===== 總結 =====
-        logger.info("=" * 50)
-        logger.info(f"📋 流程完成摘要：")
-        logger.info(f"   成功步驟: {success_count}/{total_steps}")
-        logger.info(f"   推文數量: {total_tweets}")
-        logger.info(f"   報告文件: {report_filename}")
-        logger.info(f"   LINE推播: {'✅ 成功' if line_success else '❌ 失敗'}")
-        
-        if success_count == total_steps:
-            logger.info("🎉 每日Web3新聞流程執行成功！")
-            return True
-        else:
-            logger.warning("⚠️  流程部分成功，請檢查日誌了解詳情")
-            return False
-            
+        if not reporter.send_to_line(report):
+            raise RuntimeError("LINE發送失敗")
+        logger.info("✅ 步驟3完成：報告已發送到LINE")
+    
+    # 同一天重新執行時，已完成的步驟沿用保存的產物（不重複爬取與推播）
+    pipeline = StagedPipeline('daily_web3_news')
+    pipeline.add_stage('crawl', crawl, outputs=['tweets'], params={'date': datetime.now().strftime('%Y-%m-%d')})
+    pipeline.add_stage('export', export, inputs=['tweets'])
+    pipeline.add_stage('analyze', analyze, inputs=['tweets'], outputs=['analysis'])
+    pipeline.add_stage('report', generate_report, inputs=['tweets'], outputs=['report', 'report_file'])
+    pipeline.add_stage('deliver', deliver, inputs=['report'])
+    
+    try:
+        summary = pipeline.run()
     except Exception as e:
         logger.error(f"❌ 流程執行中發生錯誤: {str(e)}")
         return False
+    
+    stages = summary['stages']
+    succeeded = [name for name, stage in stages.items() if stage['status'] in ('completed', 'skipped')]
+    total_tweets = sum(len(tweets) for tweets in pipeline.load('tweets').values()) if 'crawl' in succeeded else 0
+    
+    # ===== 總結 =====
+    logger.info("=" * 50)
+    logger.info(f"📋 流程完成摘要：")
+    logger.info(f"   成功步驟: {len(succeeded)}/{len(stages)}")
+    for name, stage in stages.items():
+        logger.info(f"   {name}: {stage['status']} ({stage['seconds']:.1f}s)" + (f" - {stage['error']}" if stage['error'] else ""))
+    logger.info(f"   推文數量: {total_tweets}")
+    if 'report' in succeeded:
+        logger.info(f"   報告文件: {pipeline.load('report_file')}")
+    logger.info(f"   LINE推播: {'✅ 成功' if 'deliver' in succeeded else '❌ 失敗'}")
+    
+    if summary['ok']:
+        logger.info("🎉 每日Web3新聞流程執行成功！")
+        return True
+    else:
+        logger.warning("⚠️  流程部分成功，請檢查日誌了解詳情")
+        return False
 
 def main():
     """主函數"""
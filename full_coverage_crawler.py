@@ -9,11 +9,14 @@ import json
 import time
 import csv
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 import random
 import os
 
+from crawl_plan import CrawlPlanStore, run_due_steps
+from pipeline_dag import StageDeferred
+
 class FullCoverageWeb3Crawler:
     def __init__(self, bearer_token: str):
         """每日全覆蓋爬蟲 - 智能分時段爬取所有賽道"""
@@ -30,6 +33,9 @@ class FullCoverageWeb3Crawler:
             "Meme_Coins": "DOGE",
             "Infrastructure": "Chainlink"
         }
+        
+        # 可續跑的爬取計畫資料庫
+        self.crawl_plan_db = "crawl_plans.db"
 
     def setup_logging(self):
         """設置日誌"""
@@ -44,135 +50,142 @@ class FullCoverageWeb3Crawler:
         )
         self.logger = logging.getLogger(__name__)
 
-    def crawl_single_category_safe(self, category: str, keyword: str, target_tweets: int = 15) -> List[Dict[str, Any]]:
-        """安全爬取單一賽道 - 包含錯誤處理和重試"""
+    def crawl_category_attempt(self, step: Dict[str, Any], attempt: int) -> Dict[str, Any]:
+        """
+        安全爬取單一賽道的一次嘗試 - 需要重試或等待時回傳等待秒數，由排程器稍後繼續
         
-        tweets_data = []
+        Returns:
+            {'result': 推文列表, 'delay': 下一賽道前的等待秒數} 或 {'retry_in': 重試前的等待秒數}
+        """
+        category, keyword, target_tweets = step['category'], step['keyword'], step['target_tweets']
         max_retries = 3
+        tweets_data = []
         
-        for attempt in range(max_retries):
-            try:
-                self.logger.info(f"🎯 爬取 {category} (嘗試 {attempt + 1}/{max_retries})")
-                
-                query = f"{keyword} -is:retweet lang:en"
+        try:
+            self.logger.info(f"🎯 爬取 {category} (嘗試 {attempt + 1}/{max_retries})")
+            
+            query = f"{keyword} -is:retweet lang:en"
+            
+            response = self.client.search_recent_tweets(
+                query=query,
+                tweet_fields=['created_at', 'author_id', 'public_metrics'],
+                user_fields=['username', 'verified'],
+                expansions=['author_id'],
+                max_results=min(target_tweets + 5, 100)  # 多抓一些以備篩選
+            )
+            
+            if not response or not response.data:
+                self.logger.warning(f"   ⚠️ {category}: 無推文結果")
+                if attempt < max_retries - 1:
+                    return {'retry_in': 30}  # 30秒後重試
+                return self.finish_category(category, [])
+            
+            # 處理用戶信息
+            users = {}
+            if hasattr(response, 'includes') and response.includes and 'users' in response.includes:
+                users = {user.id: user for user in response.includes['users']}
+            
+            # 處理推文
+            for tweet in response.data:
+                author = users.get(tweet.author_id)
+                metrics = tweet.public_metrics or {}
                 
-                response = self.client.search_recent_tweets(
-                    query=query,
-                    tweet_fields=['created_at', 'author_id', 'public_metrics'],
-                    user_fields=['username', 'verified'],
-                    expansions=['author_id'],
-                    max_results=min(target_tweets + 5, 100)  # 多抓一些以備篩選
+                # 計算互動分數
+                engagement_score = (
+                    metrics.get('like_count', 0) * 1 +
+                    metrics.get('retweet_count', 0) * 2 +
+                    metrics.get('reply_count', 0) * 0.5
                 )
                 
-                if not response or not response.data:
-                    self.logger.warning(f"   ⚠️ {category}: 無推文結果")
-                    if attempt < max_retries - 1:
-                        time.sleep(30)  # 等待30秒後重試
-                        continue
-                    return []
-                
-                # 處理用戶信息
-                users = {}
-                if hasattr(response, 'includes') and response.includes and 'users' in response.includes:
-                    users = {user.id: user for user in response.includes['users']}
-                
-                # 處理推文
-                for tweet in response.data:
-                    author = users.get(tweet.author_id)
-                    metrics = tweet.public_metrics or {}
-                    
-                    # 計算互動分數
-                    engagement_score = (
-                        metrics.get('like_count', 0) * 1 +
-                        metrics.get('retweet_count', 0) * 2 +
-                        metrics.get('reply_count', 0) * 0.5
-                    )
-                    
-                    tweet_data = {
-                        'category': category,
-                        'tweet_id': tweet.id,
-                        'text': tweet.text,
-                        'created_at': tweet.created_at.isoformat() if tweet.created_at else None,
-                        'author_id': tweet.author_id,
-                        'username': getattr(author, 'username', 'unknown') if author else 'unknown',
-                        'verified': getattr(author, 'verified', False) if author else False,
-                        'retweet_count': metrics.get('retweet_count', 0),
-                        'like_count': metrics.get('like_count', 0),
-                        'reply_count': metrics.get('reply_count', 0),
-                        'quote_count': metrics.get('quote_count', 0),
-                        'engagement_score': engagement_score,
-                        'url': f"https://twitter.com/{getattr(author, 'username', 'unknown') if author else 'unknown'}/status/{tweet.id}"
-                    }
-                    tweets_data.append(tweet_data)
-                
-                # 按互動度排序，取最好的
-                tweets_data.sort(key=lambda x: x['engagement_score'], reverse=True)
-                tweets_data = tweets_data[:target_tweets]
-                
-                self.logger.info(f"   ✅ {category}: 成功獲得 {len(tweets_data)} 條推文")
-                return tweets_data
+                tweet_data = {
+                    'category': category,
+                    'tweet_id': tweet.id,
+                    'text': tweet.text,
+                    'created_at': tweet.created_at.isoformat() if tweet.created_at else None,
+                    'author_id': tweet.author_id,
+                    'username': getattr(author, 'username', 'unknown') if author else 'unknown',
+                    'verified': getattr(author, 'verified', False) if author else False,
+                    'retweet_count': metrics.get('retweet_count', 0),
+                    'like_count': metrics.get('like_count', 0),
+                    'reply_count': metrics.get('reply_count', 0),
+                    'quote_count': metrics.get('quote_count', 0),
+                    'engagement_score': engagement_score,
+                    'url': f"https://twitter.com/{getattr(author, 'username', 'unknown') if author else 'unknown'}/status/{tweet.id}"
+                }
+                tweets_data.append(tweet_data)
+            
+            # 按互動度排序，取最好的
+            tweets_data.sort(key=lambda x: x['engagement_score'], reverse=True)
+            tweets_data = tweets_data[:target_tweets]
+            
+            self.logger.info(f"   ✅ {category}: 成功獲得 {len(tweets_data)} 條推文")
+            return self.finish_category(category, tweets_data)
+            
+        except tweepy.TooManyRequests:
+            self.logger.warning(f"   ⚠️ {category}: API限制 (嘗試 {attempt + 1})")
+            if attempt < max_retries - 1:
+                # 指數退避：30秒、2分鐘、5分鐘
+                wait_time = [30, 120, 300][attempt]
+                self.logger.info(f"   ⏰ {wait_time} 秒後由排程器重試...")
+                return {'retry_in': wait_time}
+            self.logger.error(f"   ❌ {category}: 達到重試上限，跳過此賽道")
+            return self.finish_category(category, [])
                 
-            except tweepy.TooManyRequests:
-                self.logger.warning(f"   ⚠️ {category}: API限制 (嘗試 {attempt + 1})")
-                if attempt < max_retries - 1:
-                    # 指數退避：30秒、2分鐘、5分鐘
-                    wait_time = [30, 120, 300][attempt]
-                    self.logger.info(f"   ⏰ 等待 {wait_time} 秒後重試...")
-                    time.sleep(wait_time)
-                else:
-                    self.logger.error(f"   ❌ {category}: 達到重試上限，跳過此賽道")
-                    return []
-                    
-            except Exception as e:
-                self.logger.error(f"   ❌ {category}: 錯誤 - {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(10)
-                else:
-                    return []
-        
-        return tweets_data
+        except Exception as e:
+            self.logger.error(f"   ❌ {category}: 錯誤 - {str(e)}")
+            if attempt < max_retries - 1:
+                return {'retry_in': 10}
+            return self.finish_category(category, [])
 
-    def crawl_all_categories_distributed(self) -> Dict[str, List[Dict[str, Any]]]:
-        """分時段爬取所有賽道 - 每日全覆蓋"""
+    def finish_category(self, category: str, tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """賽道完成，依成功與否決定下一賽道前的間隔"""
+        if tweets:  # 成功了
+            self.logger.info(f"✅ {category}: {len(tweets)} 條推文")
+            delay = random.uniform(90, 150)  # 1.5-2.5分鐘
+        else:  # 失敗了
+            self.logger.warning(f"⚠️ {category}: 未獲得推文")
+            delay = random.uniform(180, 300)  # 3-5分鐘
+        return {'result': tweets, 'delay': delay}
+
+    def crawl_all_categories_distributed(self, run_date: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        分時段爬取所有賽道 - 每日全覆蓋（可續跑）
         
-        self.logger.info("🚀 開始每日全覆蓋Web3爬取...")
-        self.logger.info("🎯 目標: 涵蓋所有7個Web3賽道")
+        執行所有已到期的步驟；賽道間的間隔與重試等待不在行程內睡眠，
+        而是拋出 StageDeferred，由排程器到時呼叫 resume() 繼續
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        plan_id = f"full_coverage:{run_date}"
+        store = CrawlPlanStore(self.crawl_plan_db)
         
-        all_tweets = {}
-        total_crawled = 0
-        successful_categories = 0
+        try:
+            if store.get(plan_id) is None:
+                self.logger.info("🚀 開始每日全覆蓋Web3爬取...")
+                self.logger.info("🎯 目標: 涵蓋所有7個Web3賽道")
+                
+                categories_list = list(self.web3_categories.items())
+                random.shuffle(categories_list)  # 隨機順序避免模式
+                steps = [{'category': category, 'keyword': keyword, 'target_tweets': 15}
+                         for category, keyword in categories_list]
+                store.create(plan_id, 'full_coverage', run_date, steps)
+            
+            plan = run_due_steps(store, plan_id, self.crawl_category_attempt)
+        finally:
+            store.close()
         
-        categories_list = list(self.web3_categories.items())
-        random.shuffle(categories_list)  # 隨機順序避免模式
+        if plan['status'] == 'failed':
+            raise RuntimeError(f"{run_date} 的爬取計畫已失敗（步驟超過嘗試上限或已過期）")
+        if plan['status'] != 'done':
+            raise StageDeferred(plan['not_before'], f"已完成 {plan['cursor']}/{len(plan['steps'])} 個賽道，"
+                                f"{datetime.fromtimestamp(plan['not_before']).strftime('%H:%M:%S')} 繼續")
         
-        for i, (category, keyword) in enumerate(categories_list):
-            self.logger.info(f"📊 處理 {category} ({i+1}/{len(categories_list)})...")
-            
-            # 爬取這個賽道
-            tweets = self.crawl_single_category_safe(category, keyword, target_tweets=15)
-            all_tweets[category] = tweets
-            
-            if tweets:
-                total_crawled += len(tweets)
-                successful_categories += 1
-                self.logger.info(f"✅ {category}: {len(tweets)} 條推文，累計 {total_crawled}")
-            else:
-                self.logger.warning(f"⚠️ {category}: 未獲得推文")
-            
-            # 類別間智能延遲
-            if i < len(categories_list) - 1:  # 不是最後一個
-                # 基於成功率調整延遲
-                if tweets:  # 成功了
-                    delay = random.uniform(90, 150)  # 1.5-2.5分鐘
-                else:  # 失敗了
-                    delay = random.uniform(180, 300)  # 3-5分鐘
-                
-                self.logger.info(f"⏰ 等待 {delay:.0f} 秒後處理下一賽道...")
-                time.sleep(delay)
+        all_tweets = plan['results']
+        total_crawled = sum(len(tweets) for tweets in all_tweets.values())
+        successful_categories = sum(1 for tweets in all_tweets.values() if tweets)
         
         # 結果統計
         self.logger.info("🎉 每日全覆蓋爬取完成！")
-        self.logger.info(f"📈 成功賽道: {successful_categories}/{len(categories_list)}")
+        self.logger.info(f"📈 成功賽道: {successful_categories}/{len(plan['steps'])}")
         self.logger.info(f"📊 總推文數: {total_crawled}")
         
         # 顯示各賽道結果
@@ -213,7 +226,15 @@ class FullCoverageWeb3Crawler:
         
         return json_filename
 
-def main():
+def main(run_date: Optional[str] = None, follow: bool = False):
+    """
+    執行今日（或指定日期）的全覆蓋爬取
+
+    Args:
+        run_date: 爬取日期（續跑既有計畫時指定）
+        follow: 在行程內等待並完成整個爬取計畫（單獨執行時）；
+                否則賽道間的等待交由排程器的 resume() 繼續
+    """
     BEARER_TOKEN = "AAAAAAAAAAAAAAAAAAAAAF833wEAAAAAVK2bhuSiu%2FaikoUWzmEQvdS%2BJhE%3DjNPAILRXsZOyy1waEYDjahABCRLjG8d9LLyLMAF0CQ3LCckCPq"
     
     print("🌍 每日全覆蓋Web3爬蟲")
@@ -225,8 +246,22 @@ def main():
     
     crawler = FullCoverageWeb3Crawler(BEARER_TOKEN)
     
-    # 執行爬取
-    results = crawler.crawl_all_categories_distributed()
+    # 執行爬取（賽道間的等待交由排程器，或在 follow 模式下於行程內等待）
+    run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+    while True:
+        try:
+            results = crawler.crawl_all_categories_distributed(run_date)
+            break
+        except StageDeferred as e:
+            if not follow:
+                print(f"⏸️ {e}")
+                return True
+            wait_seconds = max(0.0, e.resume_at - time.time())
+            print(f"⏰ {wait_seconds:.0f} 秒後繼續...")
+            time.sleep(wait_seconds)
+        except Exception as e:
+            print(f"❌ 爬取失敗: {e}")
+            return False
     
     # 保存結果
     filename = crawler.save_results(results)
@@ -255,6 +290,19 @@ def main():
         print("✅ 良好！覆蓋大部分Web3賽道")
     else:
         print("⚠️ 部分成功，可能需要調整API使用策略")
+    return successful_categories > 0
+
+def resume():
+    """繼續所有已到期的全覆蓋爬取計畫（由排程器在計畫的下一步可執行時呼叫）"""
+    store = CrawlPlanStore()
+    plans = store.due_plans('full_coverage')
+    store.close()
+    
+    ok = True
+    for plan in plans:
+        ok = main(plan['run_date']) is not False and ok
+    return ok
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 單獨執行時沒有排程器續跑，在行程內完成整個計畫
+    main(follow=True)
\ No newline at end of file
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+暖啟動任務執行器 - 排程器啟動時由 forkserver 預先載入任務模組（tweepy、openai、pandas 等）
+執行時從已載入的 forkserver fork 出子行程，省去冷啟動直譯器與匯入的時間；
+forkserver 是全新啟動的單執行緒行程，不會複製排程器背景執行緒（外送、健康檢查）持有的鎖；
+子行程的輸出逐行轉送到排程器日誌，不在記憶體中累積
+"""
+
+import atexit
+import importlib
+import io
+import logging
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional
+
+
+def _child_main(module_name: str, function: str, writer):
+    """子行程入口：輸出導向管線後執行任務函數"""
+    os.dup2(writer.fileno(), 1)
+    os.dup2(writer.fileno(), 2)
+    writer.close()
+    sys.stdout = io.TextIOWrapper(os.fdopen(1, 'wb', 0), encoding='utf-8', line_buffering=True)
+    sys.stderr = io.TextIOWrapper(os.fdopen(2, 'wb', 0), encoding='utf-8', line_buffering=True)
+
+    # 移除預先載入時留下的日誌設定，任務模組的 basicConfig 才會生效
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    exit_code = 0
+    try:
+        result = getattr(importlib.import_module(module_name), function)()
+        if result is False:
+            exit_code = 1
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        # forkserver 的子行程不會執行 atexit，手動執行任務模組註冊的清理（例如關閉圖表行程池）
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(exit_code)
+
+
+class JobRunner:
+    def __init__(self, preload: Iterable[str] = ('rotational_crawler',), logger: Optional[logging.Logger] = None):
+        """
+        初始化任務執行器
+
+        Args:
+            preload: 由 forkserver 預先載入的任務模組
+            logger: 轉送子行程輸出的日誌
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.preload_modules = list(preload)
+        # 不支援 forkserver 的平台（Windows）改以子行程逐行轉送輸出
+        self.use_fork = 'forkserver' in multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver') if self.use_fork else None
+        self.preload_seconds: Optional[float] = None
+
+    def preload(self):
+        """啟動 forkserver 並在其中預先匯入任務模組，記錄啟動時間"""
+        if not self.use_fork:
+            return
+        # forkserver 以新的直譯器啟動，匯入失敗的模組只會略過，任務執行時再於子行程中匯入
+        self.context.set_forkserver_preload(self.preload_modules)
+        start = time.perf_counter()
+        try:
+            multiprocessing.forkserver.ensure_running()
+        except Exception as e:
+            self.logger.warning(f"forkserver 啟動失敗，任務執行時再啟動: {e}")
+            return
+        self.preload_seconds = time.perf_counter() - start
+        self.logger.info(f"forkserver 已預先載入 {', '.join(self.preload_modules)} ({self.preload_seconds:.2f}s)")
+
+    def _forward(self, stream, job_name: str):
+        """逐行轉送子行程輸出"""
+        for line in stream:
+            line = line.rstrip()
+            if line:
+                self.logger.info(f"[{job_name}] {line}")
+
+    def run(self, module_name: str, function: str = 'main', timeout: Optional[float] = 1800) -> Dict[str, Any]:
+        """
+        執行任務模組的函數
+
+        Args:
+            module_name: 任務模組名稱（例如 rotational_crawler）
+            function: 要執行的函數名稱
+            timeout: 逾時秒數，逾時會終止子行程
+
+        Returns:
+            包含 ok、exit_code、startup_seconds、seconds、timed_out 的字典
+        """
+        if self.use_fork:
+            return self._run_forked(module_name, function, timeout)
+        return self._run_subprocess(module_name, function, timeout)
+
+    def _run_forked(self, module_name: str, function: str, timeout: Optional[float]) -> Dict[str, Any]:
+        read_conn, write_conn = self.context.Pipe(duplex=False)
+        start = time.perf_counter()
+        process = self.context.Process(target=_child_main, args=(module_name, function, write_conn), name=module_name)
+        process.start()
+        startup_seconds = time.perf_counter() - start
+        write_conn.close()
+
+        reader = io.TextIOWrapper(os.fdopen(os.dup(read_conn.fileno()), 'rb'), encoding='utf-8', errors='replace')
+        read_conn.close()
+        forwarder = threading.Thread(target=self._forward, args=(reader, module_name), daemon=True)
+        forwarder.start()
+
+        process.join(timeout)
+        timed_out = process.is_alive()
+        if timed_out:
+            process.terminate()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        forwarder.join(5)
+        reader.close()
+
+        exit_code = process.exitcode
+        return {
+            'ok': not timed_out and exit_code == 0,
+            'exit_code': exit_code,
+            'startup_seconds': startup_seconds,
+            'seconds': time.perf_counter() - start,
+            'timed_out': timed_out
+        }
+
+    def _run_subprocess(self, module_name: str, function: str, timeout: Optional[float]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        code = f"import sys, {module_name}; sys.exit(0 if {module_name}.{function}() is not False else 1)"
+        process = subprocess.Popen(
+            [sys.executable, '-u', '-c', code],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding='utf-8', errors='replace'
+        )
+        startup_seconds = time.perf_counter() - start
+        forwarder = threading.Thread(target=self._forward, args=(process.stdout, module_name), daemon=True)
+        forwarder.start()
+
+        timed_out = False
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            process.kill()
+            process.wait()
+        forwarder.join(5)
+
+        return {
+            'ok': not timed_out and process.returncode == 0,
+            'exit_code': process.returncode,
+            'startup_seconds': startup_seconds,
+            'seconds': time.perf_counter() - start,
+            'timed_out': timed_out
+        }
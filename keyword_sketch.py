@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+關鍵字熱度草圖 - 以固定記憶體追蹤多日熱門關鍵字
+每個 (類別, 日期) 桶維護一個 Count-Min Sketch 與 Space-Saving 熱門詞摘要，
+並以固定大小的 Bloom filter 記錄已計入的推文，重複匯入不會重複計數；
+可跨日期、跨行程合併，查詢任意時間窗口的 Top-K 關鍵字與 Cashtag
+"""
+
+import base64
+import json
+import hashlib
+import math
+import os
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from keyword_tokenizer import extract_tokens
+
+
+def _token_hashes(token: str) -> Tuple[int, int]:
+    """穩定的雙重雜湊（不受 PYTHONHASHSEED 影響，可跨行程合併）"""
+    digest = hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+def _encode_table(table: List[List[int]]) -> str:
+    """將計數表壓縮為字串（多數計數器為0，壓縮後遠小於 JSON 數字陣列）"""
+    flat = array('q', (value for row in table for value in row))
+    if sys.byteorder == 'big':
+        flat.byteswap()
+    return base64.b64encode(zlib.compress(flat.tobytes())).decode('ascii')
+
+
+def _decode_table(encoded: str, width: int, depth: int) -> List[List[int]]:
+    flat = array('q')
+    flat.frombytes(zlib.decompress(base64.b64decode(encoded)))
+    if sys.byteorder == 'big':
+        flat.byteswap()
+    return [flat[row * width:(row + 1) * width].tolist() for row in range(depth)]
+
+
+class BloomFilter:
+    def __init__(self, bits: int = 2048, hashes: int = 4):
+        """
+        固定大小的 Bloom filter（記錄已計入的推文ID）
+
+        每桶數百條推文時誤判率低於 1%；誤判只會讓少數推文不被計入，不會重複計數
+
+        Args:
+            bits: 位元數（8的倍數）
+            hashes: 雜湊次數
+        """
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+
+    def _positions(self, key: str):
+        h1, h2 = _token_hashes(key)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def issubset(self, other: 'BloomFilter') -> bool:
+        return all(own & theirs == own for own, theirs in zip(self.array, other.array))
+
+    def union(self, other: 'BloomFilter') -> 'BloomFilter':
+        if (self.bits, self.hashes) != (other.bits, other.hashes):
+            raise ValueError("Bloom filter 尺寸不一致，無法合併")
+        merged = BloomFilter(self.bits, self.hashes)
+        merged.array = bytearray(own | theirs for own, theirs in zip(self.array, other.array))
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'bits': self.bits, 'hashes': self.hashes, 'array': base64.b64encode(bytes(self.array)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BloomFilter':
+        bloom = cls(data['bits'], data['hashes'])
+        bloom.array = bytearray(base64.b64decode(data['array']))
+        return bloom
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 1024, depth: int = 4):
+        """
+        Count-Min Sketch
+
+        估計值永不低估；以機率 1 - e^-depth，高估量不超過 (e / width) × 總計數
+
+        Args:
+            width: 每列計數器數量
+            depth: 雜湊列數
+        """
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = [[0] * width for _ in range(depth)]
+
+    @property
+    def error_bound(self) -> float:
+        """估計值的高估上限（絕對次數）"""
+        return math.e / self.width * self.total
+
+    @property
+    def confidence(self) -> float:
+        """誤差上限成立的機率"""
+        return 1 - math.exp(-self.depth)
+
+    def _indexes(self, token: str):
+        h1, h2 = _token_hashes(token)
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, token: str, count: int = 1):
+        """增加關鍵字計數"""
+        for row, index in enumerate(self._indexes(token)):
+            self.table[row][index] += count
+        self.total += count
+
+    def estimate(self, token: str) -> int:
+        """估計關鍵字出現次數"""
+        return min(self.table[row][index] for row, index in enumerate(self._indexes(token)))
+
+    def merge(self, other: 'CountMinSketch'):
+        """合併另一個相同尺寸的草圖"""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Count-Min Sketch 尺寸不一致，無法合併")
+        for row in range(self.depth):
+            own_row, other_row = self.table[row], other.table[row]
+            for index in range(self.width):
+                own_row[index] += other_row[index]
+        self.total += other.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'width': self.width, 'depth': self.depth, 'total': self.total, 'table': _encode_table(self.table)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CountMinSketch':
+        sketch = cls(width=data['width'], depth=data['depth'])
+        sketch.total = data['total']
+        sketch.table = _decode_table(data['table'], sketch.width, sketch.depth)
+        return sketch
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = 64):
+        """
+        Space-Saving 熱門詞摘要
+
+        最多保留 capacity 個計數器；任何出現次數超過 總計數 / capacity 的關鍵字必定被保留，
+        每個計數器同時記錄可能的高估量
+
+        Args:
+            capacity: 計數器數量
+        """
+        self.capacity = capacity
+        self.total = 0
+        self.counters: Dict[str, List[int]] = {}  # token -> [count, error]
+
+    def _min_count(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def add(self, token: str, count: int = 1):
+        """增加關鍵字計數"""
+        self.total += count
+        counter = self.counters.get(token)
+        if counter is not None:
+            counter[0] += count
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[token] = [count, 0]
+            return
+
+        # 取代計數最小的關鍵字，並把其計數記為誤差
+        evicted = min(self.counters, key=lambda key: self.counters[key][0])
+        min_count = self.counters.pop(evicted)[0]
+        self.counters[token] = [min_count + count, min_count]
+
+    def merge(self, other: 'SpaceSaving'):
+        """合併另一個摘要（可合併摘要的標準作法）"""
+        own_min, other_min = self._min_count(), other._min_count()
+        merged = {}
+        for token in set(self.counters) | set(other.counters):
+            own = self.counters.get(token, [own_min, own_min])
+            theirs = other.counters.get(token, [other_min, other_min])
+            merged[token] = [own[0] + theirs[0], own[1] + theirs[1]]
+
+        top = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(top)
+        self.total += other.total
+
+    def top(self, k: int = 10) -> List[Tuple[str, int, int]]:
+        """回傳前K名 (關鍵字, 計數, 誤差)"""
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [(token, count, error) for token, (count, error) in ranked]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'capacity': self.capacity, 'total': self.total, 'counters': self.counters}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SpaceSaving':
+        summary = cls(capacity=data['capacity'])
+        summary.total = data['total']
+        summary.counters = {token: list(counter) for token, counter in data['counters'].items()}
+        return summary
+
+
+class KeywordTrendSketch:
+    def __init__(self, width: int = 1024, depth: int = 4, capacity: int = 64, retention_days: Optional[int] = None):
+        """
+        初始化多日關鍵字熱度草圖
+
+        Args:
+            width: Count-Min Sketch 寬度
+            depth: Count-Min Sketch 深度
+            capacity: 每個桶的 Space-Saving 計數器數量
+            retention_days: 保留最近幾天的桶，None 表示不清除
+        """
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.retention_days = retention_days
+        # (category, day) -> {'counts': CountMinSketch, 'tokens': SpaceSaving, 'cashtags': SpaceSaving,
+        #                     'seen': 已計入推文ID的 BloomFilter}
+        self.buckets: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def _new_bucket(self) -> Dict[str, Any]:
+        return {
+            'counts': CountMinSketch(self.width, self.depth),
+            'tokens': SpaceSaving(self.capacity),
+            'cashtags': SpaceSaving(self.capacity),
+            'seen': BloomFilter()
+        }
+
+    def _bucket(self, category: str, day: str) -> Dict[str, Any]:
+        bucket = self.buckets.get((category, day))
+        if bucket is None:
+            bucket = self.buckets[(category, day)] = self._new_bucket()
+        return bucket
+
+    def update(self, category: str, day: str, tokens: Iterable[str]):
+        """將一條推文的關鍵字加入對應的 (類別, 日期) 桶"""
+        bucket = self._bucket(category, day)
+        for token in tokens:
+            bucket['counts'].add(token)
+            bucket['tokens'].add(token)
+            if token.startswith('$'):
+                bucket['cashtags'].add(token)
+
+    def ingest_tweets(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        爬取時逐條更新（依推文建立日期分桶，同一條推文只計算一次）
+
+        Returns:
+            新增的推文數量
+        """
+        added = 0
+        for category, tweets in tweets_data.items():
+            for tweet in tweets:
+                day = (tweet.get('created_at') or '')[:10] or 'unknown'
+                tweet_id = str(tweet.get('tweet_id', ''))
+                bucket = self._bucket(category, day)
+                if tweet_id and tweet_id in bucket['seen']:
+                    continue
+                self.update(category, day, extract_tokens(tweet.get('text', '')))
+                if tweet_id:
+                    bucket['seen'].add(tweet_id)
+                added += 1
+        self.prune()
+        return added
+
+    def prune(self):
+        """清除超過保留天數的桶"""
+        if not self.retention_days:
+            return
+        days = sorted({day for _, day in self.buckets})
+        keep = set(days[-self.retention_days:])
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if key[1] in keep}
+
+    def merge(self, other: 'KeywordTrendSketch'):
+        """
+        合併另一個草圖（例如另一天或另一個行程的結果）
+
+        只有本草圖沒有的桶會被加入；對方的桶已完全包含在本草圖時略過。
+        兩邊都有、內容又不同的桶無法以固定大小的紀錄判斷重疊的推文，
+        拋出 ValueError 而不是重複計數（先檢查全部的桶，不會合併到一半）
+        """
+        pending = []
+        for key, other_bucket in other.buckets.items():
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                pending.append((key, other_bucket))
+            elif not other_bucket['seen'].issubset(bucket['seen']):
+                raise ValueError(f"桶 {key} 兩邊都有不同的推文，無法確認沒有重疊；請將推文匯入同一個草圖")
+
+        for key, other_bucket in pending:
+            bucket = self._bucket(*key)
+            bucket['counts'].merge(other_bucket['counts'])
+            bucket['tokens'].merge(other_bucket['tokens'])
+            bucket['cashtags'].merge(other_bucket['cashtags'])
+            bucket['seen'] = bucket['seen'].union(other_bucket['seen'])
+
+    def top_k(self, k: int = 10, category: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None, kind: str = 'tokens') -> List[Dict[str, Any]]:
+        """
+        查詢時間窗口內的熱門關鍵字
+
+        Args:
+            k: 回傳數量
+            category: 類別，None 表示所有類別
+            start: 起始日期 (YYYY-MM-DD，含)
+            end: 結束日期 (YYYY-MM-DD，含)
+            kind: 'tokens' 或 'cashtags'
+
+        Returns:
+            依估計次數排序的列表，每項包含 token、count、error_bound
+        """
+        window = [
+            bucket for (bucket_category, day), bucket in self.buckets.items()
+            if (category is None or bucket_category == category)
+            and (start is None or day >= start)
+            and (end is None or day <= end)
+        ]
+        if not window:
+            return []
+
+        counts = CountMinSketch(self.width, self.depth)
+        candidates = SpaceSaving(self.capacity)
+        for bucket in window:
+            counts.merge(bucket['counts'])
+            candidates.merge(bucket[kind])
+
+        # 以 Space-Saving 挑出候選詞，再用合併後的 Count-Min Sketch 估計次數
+        ranked = sorted(
+            ((token, counts.estimate(token)) for token in candidates.counters),
+            key=lambda item: item[1],
+            reverse=True
+        )[:k]
+        return [
+            {'token': token, 'count': count, 'error_bound': round(counts.error_bound, 2)}
+            for token, count in ranked
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'capacity': self.capacity,
+            'retention_days': self.retention_days,
+            'buckets': [
+                {
+                    'category': category,
+                    'day': day,
+                    'counts': bucket['counts'].to_dict(),
+                    'tokens': bucket['tokens'].to_dict(),
+                    'cashtags': bucket['cashtags'].to_dict(),
+                    'seen': bucket['seen'].to_dict()
+                }
+                for (category, day), bucket in self.buckets.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KeywordTrendSketch':
+        sketch = cls(data['width'], data['depth'], data['capacity'], data.get('retention_days'))
+        for item in data['buckets']:
+            sketch.buckets[(item['category'], item['day'])] = {
+                'counts': CountMinSketch.from_dict(item['counts']),
+                'tokens': SpaceSaving.from_dict(item['tokens']),
+                'cashtags': SpaceSaving.from_dict(item['cashtags']),
+                'seen': BloomFilter.from_dict(item['seen'])
+            }
+        return sketch
+
+    def save(self, path: str = 'keyword_sketch_state.json'):
+        """保存草圖狀態"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = 'keyword_sketch_state.json', **kwargs) -> 'KeywordTrendSketch':
+        """載入草圖狀態，檔案不存在時建立新的草圖"""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+關鍵字分詞器 - 單次掃描整個語料庫
+使用預編譯的正則表達式，以向量化分組計數產生 (類別, 關鍵字) 詞頻表
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+
+# 關鍵字規則：Hashtag、Cashtag、全大寫縮寫、4個字元以上的單字
+TOKEN_PATTERN = re.compile(r'#\w+|\$\w+|\b[A-Z]{2,}\b|\b\w{4,}\b')
+
+# 預設過濾的常見詞彙
+DEFAULT_STOP_WORDS = frozenset({
+    'THE', 'AND', 'FOR', 'ARE', 'WITH', 'THIS', 'THAT', 'HAVE', 'FROM', 'THEY',
+    'BEEN', 'WILL', 'MORE', 'THAN', 'HTTPS', 'HTTP'
+})
+
+
+def extract_tokens(text: str, stop_words: Iterable[str] = DEFAULT_STOP_WORDS) -> List[str]:
+    """從單條推文提取關鍵字（供爬取時逐條更新使用）"""
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(str(text).upper()) if token not in stop_words]
+
+
+class KeywordTokenizer:
+    def __init__(self, stop_words: Optional[Iterable[str]] = None, min_frequency: int = 3):
+        """
+        初始化關鍵字分詞器
+
+        Args:
+            stop_words: 要過濾的常見詞彙（大寫），預設使用 DEFAULT_STOP_WORDS
+            min_frequency: 關鍵字最少出現次數
+        """
+        self.stop_words = frozenset(stop_words) if stop_words is not None else DEFAULT_STOP_WORDS
+        self.min_frequency = min_frequency
+
+    def tokenize(self, df: pd.DataFrame, text_column: str = 'text', category_column: str = 'category') -> pd.DataFrame:
+        """將整個語料一次分詞，回傳每個關鍵字一列的 (category, token) 表"""
+        if df.empty or text_column not in df.columns:
+            return pd.DataFrame(columns=[category_column, 'token'])
+
+        tokens = df[text_column].fillna('').astype(str).str.upper().str.findall(TOKEN_PATTERN)
+        exploded = pd.DataFrame({category_column: df[category_column].values, 'token': tokens.values}).explode('token')
+        exploded = exploded[exploded['token'].notna()]
+        return exploded[~exploded['token'].isin(self.stop_words)]
+
+    def count_tokens(self, df: pd.DataFrame, text_column: str = 'text', category_column: str = 'category') -> pd.DataFrame:
+        """
+        計算 (類別, 關鍵字) 詞頻表
+
+        Returns:
+            欄位為 category、token、count 的 DataFrame，各類別內依詞頻由高到低排序
+        """
+        tokens = self.tokenize(df, text_column, category_column)
+        if tokens.empty:
+            return pd.DataFrame(columns=[category_column, 'token', 'count'])
+
+        counts = (
+            tokens.groupby([category_column, 'token'], sort=False, observed=True)
+            .size()
+            .reset_index(name='count')
+        )
+        counts = counts[counts['count'] >= self.min_frequency]
+        # 穩定排序，同詞頻時保留首次出現的順序
+        return counts.sort_values([category_column, 'count'], ascending=[True, False], kind='mergesort').reset_index(drop=True)
+
+    def top_keywords(self, counts: pd.DataFrame, top_n: int = 10, categories: Optional[Iterable[str]] = None,
+                     category_column: str = 'category') -> Dict[str, List[tuple]]:
+        """從詞頻表取出各類別前N名關鍵字"""
+        result = {category: [] for category in categories} if categories is not None else {}
+        if counts.empty:
+            return result
+
+        top = counts.groupby(category_column, sort=False, observed=True).head(top_n)
+        for category, group in top.groupby(category_column, sort=False, observed=True):
+            result[category] = list(zip(group['token'], group['count'].astype(int)))
+        return result
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+模型延遲直方圖 - 以對數分桶記錄每個模型的回應時間
+提供分位數查詢，作為對沖請求（hedged request）的等待門檻
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Any, Optional
+
+# 0.1 秒到約 160 秒的對數分桶（每桶約放大 1.2 倍）
+DEFAULT_BOUNDS = [round(0.1 * 1.2 ** i, 3) for i in range(41)]
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: Optional[List[float]] = None, max_samples: int = 500):
+        """
+        初始化延遲直方圖
+
+        Args:
+            bounds: 各分桶的上限（秒），超過最後一個上限的樣本放在溢位桶
+            max_samples: 樣本數超過上限時所有計數減半，讓舊樣本逐漸淡出
+        """
+        self.bounds = bounds or DEFAULT_BOUNDS
+        self.max_samples = max_samples
+        self.counts = [0.0] * (len(self.bounds) + 1)
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        """記錄一次回應時間"""
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.total += 1
+        if self.total > self.max_samples:
+            self.counts = [count / 2 for count in self.counts]
+            self.total /= 2
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        估計分位數（回傳所在分桶的上限）
+
+        Args:
+            q: 0 到 1 之間的分位數，例如 0.95
+
+        Returns:
+            秒數；沒有樣本時回傳 None，落在溢位桶時回傳 inf
+        """
+        if not self.total:
+            return None
+        target = q * self.total
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return self.bounds[index] if index < len(self.bounds) else math.inf
+        return math.inf
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'bounds': self.bounds, 'max_samples': self.max_samples, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        histogram = cls(data['bounds'], data['max_samples'])
+        histogram.counts = data['counts']
+        histogram.total = sum(histogram.counts)
+        return histogram
+
+
+class ModelLatencyTracker:
+    def __init__(self, min_samples: int = 20, default_threshold: float = 8.0):
+        """
+        初始化各模型的延遲追蹤
+
+        Args:
+            min_samples: 樣本數不足時使用預設門檻
+            default_threshold: 預設的等待門檻（秒）
+        """
+        self.min_samples = min_samples
+        self.default_threshold = default_threshold
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        # 對沖請求會從多個執行緒同時記錄
+        self.lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        with self.lock:
+            self.histograms.setdefault(model, LatencyHistogram()).record(seconds)
+
+    def threshold(self, model: str, q: float = 0.95) -> float:
+        """模型回應時間的分位數，樣本不足時回傳預設門檻"""
+        with self.lock:
+            histogram = self.histograms.get(model)
+            if histogram is None or histogram.total < self.min_samples:
+                return self.default_threshold
+            return histogram.percentile(q)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """各模型的樣本數與 p50/p95"""
+        with self.lock:
+            return {
+                model: {
+                    'samples': round(histogram.total, 1),
+                    'p50': histogram.percentile(0.5),
+                    'p95': histogram.percentile(0.95)
+                }
+                for model, histogram in self.histograms.items()
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'min_samples': self.min_samples,
+                'default_threshold': self.default_threshold,
+                'histograms': {model: histogram.to_dict() for model, histogram in self.histograms.items()}
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ModelLatencyTracker':
+        tracker = cls(data['min_samples'], data['default_threshold'])
+        tracker.histograms = {
+            model: LatencyHistogram.from_dict(item) for model, item in data['histograms'].items()
+        }
+        return tracker
+
+    def save(self, path: str = 'model_latency_state.json'):
+        """保存延遲直方圖"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = 'model_latency_state.json', **kwargs) -> 'ModelLatencyTracker':
+        """載入延遲直方圖，檔案不存在時建立新的追蹤器"""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+LINE Messaging API 客戶端 - 共用連線池的 Session
+明確的連線/讀取逾時，429/5xx 以帶抖動的指數退避重試並遵守 Retry-After，
+每次推送帶 X-Line-Retry-Key，重試不會造成重複發送
+"""
+
+import logging
+import random
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Any, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Messaging API 單次 multicast 的收件人上限
+MULTICAST_LIMIT = 500
+
+# 單次推送請求最多包含的訊息數
+MAX_MESSAGES_PER_REQUEST = 5
+
+
+def derive_retry_key(retry_key: str, index: int) -> str:
+    """由一次發送的 retry key 推導第 index 個請求的 key（重送時每個請求沿用相同的 key）"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{retry_key}:{index}"))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 標頭（秒數或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LineClient:
+    def __init__(self, access_token: str, api_base: str = "https://api.line.me",
+                 timeout: Tuple[float, float] = (3.05, 10), max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_cap: float = 30.0, pool_size: int = 10):
+        """
+        初始化LINE客戶端
+
+        Args:
+            access_token: LINE Channel Access Token
+            api_base: API網址（可指向本地測試伺服器）
+            timeout: (連線逾時, 讀取逾時) 秒數
+            max_retries: 429/5xx/連線錯誤的最多重試次數
+            backoff_base: 指數退避的基本等待秒數
+            backoff_cap: 單次等待的上限秒數
+            pool_size: 連線池大小
+        """
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.logger = logging.getLogger(__name__)
+
+        # 重試由 post 自行處理（需要遵守 Retry-After 並保留同一個 retry key）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        })
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重試前的等待秒數（full jitter；有 Retry-After 時至少等待該秒數）"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+    def post(self, path: str, payload: Dict[str, Any], retry_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        發送 API 請求，429/5xx 與連線錯誤自動重試
+
+        同一次請求的所有重試使用同一個 X-Line-Retry-Key；
+        LINE 回傳 409 表示該 key 已被接受過，視為成功
+
+        Returns:
+            包含 ok、status、attempts、seconds、retry_key、error 的字典
+        """
+        retry_key = retry_key or str(uuid.uuid4())
+        headers = {'X-Line-Retry-Key': retry_key}
+        start = time.perf_counter()
+        status, error = None, None
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(f"{self.api_base}{path}", json=payload, headers=headers, timeout=self.timeout)
+                status = response.status_code
+                if status == 200 or status == 409:
+                    return {
+                        'ok': True, 'status': status, 'attempts': attempt + 1,
+                        'seconds': time.perf_counter() - start, 'retry_key': retry_key, 'error': None
+                    }
+                error = response.text[:200]
+                if status not in RETRY_STATUS_CODES:
+                    break
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                status, error = None, str(e)
+
+            if attempt < self.max_retries:
+                delay = self.backoff(attempt, retry_after)
+                self.logger.warning(f"LINE API {status or '連線錯誤'}，{delay:.1f} 秒後重試 ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+        return {
+            'ok': False, 'status': status, 'attempts': attempt + 1,
+            'seconds': time.perf_counter() - start, 'retry_key': retry_key, 'error': error
+        }
+
+    def post_in_order(self, path: str, to: Any, messages: List[Dict[str, Any]],
+                      retry_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        訊息超過單次上限時拆成多個請求，依序在同一條保持連線上發送
+
+        請求內容事先序列化好，前一個請求完成後立即送出下一個；
+        任一請求失敗即停止，避免後面的段落先於前面的段落送達。
+        重送時已被接受的請求會得到 409，視為成功
+
+        Returns:
+            與 post 相同格式的字典，另含 requests（成功的請求數）
+        """
+        if len(messages) <= MAX_MESSAGES_PER_REQUEST:
+            return dict(self.post(path, {'to': to, 'messages': messages}, retry_key), requests=1)
+
+        retry_key = retry_key or str(uuid.uuid4())
+        chunks = [messages[i:i + MAX_MESSAGES_PER_REQUEST] for i in range(0, len(messages), MAX_MESSAGES_PER_REQUEST)]
+        payloads = [{'to': to, 'messages': chunk} for chunk in chunks]
+        attempts, seconds, result = 0, 0.0, None
+        for index, payload in enumerate(payloads):
+            result = self.post(path, payload, derive_retry_key(retry_key, index))
+            attempts += result['attempts']
+            seconds += result['seconds']
+            if not result['ok']:
+                return dict(result, attempts=attempts, seconds=seconds, retry_key=retry_key, requests=index)
+        return dict(result, attempts=attempts, seconds=seconds, retry_key=retry_key, requests=len(payloads))
+
+    def push(self, to: str, messages: List[Dict[str, Any]], retry_key: Optional[str] = None) -> Dict[str, Any]:
+        """推送訊息給單一用戶"""
+        return self.post_in_order('/v2/bot/message/push', to, messages, retry_key)
+
+    def multicast(self, to: List[str], messages: List[Dict[str, Any]], retry_key: Optional[str] = None) -> Dict[str, Any]:
+        """推送訊息給多位用戶（每次最多 MULTICAST_LIMIT 位）"""
+        return self.post_in_order('/v2/bot/message/multicast', to, messages, retry_key)
+
+    def close(self):
+        self.session.close()
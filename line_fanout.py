@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+LINE 多收件人發送 - 將收件人分批為 multicast 請求
+各批次在速率限制下平行發送，並回報每批的延遲與失敗
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from line_client import LineClient, MULTICAST_LIMIT, derive_retry_key
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Token bucket 速率限制（執行緒安全）
+
+        Args:
+            rate: 每秒允許的請求數
+            burst: 可累積的最大請求數
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個請求額度，額度不足時等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def deliver_multicast(client: LineClient, recipients: List[str], messages: List[Dict[str, Any]],
+                      batch_size: int = MULTICAST_LIMIT, max_workers: int = 8, rate: float = 100.0,
+                      retry_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    將訊息發送給多位收件人
+
+    Args:
+        client: LINE 客戶端（連線池大小應不小於 max_workers）
+        recipients: 收件人 User ID 列表（重複的會被移除）
+        messages: 訊息物件列表
+        batch_size: 每次 multicast 的收件人數量
+        max_workers: 同時進行的批次數量
+        rate: 每秒最多發出的 multicast 請求數
+        retry_key: 整次發送的 retry key，用於推導各批次的 X-Line-Retry-Key
+
+    Returns:
+        包含 batches（每批的收件人數、結果、延遲）、recipients、delivered、failed、seconds 的字典
+    """
+    recipients = list(dict.fromkeys(recipients))
+    batch_size = min(batch_size, MULTICAST_LIMIT)
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+    limiter = RateLimiter(rate, burst=max_workers)
+    start = time.perf_counter()
+
+    def send(index: int) -> Dict[str, Any]:
+        limiter.acquire()
+        batch_key = derive_retry_key(retry_key, index) if retry_key else None
+        result = client.multicast(batches[index], messages, batch_key)
+        return dict(result, batch=index, recipients=len(batches[index]))
+
+    if len(batches) <= 1 or max_workers <= 1:
+        results = [send(index) for index in range(len(batches))]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(send, range(len(batches))))
+
+    delivered = sum(result['recipients'] for result in results if result['ok'])
+    return {
+        'batches': results,
+        'recipients': len(recipients),
+        'delivered': delivered,
+        'failed': len(recipients) - delivered,
+        'seconds': time.perf_counter() - start
+    }
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+LINE 發送佇列 - 將待發送的訊息保存在 SQLite，由背景執行緒負責投遞
+至少一次（at-least-once）投遞：每則訊息帶固定的 X-Line-Retry-Key，
+失敗以指數退避重試，超過次數進入 dead 狀態；程式重啟後會接續未完成的項目
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional
+
+from line_client import LineClient
+from line_fanout import deliver_multicast
+
+# 投遞中的項目若超過租約時間仍未回報（例如行程中止），會重新投遞
+LEASE_SECONDS = 300
+
+
+def report_key(text: str, recipients: List[str]) -> str:
+    """以內容與收件人推導冪等鍵（UUID 格式，可直接作為 X-Line-Retry-Key）"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, json.dumps([text, sorted(recipients)], ensure_ascii=False)))
+
+
+class LineOutbox:
+    def __init__(self, db_path: str = 'line_outbox.db', max_attempts: int = 8,
+                 backoff_base: float = 30.0, backoff_cap: float = 3600.0):
+        """
+        初始化發送佇列
+
+        Args:
+            db_path: SQLite 資料庫路徑（排程器與爬蟲行程共用）
+            max_attempts: 最多投遞次數，超過後進入 dead 狀態
+            backoff_base: 第一次重試前的等待秒數，之後每次加倍
+            backoff_cap: 重試等待的上限秒數
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """建立資料表"""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS line_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    recipients TEXT NOT NULL,
+                    messages TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    lease_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_line_outbox_due ON line_outbox (status, next_attempt_at)")
+
+    def enqueue(self, recipients: List[str], messages: List[Dict[str, Any]],
+                idempotency_key: Optional[str] = None) -> str:
+        """
+        加入待發送的訊息（相同冪等鍵只會加入一次）
+
+        Returns:
+            冪等鍵
+        """
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR IGNORE INTO line_outbox
+                    (idempotency_key, recipients, messages, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (idempotency_key, json.dumps(recipients), json.dumps(messages, ensure_ascii=False), now, now, now))
+        return idempotency_key
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        取出一個到期的項目並標記為投遞中
+
+        單一 UPDATE ... RETURNING 完成，多個行程同時取件也不會重複；
+        租約過期的投遞中項目視為中斷，重新取出
+
+        Returns:
+            項目字典；沒有到期項目時回傳 None
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute("""
+                UPDATE line_outbox
+                SET status = 'sending', lease_until = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM line_outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'sending' AND lease_until < ?)
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, idempotency_key, recipients, messages, attempts
+            """, (now + LEASE_SECONDS, now, now, now)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'idempotency_key': row[1],
+            'recipients': json.loads(row[2]),
+            'messages': json.loads(row[3]),
+            'attempts': row[4]
+        }
+
+    def mark_delivered(self, entry_id: int):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                UPDATE line_outbox SET status = 'delivered', lease_until = NULL, last_error = NULL, updated_at = ?
+                WHERE id = ?
+            """, (time.time(), entry_id))
+
+    def mark_failed(self, entry_id: int, attempts: int, error: str) -> str:
+        """
+        記錄投遞失敗，安排重試或進入 dead 狀態
+
+        Returns:
+            新的狀態（pending 或 dead）
+        """
+        now = time.time()
+        status = 'dead' if attempts >= self.max_attempts else 'pending'
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1))
+        with self.lock, self.conn:
+            self.conn.execute("""
+                UPDATE line_outbox
+                SET status = ?, lease_until = NULL, last_error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE id = ?
+            """, (status, error[:500], now + delay, now, entry_id))
+        return status
+
+    def retry_dead(self) -> int:
+        """將 dead 狀態的項目重新排入佇列（重置投遞次數）"""
+        with self.lock, self.conn:
+            return self.conn.execute("""
+                UPDATE line_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ?
+                WHERE status = 'dead'
+            """, (time.time(), time.time())).rowcount
+
+    def purge_delivered(self, older_than_days: float = 30) -> int:
+        """刪除送達超過指定天數的項目（冪等鍵在此期間內仍可防止重複排入）"""
+        with self.lock, self.conn:
+            return self.conn.execute("""
+                DELETE FROM line_outbox WHERE status = 'delivered' AND updated_at < ?
+            """, (time.time() - older_than_days * 86400,)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """各狀態的項目數量"""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM line_outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def next_due(self) -> Optional[float]:
+        """最近一個待投遞項目的到期時間"""
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT MIN(CASE WHEN status = 'pending' THEN next_attempt_at ELSE lease_until END)
+                FROM line_outbox WHERE status IN ('pending', 'sending')
+            """).fetchone()
+        return row[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class OutboxWorker(threading.Thread):
+    def __init__(self, outbox: LineOutbox, client: LineClient, poll_interval: float = 5.0,
+                 exit_when_idle: bool = False):
+        """
+        背景投遞執行緒
+
+        Args:
+            outbox: 發送佇列
+            client: LINE 客戶端
+            poll_interval: 沒有到期項目時的輪詢間隔（秒）
+            exit_when_idle: 沒有立即可投遞的項目時結束（用於單次執行的行程，
+                            尚在退避中的項目留給排程器的常駐執行緒）
+        """
+        super().__init__(name='line-outbox-worker', daemon=not exit_when_idle)
+        self.outbox = outbox
+        self.client = client
+        self.poll_interval = poll_interval
+        self.exit_when_idle = exit_when_idle
+        self.logger = logging.getLogger(__name__)
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        # 投遞結果計數（監控端點使用）
+        self.stats = {'delivered': 0, 'retry': 0, 'dead': 0}
+
+    def deliver(self, entry: Dict[str, Any]) -> Optional[str]:
+        """
+        投遞一個項目
+
+        Returns:
+            失敗原因；成功時回傳 None
+        """
+        recipients, messages, key = entry['recipients'], entry['messages'], entry['idempotency_key']
+        if len(recipients) > 1:
+            summary = deliver_multicast(self.client, recipients, messages, retry_key=key)
+            failed = [batch for batch in summary['batches'] if not batch['ok']]
+            if failed:
+                return f"{summary['failed']}/{summary['recipients']} 位收件人失敗: {failed[0]['status']} {failed[0]['error']}"
+            return None
+        result = self.client.push(recipients[0], messages, key)
+        return None if result['ok'] else f"{result['status']} {result['error']}"
+
+    def run_once(self) -> bool:
+        """
+        投遞一個到期項目
+
+        Returns:
+            是否有取出項目
+        """
+        entry = self.outbox.claim()
+        if entry is None:
+            return False
+        try:
+            error = self.deliver(entry)
+        except Exception as e:
+            error = str(e)
+
+        if error is None:
+            self.outbox.mark_delivered(entry['id'])
+            self.stats['delivered'] += 1
+            self.logger.info(f"✅ 佇列訊息 {entry['idempotency_key'][:8]} 已送達 ({entry['attempts']} 次投遞)")
+        else:
+            status = self.outbox.mark_failed(entry['id'], entry['attempts'], error)
+            self.stats['dead' if status == 'dead' else 'retry'] += 1
+            level = self.logger.error if status == 'dead' else self.logger.warning
+            level(f"佇列訊息 {entry['idempotency_key'][:8]} 投遞失敗 ({entry['attempts']} 次): {error}"
+                  + ("，已移入 dead 狀態" if status == 'dead' else ""))
+        return True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                self.logger.error(f"發送佇列錯誤: {str(e)}")
+            if self.exit_when_idle:
+                return
+            self.wake_event.wait(self.poll_interval)
+            self.wake_event.clear()
+
+    def wake(self):
+        """有新項目時立即處理"""
+        self.wake_event.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.join(timeout)
+
+
+def main():
+    # 查看或處理發送佇列：python3 line_outbox.py [--retry-dead] [--drain]
+    import sys
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    outbox = LineOutbox()
+    if '--retry-dead' in sys.argv[1:]:
+        print(f"🔁 重新排入 {outbox.retry_dead()} 個 dead 項目")
+    if '--drain' in sys.argv[1:]:
+        token = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
+        if not token:
+            print("⚠️ 缺少 LINE_CHANNEL_ACCESS_TOKEN，無法投遞")
+        else:
+            client = LineClient(token, api_base=os.getenv('LINE_API_BASE', 'https://api.line.me'))
+            worker = OutboxWorker(outbox, client, exit_when_idle=True)
+            worker.start()
+            worker.join()
+    print(f"📮 LINE 發送佇列: {outbox.counts()}")
+
+if __name__ == "__main__":
+    main()
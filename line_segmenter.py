@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+LINE 訊息分段 - 依報告的段落標題（🔥/📊/💡/⚠️）切分長報告
+每則訊息不超過 LINE 的字數上限，並以最少的訊息數量打包
+"""
+
+import re
+from typing import Dict, List, Any
+
+# LINE 文字訊息的字數上限（以 UTF-16 字元計算，表情符號可能佔2個字元）
+MAX_TEXT_LENGTH = 5000
+
+SECTION_PATTERN = re.compile(r'^(?=🔥|📊|💡|⚠)', re.MULTILINE)
+
+
+def text_length(text: str) -> int:
+    """LINE 計算的字數（UTF-16 字元數）"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def split_sections(report: str) -> List[str]:
+    """在段落標題前切分（標題前的日期行歸入第一段）"""
+    return [section.strip() for section in SECTION_PATTERN.split(report) if section.strip()]
+
+
+def _split_oversized(text: str, max_length: int) -> List[str]:
+    """超過上限的單一段落：先依行切分，單行仍過長時硬切"""
+    pieces, current = [], ''
+    for line in text.split('\n'):
+        while text_length(line) > max_length:
+            cut = max_length
+            while text_length(line[:cut]) > max_length:
+                cut -= 1
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if text_length(candidate) > max_length:
+            pieces.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def segment_report(report: str, max_length: int = MAX_TEXT_LENGTH) -> List[str]:
+    """
+    將報告切分為符合字數上限的訊息
+
+    依序合併段落，直到加入下一段會超過上限時才開新訊息，
+    因此一般長度的報告仍是一則訊息
+
+    Returns:
+        訊息文字列表（保持原本的段落順序）
+    """
+    segments, current = [], ''
+    for section in split_sections(report):
+        parts = _split_oversized(section, max_length) if text_length(section) > max_length else [section]
+        for part in parts:
+            candidate = f"{current}\n\n{part}" if current else part
+            if text_length(candidate) > max_length:
+                segments.append(current)
+                current = part
+            else:
+                current = candidate
+    if current:
+        segments.append(current)
+    return segments
+
+
+def build_text_messages(report: str, max_length: int = MAX_TEXT_LENGTH) -> List[Dict[str, Any]]:
+    """將報告轉為 LINE 文字訊息物件列表"""
+    return [{'type': 'text', 'text': segment} for segment in segment_report(report, max_length)]
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+本地 LINE Messaging API 測試伺服器 - 實作 push、multicast、broadcast
+可設定延遲、速率限制（429）與隨機錯誤，並驗證訊息數量與字數上限，
+搭配 --benchmark 以 Web3NewsReporter 實際發送，測量每秒訊息數與尾端延遲
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+
+from line_client import MULTICAST_LIMIT, MAX_MESSAGES_PER_REQUEST
+from line_segmenter import MAX_TEXT_LENGTH, text_length
+
+ENDPOINTS = {
+    '/v2/bot/message/push': 'push',
+    '/v2/bot/message/multicast': 'multicast',
+    '/v2/bot/message/broadcast': 'broadcast'
+}
+
+
+class LineStubConfig:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, rate_limit: Optional[float] = None,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0, retry_after: Optional[float] = None,
+                 seed: int = 42):
+        """
+        測試伺服器設定
+
+        Args:
+            latency: 基本回應延遲（秒）
+            jitter: 延遲的隨機浮動範圍（秒）
+            rate_limit: 每秒允許的請求數，超過時回傳 429（None 表示不限制）
+            throttle_rate: 隨機回傳 429 的機率
+            error_rate: 隨機回傳 500 的機率
+            retry_after: 429 回應附帶的 Retry-After 秒數
+            seed: 亂數種子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate_limit or 0.0
+        self.updated = time.monotonic()
+        self.accepted_keys: Dict[str, str] = {}
+        self.stats = {
+            'requests': 0, 'accepted': 0, 'messages': 0, 'deliveries': 0,
+            'duplicates': 0, 'invalid': 0, 'throttled': 0, 'errors': 0
+        }
+
+    def draw(self) -> Tuple[float, Optional[int]]:
+        """決定本次請求的延遲與注入的錯誤（429、500 或 None）"""
+        with self.lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.updated) * self.rate_limit)
+                self.updated = now
+                if self.tokens < 1:
+                    self.stats['throttled'] += 1
+                    return delay, 429
+                self.tokens -= 1
+            roll = self.random.random()
+            if roll < self.throttle_rate:
+                self.stats['throttled'] += 1
+                return delay, 429
+            if roll < self.throttle_rate + self.error_rate:
+                self.stats['errors'] += 1
+                return delay, 500
+            return delay, None
+
+    def accept(self, retry_key: Optional[str], messages: int, recipients: int) -> Optional[str]:
+        """
+        記錄已接受的請求
+
+        Returns:
+            相同 retry key 已被接受過時回傳先前的 request id，否則回傳 None
+        """
+        with self.lock:
+            if retry_key and retry_key in self.accepted_keys:
+                self.stats['duplicates'] += 1
+                return self.accepted_keys[retry_key]
+            if retry_key:
+                self.accepted_keys[retry_key] = uuid.uuid4().hex
+            self.stats['accepted'] += 1
+            self.stats['messages'] += messages
+            self.stats['deliveries'] += messages * recipients
+            return None
+
+    def count_invalid(self):
+        with self.lock:
+            self.stats['invalid'] += 1
+
+
+def validate_request(endpoint: str, body: Any, retry_key: Optional[str]) -> Optional[str]:
+    """依 Messaging API 規則驗證請求，回傳錯誤訊息；合法時回傳 None"""
+    if not isinstance(body, dict):
+        return 'The request body has 1 error(s)'
+    if retry_key is not None:
+        try:
+            uuid.UUID(retry_key)
+        except ValueError:
+            return 'The retry key must be a UUID'
+
+    messages = body.get('messages')
+    if not isinstance(messages, list) or not 1 <= len(messages) <= MAX_MESSAGES_PER_REQUEST:
+        return f'Size must be between 1 and {MAX_MESSAGES_PER_REQUEST}'
+    for message in messages:
+        if not isinstance(message, dict) or message.get('type') != 'text':
+            return 'Only text messages are supported by this stub'
+        text = message.get('text')
+        if not isinstance(text, str) or not text:
+            return 'May not be empty'
+        if text_length(text) > MAX_TEXT_LENGTH:
+            return f'Length must be between 0 and {MAX_TEXT_LENGTH}'
+
+    if endpoint == 'push' and (not isinstance(body.get('to'), str) or not body['to']):
+        return 'The property, \'to\', in the request body is invalid'
+    if endpoint == 'multicast':
+        to = body.get('to')
+        if not isinstance(to, list) or not 1 <= len(to) <= MULTICAST_LIMIT:
+            return f'Size must be between 1 and {MULTICAST_LIMIT}'
+    return None
+
+
+class LineStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: LineStubConfig = None
+    # broadcast 的收件人數（用於計算投遞量）
+    broadcast_audience = 1000
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.config.lock:
+                self.send_json(200, dict(self.config.stats))
+        else:
+            self.send_json(404, {'message': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        endpoint = ENDPOINTS.get(self.path)
+        if endpoint is None:
+            self.send_json(404, {'message': 'Not found'})
+            return
+        if not (self.headers.get('Authorization') or '').startswith('Bearer '):
+            self.config.count_invalid()
+            self.send_json(401, {'message': 'Authentication failed due to the following reason: no token'})
+            return
+
+        retry_key = self.headers.get('X-Line-Retry-Key')
+        try:
+            body = json.loads(raw or b'null')
+        except ValueError:
+            body = None
+        error = validate_request(endpoint, body, retry_key)
+        if error:
+            self.config.count_invalid()
+            self.send_json(400, {'message': 'The request body has 1 error(s)', 'details': [{'message': error}]})
+            return
+
+        delay, status = self.config.draw()
+        time.sleep(delay)
+        if status == 429:
+            headers = {'Retry-After': str(self.config.retry_after)} if self.config.retry_after is not None else None
+            self.send_json(429, {'message': 'The API rate limit has been exceeded. Try again later.'}, headers)
+            return
+        if status == 500:
+            self.send_json(500, {'message': 'Internal server error'})
+            return
+
+        recipients = {'push': 1, 'multicast': len(body.get('to', [])), 'broadcast': self.broadcast_audience}[endpoint]
+        accepted = self.config.accept(retry_key, len(body['messages']), recipients)
+        if accepted is not None:
+            self.send_json(409, {'message': 'The retry key is already accepted'},
+                           {'x-line-accepted-request-id': accepted})
+            return
+        self.send_json(200, {}, {'x-line-request-id': uuid.uuid4().hex})
+
+
+def start_server(config: LineStubConfig, host: str = '127.0.0.1', port: int = 8090) -> ThreadingHTTPServer:
+    """在背景執行緒啟動測試伺服器（port=0 時自動選擇可用埠號）"""
+    handler = type('ConfiguredLineStubHandler', (LineStubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sample_report(sections: int = 4, lines_per_section: int = 40) -> str:
+    """產生包含各段落標題的測試報告"""
+    headings = ['🔥 **今日熱點**', '📊 **各賽道觀察**', '💡 **市場洞察**', '⚠️ **風險提醒**']
+    parts = ['📅 **Web3 市場動態（測試）**']
+    for index in range(sections):
+        body = "\n".join(f"- 第 {line + 1} 點：$ETH $SOL 測試內容" + "。" * 20 for line in range(lines_per_section))
+        parts.append(f"{headings[index % len(headings)]}\n{body}")
+    return "\n\n".join(parts)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_benchmark(server: ThreadingHTTPServer, runs: int, recipients: int, report: str):
+    """以 Web3NewsReporter 重複發送報告，統計每秒訊息數與尾端延遲"""
+    from news_reporter import Web3NewsReporter
+
+    host, port = server.server_address[:2]
+    user_ids = [f"U{index:032x}" for index in range(recipients)]
+    reporter = Web3NewsReporter(
+        openai_api_key='stub-key',
+        line_access_token='stub-token',
+        line_user_id=user_ids[0],
+        use_cache=False,
+        line_api_base=f"http://{host}:{port}",
+        line_recipients=user_ids,
+        use_outbox=False
+    )
+    message_count = len(reporter.build_line_messages(report))
+
+    latencies, failures = [], 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        send_start = time.perf_counter()
+        if not reporter.send_to_line(report):
+            failures += 1
+        latencies.append(time.perf_counter() - send_start)
+    elapsed = time.perf_counter() - start
+
+    stats = server.RequestHandlerClass.config.stats
+    print(f"\n📊 {runs} 次發送，{recipients} 位收件人，每次 {message_count} 則訊息")
+    print(f"   每秒投遞訊息數: {stats['deliveries'] / elapsed:,.0f} (共 {stats['deliveries']:,} 則)")
+    print(f"   每秒 API 請求數: {stats['requests'] / elapsed:,.1f}")
+    print(f"   每次發送延遲 p50: {percentile(latencies, 0.5):.3f}s  p95: {percentile(latencies, 0.95):.3f}s  "
+          f"p99: {percentile(latencies, 0.99):.3f}s  最慢: {max(latencies):.3f}s")
+    print(f"   失敗: {failures}")
+    print(f"   伺服器統計: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 LINE Messaging API 測試伺服器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.05, help='基本回應延遲（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延遲的隨機浮動範圍（秒）')
+    parser.add_argument('--rate-limit', type=float, default=None, help='每秒允許的請求數，超過回傳 429')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='隨機回傳 429 的機率')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='隨機回傳 500 的機率')
+    parser.add_argument('--retry-after', type=float, default=None, help='429 回應的 Retry-After 秒數')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--benchmark', type=int, default=0, metavar='RUNS', help='以測試報告發送 RUNS 次並輸出統計')
+    parser.add_argument('--recipients', type=int, default=1, help='測試的收件人數量')
+    parser.add_argument('--report-file', help='測試用的報告檔案（預設產生測試報告）')
+    args = parser.parse_args()
+
+    config = LineStubConfig(args.latency, args.jitter, args.rate_limit, args.throttle_rate,
+                            args.error_rate, args.retry_after, args.seed)
+    server = start_server(config, args.host, args.port)
+    print(f"🧪 LINE 測試伺服器: http://{args.host}:{server.server_address[1]}")
+
+    if args.benchmark:
+        if args.report_file:
+            with open(args.report_file, 'r', encoding='utf-8') as f:
+                report = f.read()
+        else:
+            report = sample_report()
+        run_benchmark(server, args.benchmark, args.recipients, report)
+        server.shutdown()
+        return
+
+    print("   以 line_api_base 指向此網址即可使用，Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+OpenAI 回應快取 - 以模型、系統提示、使用者提示與參數的雜湊為鍵
+重跑相同推文（測試腳本、LINE 發送失敗後重試）時直接回傳已保存的報告
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, **params) -> str:
+    """計算快取鍵值（參數順序不影響結果）"""
+    payload = json.dumps({
+        'model': model,
+        'system': system_prompt,
+        'user': user_prompt,
+        'params': params
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, db_path: str = 'llm_cache.db', ttl_hours: Optional[float] = 24,
+                 max_entries: int = 500, max_bytes: int = 20 * 1024 * 1024):
+        """
+        初始化回應快取
+
+        Args:
+            db_path: SQLite 資料庫路徑
+            ttl_hours: 回應的有效時數，None 表示不過期
+            max_entries: 最多保留的回應數量
+            max_bytes: 回應內容總大小上限（位元組）
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_hours * 3600 if ttl_hours else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # 報告器會從多個執行緒同時查詢，以鎖保護共用連線
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """建立資料表"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            # 跨行程累計的命中統計
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    def _count(self, name: str):
+        self.conn.execute("""
+            INSERT INTO llm_cache_stats (name, value) VALUES (?, 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1
+        """, (name,))
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查詢快取
+
+        Returns:
+            已保存的回應；未命中或已過期時回傳 None
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._count('expired')
+                row = None
+
+            if row is None:
+                self._count('misses')
+                return None
+
+            self.conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count('hits')
+            return row[0]
+
+    def set(self, key: str, model: str, response: str):
+        """保存回應，並依數量與大小上限淘汰最久未使用的項目"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, response, len(response.encode('utf-8')), now, now))
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        清除過期項目，並淘汰最久未使用的項目直到符合上限
+
+        Returns:
+            清除的項目數量
+        """
+        removed = 0
+        if self.ttl_seconds is not None:
+            removed += self.conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+
+        entries, total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return removed
+
+        stale = []
+        for key, size in self.conn.execute("SELECT key, size FROM llm_responses ORDER BY last_access"):
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            stale.append((key,))
+            entries -= 1
+            total_bytes -= size
+        self.conn.executemany("DELETE FROM llm_responses WHERE key = ?", stale)
+        for _ in stale:
+            self._count('evictions')
+        return removed + len(stale)
+
+    def prune(self) -> int:
+        """
+        清除過期與超出上限的項目（定期清理任務使用）
+
+        Returns:
+            清除的項目數量
+        """
+        with self.lock, self.conn:
+            return self.evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """回傳命中統計與目前的快取大小"""
+        with self.lock:
+            counters = dict(self.conn.execute("SELECT name, value FROM llm_cache_stats").fetchall())
+            entries, total_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'expired': counters.get('expired', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+    def clear(self):
+        """清空快取與統計"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM llm_responses")
+            self.conn.execute("DELETE FROM llm_cache_stats")
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    # 查看快取狀態：python3 llm_cache.py [--clear]
+    import sys
+    cache = LLMResponseCache()
+    if '--clear' in sys.argv[1:]:
+        cache.clear()
+        print("🗑️ 已清空 OpenAI 回應快取")
+    stats = cache.stats()
+    print("📦 OpenAI 回應快取")
+    print(f"   命中: {stats['hits']}  未命中: {stats['misses']}  命中率: {stats['hit_rate']:.1%}")
+    print(f"   過期: {stats['expired']}  淘汰: {stats['evictions']}")
+    print(f"   項目: {stats['entries']}  大小: {stats['bytes'] / 1024:.1f} KB")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+健康檢查與監控指標 - 在排程器內以背景執行緒提供 HTTP 端點
+/healthz（存活）、/readyz（就緒）、/metrics（Prometheus 文字格式）
+指標在抓取時從各狀態檔彙整，不影響排程主循環
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# 導入LLM延遲追蹤
+try:
+    from latency_histogram import ModelLatencyTracker
+    LATENCY_TRACKER_AVAILABLE = True
+except ImportError:
+    LATENCY_TRACKER_AVAILABLE = False
+
+# 導入LINE發送佇列
+try:
+    from line_outbox import LineOutbox
+    LINE_OUTBOX_AVAILABLE = True
+except ImportError:
+    LINE_OUTBOX_AVAILABLE = False
+
+# 爬蟲行程寫入、排程器讀取的本次執行統計
+RUN_METRICS_FILE = 'run_metrics.json'
+
+_run_metrics_lock = threading.Lock()
+
+# (名稱, 類型, 說明, [(標籤, 值)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def record_run_metrics(section: str, values: Dict[str, Any], path: str = RUN_METRICS_FILE):
+    """
+    記錄執行統計（由爬蟲或流程呼叫）
+
+    Args:
+        section: 統計區塊，例如 tweets_fetched、twitter_rate_limit
+        values: 區塊內容（覆蓋同名區塊）
+        path: 統計檔路徑
+    """
+    with _run_metrics_lock:
+        data = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        data[section] = dict(values, updated_at=time.time())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def format_metrics(families: List[MetricFamily]) -> str:
+    """輸出 Prometheus 文字格式"""
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            sample_name = f"{name}{{{label_text}}}" if label_text else name
+            lines.append(f"{sample_name} {_format_value(float(value))}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsCollector:
+    def __init__(self, job_store_path: str = 'scheduler_jobs.json', artifact_dir: str = 'pipeline_artifacts',
+                 run_metrics_path: str = RUN_METRICS_FILE, latency_path: str = 'model_latency_state.json',
+                 outbox_db: str = 'line_outbox.db', outbox_worker=None):
+        """
+        從狀態檔彙整指標
+
+        Args:
+            job_store_path: 排程任務紀錄
+            artifact_dir: 流程產物目錄（讀取各流程的 last_run.json）
+            run_metrics_path: 爬蟲寫入的執行統計
+            latency_path: LLM 延遲直方圖
+            outbox_db: LINE 發送佇列資料庫
+            outbox_worker: 排程器內的投遞執行緒（提供投遞結果計數）
+        """
+        self.job_store_path = job_store_path
+        self.artifact_dir = artifact_dir
+        self.run_metrics_path = run_metrics_path
+        self.latency_path = latency_path
+        self.outbox_db = outbox_db
+        self.outbox_worker = outbox_worker
+
+    def job_metrics(self) -> List[MetricFamily]:
+        jobs = _read_json(self.job_store_path) or {}
+        last_run, next_run, duration, success = [], [], [], []
+        for name, record in jobs.items():
+            labels = {'job': name}
+            if record.get('last_started'):
+                last_run.append((labels, _timestamp(record['last_started'])))
+                duration.append((labels, record.get('last_duration') or 0))
+                success.append((labels, 1 if record.get('last_status') == 'success' else 0))
+            if record.get('next_run'):
+                next_run.append((labels, _timestamp(record['next_run'])))
+        return [
+            ('xwebnews_job_last_run_timestamp_seconds', 'gauge', 'Start time of the last run of each scheduled job', last_run),
+            ('xwebnews_job_last_duration_seconds', 'gauge', 'Duration of the last run of each scheduled job', duration),
+            ('xwebnews_job_last_success', 'gauge', 'Whether the last run of each scheduled job succeeded', success),
+            ('xwebnews_job_next_run_timestamp_seconds', 'gauge', 'Next scheduled run of each job', next_run)
+        ]
+
+    def pipeline_metrics(self) -> List[MetricFamily]:
+        finished, stage_seconds, stage_status = [], [], []
+        for path in sorted(glob.glob(os.path.join(self.artifact_dir, '*', 'last_run.json'))):
+            run = _read_json(path)
+            if not run:
+                continue
+            pipeline = os.path.basename(os.path.dirname(path))
+            finished.append(({'pipeline': pipeline}, _timestamp(run['finished_at'])))
+            for stage, result in run['stages'].items():
+                labels = {'pipeline': pipeline, 'stage': stage}
+                stage_seconds.append((labels, result['seconds']))
+                stage_status.append((dict(labels, status=result['status']), 1))
+        return [
+            ('xwebnews_pipeline_last_run_timestamp_seconds', 'gauge', 'Finish time of the last pipeline run', finished),
+            ('xwebnews_pipeline_stage_duration_seconds', 'gauge', 'Duration of each stage in the last pipeline run', stage_seconds),
+            ('xwebnews_pipeline_stage_status', 'gauge', 'Status of each stage in the last pipeline run', stage_status)
+        ]
+
+    def run_metrics(self) -> List[MetricFamily]:
+        data = _read_json(self.run_metrics_path) or {}
+        fetched = [({'category': category}, count) for category, count in data.get('tweets_fetched', {}).items()
+                   if category != 'updated_at']
+        quota = []
+        rate_limit = data.get('twitter_rate_limit', {})
+        for key in ('remaining', 'limit', 'reset'):
+            if rate_limit.get(key) is not None:
+                quota.append(({'field': key}, rate_limit[key]))
+        return [
+            ('xwebnews_tweets_fetched', 'gauge', 'Tweets fetched per category in the last crawl', fetched),
+            ('xwebnews_twitter_rate_limit', 'gauge', 'Twitter API rate limit headers from the last request', quota)
+        ]
+
+    def llm_metrics(self) -> List[MetricFamily]:
+        if not LATENCY_TRACKER_AVAILABLE or not os.path.exists(self.latency_path):
+            return []
+        latency, samples = [], []
+        for model, summary in ModelLatencyTracker.load(self.latency_path).summary().items():
+            for key, quantile in (('p50', '0.5'), ('p95', '0.95')):
+                if summary[key] is not None:
+                    latency.append(({'model': model, 'quantile': quantile}, summary[key]))
+            samples.append(({'model': model}, summary['samples']))
+        return [
+            ('xwebnews_llm_latency_seconds', 'gauge', 'LLM call latency percentiles per model', latency),
+            ('xwebnews_llm_latency_samples', 'gauge', 'Decayed sample count behind the LLM latency percentiles', samples)
+        ]
+
+    def line_metrics(self) -> List[MetricFamily]:
+        families = []
+        if LINE_OUTBOX_AVAILABLE and os.path.exists(self.outbox_db):
+            outbox = LineOutbox(self.outbox_db)
+            try:
+                counts = outbox.counts()
+            finally:
+                outbox.close()
+            families.append(('xwebnews_line_outbox_items', 'gauge', 'LINE outbox items by status',
+                             [({'status': status}, count) for status, count in counts.items()]))
+        if self.outbox_worker is not None:
+            families.append(('xwebnews_line_deliveries_total', 'counter', 'LINE outbox delivery attempts by result',
+                             [({'result': result}, count) for result, count in self.outbox_worker.stats.items()]))
+        return families
+
+    def collect(self) -> str:
+        """彙整所有指標（個別來源失敗不影響其他指標）"""
+        families = []
+        for source in (self.job_metrics, self.pipeline_metrics, self.run_metrics, self.llm_metrics, self.line_metrics):
+            try:
+                families.extend(source())
+            except Exception:
+                continue
+        return format_metrics(families)
+
+
+class HealthServer:
+    def __init__(self, collector: MetricsCollector, host: str = '0.0.0.0', port: int = 8080,
+                 live_check: Optional[Callable[[], bool]] = None):
+        """
+        健康檢查與指標伺服器
+
+        Args:
+            collector: 指標彙整
+            host: 監聽位址
+            port: 監聽埠（容器的 EXPOSE 8080）
+            live_check: 存活檢查，例如排程主循環的心跳是否過期
+        """
+        self.collector = collector
+        self.live_check = live_check or (lambda: True)
+        self.ready = False
+        self.started_at = time.time()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='health-server', daemon=True)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: str, content_type: str = 'application/json'):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path in ('/healthz', '/health'):
+                    live = server.live_check()
+                    self._send(200 if live else 503, json.dumps({
+                        'status': 'ok' if live else 'stalled',
+                        'uptime_seconds': round(time.time() - server.started_at, 1)
+                    }))
+                elif path == '/readyz':
+                    self._send(200 if server.ready else 503, json.dumps({'ready': server.ready}))
+                elif path == '/metrics':
+                    self._send(200, server.collector.collect(), 'text/plain; version=0.0.4; charset=utf-8')
+                else:
+                    self._send(404, json.dumps({'error': 'not found'}))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> 'HealthServer':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+近似重複推文偵測 - MinHash 簽章 + LSH 分帶
+把複製貼上的洗版推文收斂為一條代表推文，並以 cluster_size 記錄群集大小
+可在爬取時逐條加入，也可批次處理歷史檔案
+"""
+
+import re
+import zlib
+import json
+import glob
+import sys
+from typing import Dict, List, Any, Optional, Hashable
+import numpy as np
+
+URL_PATTERN = re.compile(r'https?://\S+')
+MENTION_PATTERN = re.compile(r'@\w+')
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+# 梅森質數 2^31 - 1，a*x+b 在 uint64 內不會溢位
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def normalize_text(text: str) -> str:
+    """移除網址、提及與標點，統一為小寫"""
+    text = URL_PATTERN.sub(' ', text or '')
+    text = MENTION_PATTERN.sub(' ', text)
+    return NON_WORD_PATTERN.sub(' ', text.lower()).strip()
+
+
+def engagement_of(tweet: Dict[str, Any]) -> float:
+    """推文互動分數（與爬蟲的計算方式一致）"""
+    if 'engagement_score' in tweet:
+        return tweet.get('engagement_score') or 0
+    return (
+        tweet.get('like_count', 0) * 1 +
+        tweet.get('retweet_count', 0) * 2 +
+        tweet.get('reply_count', 0) * 0.5
+    )
+
+
+class NearDuplicateIndex:
+    def __init__(self, num_bands: int = 16, rows_per_band: int = 4, threshold: float = 0.6,
+                 shingle_size: int = 5, seed: int = 42):
+        """
+        初始化近似重複索引
+
+        相似度約在 (1 / num_bands) ^ (1 / rows_per_band) 以上的推文會成為候選，
+        再以 MinHash 估計的 Jaccard 相似度過濾
+
+        Args:
+            num_bands: LSH 分帶數
+            rows_per_band: 每帶的雜湊列數
+            threshold: 判定為重複的最低 Jaccard 相似度
+            shingle_size: 字元 shingle 長度
+            seed: 雜湊函數的亂數種子（相同種子的簽章可跨行程比對）
+        """
+        self.num_bands = num_bands
+        self.rows_per_band = rows_per_band
+        self.num_perm = num_bands * rows_per_band
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 31) - 1, size=(self.num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, (1 << 31) - 1, size=(self.num_perm, 1)).astype(np.uint64)
+
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.band_buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(num_bands)]
+        self.parent: Dict[Hashable, Hashable] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        """計算推文的 MinHash 簽章"""
+        normalized = normalize_text(text)
+        if len(normalized) <= self.shingle_size:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + self.shingle_size] for i in range(len(normalized) - self.shingle_size + 1)}
+
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a * hashes[np.newaxis, :] + self._b) % _PRIME).min(axis=1)
+
+    def _find(self, key: Hashable) -> Hashable:
+        root = key
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[key] != root:
+            self.parent[key], key = root, self.parent[key]
+        return root
+
+    def _union(self, first: Hashable, second: Hashable):
+        first_root, second_root = self._find(first), self._find(second)
+        if first_root != second_root:
+            self.parent[second_root] = first_root
+
+    def add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """
+        加入一條推文
+
+        Returns:
+            若與既有推文重複，回傳所屬群集的根鍵值；否則回傳 None
+        """
+        self.parent[key] = key
+        # 正規化後沒有內容（只有網址、提及或表情符號）的推文無法比對，各自成為單獨的群集
+        if not normalize_text(text):
+            return None
+
+        signature = self.signature(text)
+        self.signatures[key] = signature
+
+        candidates = set()
+        for band in range(self.num_bands):
+            band_key = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+            bucket = self.band_buckets[band].setdefault(band_key, [])
+            candidates.update(bucket)
+            bucket.append(key)
+
+        # 每個既有群集只比對一個候選成員，大群集不會造成平方級比對
+        matched = None
+        compared_roots = set()
+        for candidate in candidates:
+            root = self._find(candidate)
+            if root in compared_roots or root == self._find(key):
+                continue
+            compared_roots.add(root)
+            if float(np.mean(self.signatures[candidate] == signature)) >= self.threshold:
+                self._union(candidate, key)
+                matched = self._find(key)
+        return matched
+
+    def clusters(self) -> List[List[Hashable]]:
+        """回傳所有群集（依加入順序）"""
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for key in self.parent:
+            groups.setdefault(self._find(key), []).append(key)
+        return list(groups.values())
+
+
+def collapse_near_duplicates(tweets_data: Dict[str, List[Dict[str, Any]]], **index_options) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    批次收斂各類別中的近似重複推文
+
+    每個群集保留互動分數最高的推文，並加上 cluster_size 欄位
+
+    Args:
+        tweets_data: 按類別分組的推文數據
+        index_options: 傳給 NearDuplicateIndex 的參數
+
+    Returns:
+        收斂後的推文數據（保留原本的類別順序與推文順序）
+    """
+    collapsed = {}
+    for category, tweets in tweets_data.items():
+        if not tweets:
+            collapsed[category] = []
+            continue
+
+        index = NearDuplicateIndex(**index_options)
+        for position, tweet in enumerate(tweets):
+            index.add(position, tweet.get('text', ''))
+
+        representatives = []
+        for cluster in index.clusters():
+            # 已收斂過的推文保留原本的群集大小
+            size = sum(tweets[position].get('cluster_size', 1) for position in cluster)
+            best = max(cluster, key=lambda position: engagement_of(tweets[position]))
+            representatives.append((best, dict(tweets[best], cluster_size=size)))
+
+        representatives.sort(key=lambda item: item[0])
+        collapsed[category] = [tweet for _, tweet in representatives]
+    return collapsed
+
+
+def main():
+    # 批次處理歷史檔案：python3 near_duplicates.py [檔案...]
+    files = sys.argv[1:] or sorted(glob.glob("*web3_*.json"))
+    files = [f for f in files if not f.endswith('_dedup.json')]
+    if not files:
+        print("找不到推文數據文件")
+        return
+
+    for filename in files:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not all(isinstance(v, list) for v in data.values()):
+            continue
+
+        collapsed = collapse_near_duplicates(data)
+        before = sum(len(tweets) for tweets in data.values())
+        after = sum(len(tweets) for tweets in collapsed.values())
+
+        output = filename[:-len('.json')] + '_dedup.json'
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(collapsed, f, ensure_ascii=False, indent=2)
+        print(f"{filename}: {before} → {after} 條推文 (收斂 {before - after} 條近似重複)，已保存到 {output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,111 @@
 #!/usr/bin/env python3
 import json
+import math
 import openai
 import requests
 import os
-from datetime import datetime
-from typing import Dict, List, Any
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
 # 載入環境變數
 load_dotenv()
 
+# 導入關鍵字爆量偵測器
+try:
+    from burst_detector import KeywordBurstDetector
+    BURST_DETECTOR_AVAILABLE = True
+except ImportError:
+    BURST_DETECTOR_AVAILABLE = False
+
+# 導入關鍵字熱度草圖
+try:
+    from keyword_sketch import KeywordTrendSketch
+    KEYWORD_SKETCH_AVAILABLE = True
+except ImportError:
+    KEYWORD_SKETCH_AVAILABLE = False
+
+# 導入近似重複推文偵測
+try:
+    from near_duplicates import collapse_near_duplicates
+    NEAR_DUPLICATES_AVAILABLE = True
+except ImportError:
+    NEAR_DUPLICATES_AVAILABLE = False
+
+# 導入標籤共現圖
+try:
+    from cooccurrence_graph import CooccurrenceGraph
+    COOCCURRENCE_GRAPH_AVAILABLE = True
+except ImportError:
+    COOCCURRENCE_GRAPH_AVAILABLE = False
+
+# 導入推文主題群集
+try:
+    from tweet_clusters import cluster_representatives
+    TWEET_CLUSTERS_AVAILABLE = True
+except ImportError:
+    TWEET_CLUSTERS_AVAILABLE = False
+
+# 導入提示詞預算打包器
+try:
+    from prompt_packer import PromptPacker
+    PROMPT_PACKER_AVAILABLE = True
+except ImportError:
+    PROMPT_PACKER_AVAILABLE = False
+
+# 導入模型延遲直方圖
+try:
+    from latency_histogram import ModelLatencyTracker
+    LATENCY_TRACKER_AVAILABLE = True
+except ImportError:
+    LATENCY_TRACKER_AVAILABLE = False
+
+# 導入LINE客戶端（連線池與重試）
+try:
+    from line_client import LineClient
+    LINE_CLIENT_AVAILABLE = True
+except ImportError:
+    LINE_CLIENT_AVAILABLE = False
+
+# 導入LINE訊息分段
+try:
+    from line_segmenter import build_text_messages
+    LINE_SEGMENTER_AVAILABLE = True
+except ImportError:
+    LINE_SEGMENTER_AVAILABLE = False
+
+# 導入LINE多收件人發送
+try:
+    from line_fanout import deliver_multicast
+    LINE_FANOUT_AVAILABLE = True
+except ImportError:
+    LINE_FANOUT_AVAILABLE = False
+
+# 導入LINE發送佇列
+try:
+    from line_outbox import LineOutbox, OutboxWorker, report_key
+    LINE_OUTBOX_AVAILABLE = True
+except ImportError:
+    LINE_OUTBOX_AVAILABLE = False
+
+# 導入OpenAI回應快取
+try:
+    from llm_cache import LLMResponseCache, cache_key
+    LLM_CACHE_AVAILABLE = True
+except ImportError:
+    LLM_CACHE_AVAILABLE = False
+
 class Web3NewsReporter:
-    def __init__(self, openai_api_key: str, line_access_token: str, line_user_id: str):
+    def __init__(self, openai_api_key: str, line_access_token: str, line_user_id: str,
+                 use_cache: bool = True, cache_ttl_hours: float = 24, report_mode: str = "single",
+                 max_workers: int = 4, call_timeout: float = 60, prompt_budget: int = 3000,
+                 hedge_percentile: float = 0.95, openai_api_base: Optional[str] = None,
+                 line_api_base: str = "https://api.line.me", line_recipients: Optional[List[str]] = None,
+                 use_outbox: bool = True, latency_state_file: str = "model_latency_state.json"):
         """
         初始化Web3新聞報告器
         
@@ -20,14 +113,58 @@ class Web3NewsReporter:
             openai_api_key: OpenAI API Key
             line_access_token: LINE Channel Access Token
             line_user_id: 接收推播的LINE User ID
+            use_cache: 相同提示是否直接使用已保存的OpenAI回應
+            cache_ttl_hours: 快取回應的有效時數
+            report_mode: single（單一提示）或 map_reduce（各類別平行摘要後合併）
+            max_workers: map_reduce 模式同時進行的類別摘要數量
+            call_timeout: 每次OpenAI調用的逾時秒數
+            prompt_budget: 推文段落的token預算（需要 prompt_packer 模組）
+            hedge_percentile: 主要模型超過此延遲分位數仍未回應時，同時送出備用模型
+            openai_api_base: OpenAI相容API的網址（例如本地測試伺服器 http://127.0.0.1:8089/v1）
+            line_api_base: LINE Messaging API的網址
+            line_recipients: 多位收件人的User ID列表（預設只發送給 line_user_id）
+            use_outbox: 報告先存入發送佇列，由背景執行緒投遞（失敗會自動重試）
+            latency_state_file: 各模型延遲直方圖的保存路徑（決定備用模型的送出時機）
         """
+        if report_mode not in ("single", "map_reduce"):
+            raise ValueError(f"未知的報告模式: {report_mode}")
         # OpenAI設定
         openai.api_key = openai_api_key
+        if openai_api_base:
+            openai.api_base = openai_api_base
+        self.system_prompt = "你是一位專業的Web3新聞分析師，專門為繁體中文用戶提供準確、簡潔的加密貨幣和區塊鏈新聞摘要。"
+        self.response_cache = None
+        if use_cache and LLM_CACHE_AVAILABLE:
+            self.response_cache = LLMResponseCache(ttl_hours=cache_ttl_hours)
+        self.models = ["gpt-4o-mini", "gpt-3.5-turbo"]
+        self.report_mode = report_mode
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+        self.prompt_packer = PromptPacker(budget_tokens=prompt_budget) if PROMPT_PACKER_AVAILABLE else None
+        self.hedge_percentile = hedge_percentile
+        self.latency_state_file = latency_state_file
+        self.latency_tracker = None
+        if LATENCY_TRACKER_AVAILABLE:
+            try:
+                self.latency_tracker = ModelLatencyTracker.load(self.latency_state_file)
+            except Exception:
+                self.latency_tracker = ModelLatencyTracker()
         
         # LINE設定
         self.line_access_token = line_access_token
         self.line_user_id = line_user_id
-        self.line_api_url = "https://api.line.me/v2/bot/message/push"
+        self.line_api_url = f"{line_api_base.rstrip('/')}/v2/bot/message/push"
+        self.line_recipients = list(dict.fromkeys(line_recipients or [line_user_id]))
+        self.line_client = LineClient(line_access_token, api_base=line_api_base) if LINE_CLIENT_AVAILABLE else None
+        self.outbox = None
+        self.delivery_worker = None
+        if use_outbox and LINE_OUTBOX_AVAILABLE and self.line_client is not None:
+            self.outbox = LineOutbox()
+        
+        # 爆量偵測狀態檔案（由爬蟲在爬取時更新）
+        self.burst_state_file = "keyword_burst_state.json"
+        self.cooccurrence_file = "cooccurrence_graph_state.json"
+        self.keyword_sketch_file = "keyword_sketch_state.json"
         
         self.setup_logging()
     
@@ -75,6 +212,24 @@ class Web3NewsReporter:
         Returns:
             str: 生成的新聞報告
         """
+        try:
+            if self.report_mode == "map_reduce":
+                return self.analyze_tweets_map_reduce(tweets_data)
+            return self.analyze_tweets_single(tweets_data)
+        finally:
+            self.save_latency_state()
+
+    def save_latency_state(self):
+        """保存各模型的延遲直方圖，供下次計算對沖門檻"""
+        if self.latency_tracker is None:
+            return
+        try:
+            self.latency_tracker.save(self.latency_state_file)
+        except Exception as e:
+            self.logger.warning(f"保存模型延遲數據失敗: {str(e)}")
+
+    def analyze_tweets_single(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> str:
+        """以單一提示包含所有類別生成報告"""
         try:
             # 準備數據供AI分析
             analysis_text = self.prepare_analysis_data(tweets_data)
@@ -87,73 +242,392 @@ class Web3NewsReporter:
             
             # 調用OpenAI API
             self.logger.info("正在使用OpenAI分析推文內容...")
-            # 嘗試使用最便宜的模型，如果失敗則回退
-            models_to_try = ["gpt-4o-mini", "gpt-3.5-turbo"]
+            return self.complete_hedged(prompt, max_tokens=1500, temperature=0.7)
+            
+        except Exception as e:
+            self.logger.error(f"OpenAI分析時發生錯誤: {str(e)}")
+            return f"分析過程中發生錯誤: {str(e)}"
+
+    def analyze_tweets_map_reduce(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> str:
+        """
+        Map-reduce 模式：各類別平行摘要，再以一次小型調用合併為報告
+        
+        總耗時約為最慢的單一類別摘要加上合併調用，個別類別失敗或逾時時
+        以其餘類別的摘要繼續生成報告
+        
+        Args:
+            tweets_data: 推文數據
+            
+        Returns:
+            str: 生成的新聞報告
+        """
+        try:
+            sections = {
+                category: self.format_category_tweets(category, tweets)
+                for category, tweets in self.select_tweets(tweets_data).items()
+            }
+            if not sections:
+                return "今日暫無Web3相關推文數據。"
             
-            for model in models_to_try:
+            # Map：每個類別獨立摘要，同時進行的調用數量受 max_workers 限制
+            self.logger.info(f"正在平行摘要 {len(sections)} 個類別...")
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            futures = {
+                executor.submit(
+                    self.complete_hedged, self.create_category_prompt(category, text),
+                    max_tokens=300, temperature=0.5
+                ): category
+                for category, text in sections.items()
+            }
+            # 排隊中的類別也受整體逾時限制，未完成的調用直接放棄；
+            # 單次對沖調用最壞會依序等到每個模型逾時，因此每輪預留 call_timeout × 模型數
+            rounds = -(-len(futures) // self.max_workers)
+            per_call_timeout = self.call_timeout * max(1, len(self.models))
+            done, not_done = wait(futures, timeout=per_call_timeout * rounds)
+            executor.shutdown(wait=False, cancel_futures=True)
+            
+            summaries = {}
+            for future in done:
+                category = futures[future]
                 try:
-                    self.logger.info(f"嘗試使用模型: {model}")
-                    response = openai.ChatCompletion.create(
-                        model=model,
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": "你是一位專業的Web3新聞分析師，專門為繁體中文用戶提供準確、簡潔的加密貨幣和區塊鏈新聞摘要。"
-                            },
-                            {
-                                "role": "user", 
-                                "content": prompt
-                            }
-                        ],
-                        max_tokens=1500,
-                        temperature=0.7
-                    )
-                    
-                    report = response.choices[0].message.content.strip()
-                    self.logger.info(f"✅ {model} 分析完成")
-                    return report
-                    
-                except Exception as model_error:
-                    self.logger.warning(f"模型 {model} 失敗: {str(model_error)}")
-                    if model == models_to_try[-1]:  # 最後一個模型也失敗
-                        raise model_error
-                    continue
+                    summaries[category] = future.result()
+                except Exception as e:
+                    self.logger.warning(f"類別 {category} 摘要失敗: {str(e)}")
+            for future in not_done:
+                self.logger.warning(f"類別 {futures[future]} 摘要逾時")
+            
+            if not summaries:
+                self.logger.warning("所有類別摘要失敗，改用單一提示生成報告")
+                return self.analyze_tweets_single(tweets_data)
+            
+            self.logger.info(f"✅ 完成 {len(summaries)}/{len(sections)} 個類別摘要")
+            
+            # Reduce：依原本的類別順序合併摘要，套用既有的報告格式
+            total_tweets = sum(len(tweets) for tweets in tweets_data.values())
+            parts = [f"\n=== {category} 類別摘要 ===\n{summaries[category]}\n" for category in sections if category in summaries]
+            missing = [category for category in sections if category not in summaries]
+            if missing:
+                parts.append(f"\n（以下類別本次無摘要: {'、'.join(missing)}）\n")
+            
+            burst_text, related_text, trending_text = self.format_context_sections()
+            if burst_text:
+                parts.insert(0, burst_text)
+            if related_text:
+                parts.append(related_text)
+            if trending_text:
+                parts.append(trending_text)
+            
+            header = f"今日Web3推文分類摘要 ({total_tweets}條推文):\n"
+            prompt = self.create_analysis_prompt(header + "\n".join(parts))
+            return self.complete_hedged(prompt, max_tokens=1000, temperature=0.7)
             
         except Exception as e:
             self.logger.error(f"OpenAI分析時發生錯誤: {str(e)}")
             return f"分析過程中發生錯誤: {str(e)}"
 
+    def create_category_prompt(self, category: str, data: str) -> str:
+        """創建單一類別的摘要提示"""
+        return f"""
+請摘要以下Web3推文中「{category}」類別的重點：
+
+{data}
+
+要求：
+1. 以2-4個條列重點呈現，總字數150字內
+2. 保留具體的項目名稱、Cashtag與數據
+3. 使用繁體中文
+4. 客觀中性，避免投資建議
+"""
+
+    def complete_hedged(self, prompt: str, **params) -> str:
+        """
+        對沖請求：先送出主要模型，超過其延遲分位數仍未回應時同時送出下一個模型，
+        採用最先成功的回應；模型失敗時立即改送下一個模型
+        
+        Returns:
+            str: 最先成功的模型回應
+        """
+        executor = ThreadPoolExecutor(max_workers=len(self.models))
+        pending = {}
+        errors = []
+        try:
+            for position, model in enumerate(self.models):
+                self.logger.info(f"嘗試使用模型: {model}")
+                pending[executor.submit(self.chat_completion, model, prompt, **params)] = model
+                
+                hedge_delay = None
+                if position < len(self.models) - 1:
+                    hedge_delay = self.hedge_threshold(model)
+                deadline = None if hedge_delay is None else time.monotonic() + hedge_delay
+                
+                while pending:
+                    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    if not done:
+                        self.logger.info(f"⏱️ {model} 超過 {hedge_delay:.1f} 秒未回應，同時送出備用模型")
+                        break
+                    for future in done:
+                        done_model = pending.pop(future)
+                        try:
+                            report = future.result()
+                        except Exception as model_error:
+                            self.logger.warning(f"模型 {done_model} 失敗: {str(model_error)}")
+                            errors.append(model_error)
+                            continue
+                        self.logger.info(f"✅ {done_model} 分析完成")
+                        return report
+            
+            raise errors[-1]
+        finally:
+            # 落後的請求無法中斷，結果直接捨棄；請求結束時 chat_completion 仍會把延遲記錄到直方圖（逾時以 call_timeout 計）
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def hedge_threshold(self, model: str) -> float:
+        """等待模型回應多久後送出對沖請求（秒）"""
+        if self.latency_tracker is None:
+            return self.call_timeout
+        return min(self.latency_tracker.threshold(model, self.hedge_percentile), self.call_timeout)
+
+    def chat_completion(self, model: str, prompt: str, **params) -> str:
+        """
+        調用OpenAI Chat API，相同的模型、提示與參數優先使用快取
+
+        Args:
+            model: 模型名稱
+            prompt: 使用者提示
+            params: 其他API參數（max_tokens、temperature等）
+
+        Returns:
+            str: 模型回應內容
+        """
+        key = None
+        if self.response_cache is not None:
+            key = cache_key(model, self.system_prompt, prompt, **params)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                self.logger.info(f"♻️ 使用快取的 {model} 回應")
+                return cached
+
+        start = time.monotonic()
+        timed_out = False
+        try:
+            response = openai.ChatCompletion.create(
+                model=model,
+                request_timeout=self.call_timeout,
+                messages=[
+                    {
+                        "role": "system", 
+                        "content": self.system_prompt
+                    },
+                    {
+                        "role": "user", 
+                        "content": prompt
+                    }
+                ],
+                **params
+            )
+        except openai.error.Timeout:
+            timed_out = True
+            raise
+        finally:
+            # 失敗與逾時也要記錄，否則分位數只反映成功的快速回應；逾時以 call_timeout 計
+            if self.latency_tracker is not None:
+                elapsed = self.call_timeout if timed_out else time.monotonic() - start
+                self.latency_tracker.record(model, elapsed)
+        content = response.choices[0].message.content.strip()
+
+        if key is not None:
+            self.response_cache.set(key, model, content)
+        return content
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """OpenAI回應快取的命中統計"""
+        if self.response_cache is None:
+            return {}
+        return self.response_cache.stats()
+
     def prepare_analysis_data(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> str:
         """準備供AI分析的數據"""
         analysis_parts = []
         total_tweets = 0
         
-        for category, tweets in tweets_data.items():
-            if not tweets:
-                continue
-                
-            # 按讚數排序，取前10條
-            sorted_tweets = sorted(tweets, key=lambda x: x.get('like_count', 0), reverse=True)[:10]
-            total_tweets += len(sorted_tweets)
-            
-            category_text = f"\n=== {category} 類別 ===\n"
-            for i, tweet in enumerate(sorted_tweets, 1):
-                tweet_info = (
-                    f"{i}. 【{tweet.get('username', 'unknown')}】\n"
-                    f"   內容: {tweet.get('text', '')[:200]}...\n"
-                    f"   互動: ❤️{tweet.get('like_count', 0)} 🔄{tweet.get('retweet_count', 0)}\n"
-                    f"   時間: {tweet.get('created_at', 'unknown')}\n"
-                )
-                category_text += tweet_info
-            
-            analysis_parts.append(category_text)
+        for category, selected in self.select_tweets(tweets_data).items():
+            total_tweets += len(selected)
+            analysis_parts.append(self.format_category_tweets(category, selected))
         
         if total_tweets == 0:
             return ""
         
+        # 異常熱度話題放在最前面，讓報告圍繞真正爆量的話題
+        burst_text, related_text, trending_text = self.format_context_sections()
+        if burst_text:
+            analysis_parts.insert(0, burst_text)
+        if related_text:
+            analysis_parts.append(related_text)
+        if trending_text:
+            analysis_parts.append(trending_text)
+        
         header = f"今日Web3推文分析數據 ({total_tweets}條推文):\n"
         return header + "\n".join(analysis_parts)
 
+    def select_tweets(self, tweets_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        挑選要放進提示詞的推文
+        
+        先收斂近似重複與同主題的推文，有打包器時在token預算內挑選資訊量最高的推文，
+        否則每類別取讚數最高的10條
+        
+        Returns:
+            按類別分組的選中推文（略過沒有推文的類別）
+        """
+        # 收斂近似重複的推文，避免洗版內容佔用提示詞
+        if NEAR_DUPLICATES_AVAILABLE:
+            tweets_data = collapse_near_duplicates(tweets_data)
+        
+        # 同主題的推文只保留一條代表推文，群集大小作為熱度訊號
+        if TWEET_CLUSTERS_AVAILABLE:
+            before = sum(len(tweets) for tweets in tweets_data.values())
+            tweets_data = {category: cluster_representatives(tweets) for category, tweets in tweets_data.items()}
+            after = sum(len(tweets) for tweets in tweets_data.values())
+            self.logger.info(f"🧩 主題群集: {before} 條推文收斂為 {after} 個主題")
+        
+        if self.prompt_packer is None:
+            return {
+                category: self.select_category_tweets(tweets)
+                for category, tweets in tweets_data.items() if tweets
+            }
+        
+        packed = self.prompt_packer.pack(
+            tweets_data,
+            format_entry=lambda tweet: self.format_tweet(1, tweet),
+            format_header=self.format_category_header
+        )
+        usage = "、".join(f"{category} {tokens}" for category, tokens in packed['tokens'].items())
+        self.logger.info(f"📦 提示詞使用 {packed['total_tokens']}/{packed['budget']} tokens ({usage})")
+        return packed['tweets']
+
+    def select_category_tweets(self, tweets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按讚數（依群集大小加權）排序，取前10條"""
+        return sorted(
+            tweets,
+            key=lambda x: x.get('like_count', 0) * (1 + math.log(x.get('cluster_size', 1) or 1)),
+            reverse=True
+        )[:10]
+
+    def format_category_header(self, category: str) -> str:
+        return f"\n=== {category} 類別 ===\n"
+
+    def format_tweet(self, index: int, tweet: Dict[str, Any]) -> str:
+        """將單條推文整理為分析數據段落"""
+        text = tweet.get('text', '')
+        # 打包器已依token上限清理並截斷內容
+        if self.prompt_packer is None:
+            text = f"{text[:200]}..."
+        tweet_info = (
+            f"{index}. 【{tweet.get('username', 'unknown')}】\n"
+            f"   內容: {text}\n"
+            f"   互動: ❤️{tweet.get('like_count', 0)} 🔄{tweet.get('retweet_count', 0)}\n"
+            f"   時間: {tweet.get('created_at', 'unknown')}\n"
+        )
+        if tweet.get('cluster_size', 1) > 1:
+            tweet_info += f"   相似推文: {tweet['cluster_size']} 條\n"
+        return tweet_info
+
+    def format_category_tweets(self, category: str, tweets: List[Dict[str, Any]]) -> str:
+        """將單一類別的推文整理為分析數據段落"""
+        category_text = self.format_category_header(category)
+        for i, tweet in enumerate(tweets, 1):
+            category_text += self.format_tweet(i, tweet)
+        return category_text
+
+    def format_context_sections(self) -> tuple:
+        """異常熱度話題、聯動資產與近期熱門關鍵字段落（跨類別的背景資訊）"""
+        return (
+            self.format_burst_topics(self.detect_burst_topics()),
+            self.format_related_assets(self.find_related_assets()),
+            self.format_trending_keywords(self.find_trending_keywords())
+        )
+
+    def detect_burst_topics(self, top_n: int = 8) -> List[Dict[str, Any]]:
+        """從每小時關鍵字計數中找出相對基準爆量的話題"""
+        if not BURST_DETECTOR_AVAILABLE or not os.path.exists(self.burst_state_file):
+            return []
+        
+        try:
+            detector = KeywordBurstDetector.load(self.burst_state_file)
+            # 爬蟲每日執行一次，以最近24小時作為當前時段
+            return detector.detect_bursts(current_hours=24, top_n=top_n)
+        except Exception as e:
+            self.logger.warning(f"爆量偵測失敗: {str(e)}")
+            return []
+
+    def find_related_assets(self, days: int = 7, top_n: int = 5) -> List[List[tuple]]:
+        """從標籤共現圖找出最近幾天經常一起出現的資產群集"""
+        if not COOCCURRENCE_GRAPH_AVAILABLE or not os.path.exists(self.cooccurrence_file):
+            return []
+        
+        try:
+            graph = CooccurrenceGraph.load(self.cooccurrence_file)
+            start = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+            return graph.related_clusters(start=start)[:top_n]
+        except Exception as e:
+            self.logger.warning(f"聯動資產分析失敗: {str(e)}")
+            return []
+
+    def find_trending_keywords(self, days: int = 7, top_n: int = 8) -> Dict[str, List[Dict[str, Any]]]:
+        """從關鍵字熱度草圖查詢最近幾天的熱門關鍵字與 Cashtag"""
+        if not KEYWORD_SKETCH_AVAILABLE or not os.path.exists(self.keyword_sketch_file):
+            return {}
+        
+        try:
+            sketch = KeywordTrendSketch.load(self.keyword_sketch_file)
+            start = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+            return {
+                'tokens': sketch.top_k(top_n, start=start),
+                'cashtags': sketch.top_k(top_n, start=start, kind='cashtags')
+            }
+        except Exception as e:
+            self.logger.warning(f"熱門關鍵字查詢失敗: {str(e)}")
+            return {}
+
+    def format_trending_keywords(self, trending: Dict[str, List[Dict[str, Any]]]) -> str:
+        """將近期熱門關鍵字整理為分析數據段落"""
+        if not trending.get('tokens') and not trending.get('cashtags'):
+            return ""
+        
+        lines = ["\n=== 近7天熱門關鍵字（估計次數） ===\n"]
+        for label, kind in (("關鍵字", 'tokens'), ("Cashtag", 'cashtags')):
+            if trending.get(kind):
+                items = "、".join(f"{item['token']}({item['count']})" for item in trending[kind])
+                lines.append(f"{label}: {items}\n")
+        return "".join(lines)
+
+    def format_related_assets(self, clusters: List[List[tuple]]) -> str:
+        """將聯動資產群集整理為分析數據段落"""
+        if not clusters:
+            return ""
+        
+        lines = ["\n=== 聯動資產（近7天經常一起被提及） ===\n"]
+        for i, cluster in enumerate(clusters, 1):
+            tags = "、".join(f"{tag}({count})" for tag, count in cluster[:6])
+            lines.append(f"{i}. {tags}\n")
+        return "".join(lines)
+
+    def format_burst_topics(self, bursts: List[Dict[str, Any]]) -> str:
+        """將爆量話題整理為分析數據段落"""
+        if not bursts:
+            return ""
+        
+        lines = ["\n=== 異常熱度話題（相對同類別過去一週基準爆量） ===\n"]
+        for i, burst in enumerate(bursts, 1):
+            lines.append(
+                f"{i}. {burst['token']} [{burst.get('category', '')}]: 近24小時 {burst['count']} 次 "
+                f"(基準 {burst['baseline']}，z={burst['score']})\n"
+            )
+        return "".join(lines)
+
     def create_analysis_prompt(self, data: str) -> str:
         """創建OpenAI分析提示"""
         today = datetime.now().strftime("%Y年%m月%d日")
@@ -188,54 +662,121 @@ class Web3NewsReporter:
 3. 使用繁體中文
 4. 客觀中性，避免投資建議
 5. 如果某個賽道沒有重要動態，可以省略
+6. 如果數據包含「異常熱度話題」，🔥今日熱點請優先圍繞這些話題撰寫
 """
         return prompt
 
-    def send_to_line(self, message: str) -> bool:
+    def send_to_line(self, message: str, retry_key: Optional[str] = None) -> bool:
         """
         發送消息到LINE
         
         Args:
             message: 要發送的消息內容
+            retry_key: X-Line-Retry-Key，重送同一則訊息時沿用可避免重複推送
             
         Returns:
             bool: 發送是否成功
         """
+        messages = self.build_line_messages(message)
+        
         try:
+            if len(self.line_recipients) > 1 and self.line_client is not None and LINE_FANOUT_AVAILABLE:
+                return self.send_multicast(messages, retry_key)
+            
+            self.logger.info("正在發送訊息到LINE...")
+            if self.line_client is not None:
+                result = self.line_client.push(self.line_user_id, messages, retry_key)
+                if result['ok']:
+                    self.logger.info(
+                        f"✅ LINE訊息發送成功 ({len(messages)} 則訊息, {result['requests']} 次請求, "
+                        f"{result['attempts']} 次嘗試, {result['seconds']:.2f}s)"
+                    )
+                    return True
+                self.logger.error(f"❌ LINE訊息發送失敗: {result['status']} - {result['error']}")
+                return False
+            
             headers = {
                 'Authorization': f'Bearer {self.line_access_token}',
                 'Content-Type': 'application/json'
             }
+            # 每次請求最多5則訊息，依序發送
+            for i in range(0, len(messages), 5):
+                response = requests.post(
+                    self.line_api_url, 
+                    headers=headers, 
+                    json={'to': self.line_user_id, 'messages': messages[i:i + 5]},
+                    timeout=(3.05, 10)
+                )
+                if response.status_code != 200:
+                    self.logger.error(f"❌ LINE訊息發送失敗: {response.status_code} - {response.text}")
+                    return False
             
-            # LINE訊息格式
-            data = {
-                'to': self.line_user_id,
-                'messages': [
-                    {
-                        'type': 'text',
-                        'text': message
-                    }
-                ]
-            }
-            
-            self.logger.info("正在發送訊息到LINE...")
-            response = requests.post(
-                self.line_api_url, 
-                headers=headers, 
-                json=data
-            )
-            
-            if response.status_code == 200:
-                self.logger.info("✅ LINE訊息發送成功")
-                return True
-            else:
-                self.logger.error(f"❌ LINE訊息發送失敗: {response.status_code} - {response.text}")
-                return False
+            self.logger.info("✅ LINE訊息發送成功")
+            return True
                 
         except Exception as e:
             self.logger.error(f"發送LINE訊息時發生錯誤: {str(e)}")
             return False
 
+    def build_line_messages(self, message: str) -> List[Dict[str, Any]]:
+        """將報告轉為LINE訊息物件（長報告依段落標題分段）"""
+        if LINE_SEGMENTER_AVAILABLE:
+            return build_text_messages(message)
+        return [
+            {
+                'type': 'text',
+                'text': message
+            }
+        ]
+
+    def enqueue_report(self, report: str) -> str:
+        """
+        將報告存入發送佇列並喚醒投遞執行緒（立即返回）
+        
+        Returns:
+            str: 冪等鍵（同一份報告重複加入只會投遞一次）
+        """
+        key = self.outbox.enqueue(
+            self.line_recipients,
+            self.build_line_messages(report),
+            report_key(report, self.line_recipients)
+        )
+        self.start_delivery_worker()
+        return key
+
+    def start_delivery_worker(self):
+        """啟動本行程的投遞執行緒，處理完立即可投遞的項目後結束"""
+        if self.delivery_worker is not None and self.delivery_worker.is_alive():
+            self.delivery_worker.wake()
+            return
+        self.delivery_worker = OutboxWorker(self.outbox, self.line_client, exit_when_idle=True)
+        self.delivery_worker.start()
+
+    def send_multicast(self, messages: List[Dict[str, Any]], retry_key: Optional[str] = None) -> bool:
+        """分批 multicast 發送給所有收件人，並記錄每批的延遲與失敗"""
+        self.logger.info(f"正在發送訊息給 {len(self.line_recipients)} 位LINE收件人...")
+        summary = deliver_multicast(self.line_client, self.line_recipients, messages, retry_key=retry_key)
+        
+        for batch in summary['batches']:
+            if batch['ok']:
+                self.logger.info(f"   批次 {batch['batch'] + 1}: {batch['recipients']} 人, {batch['seconds']:.2f}s, {batch['attempts']} 次嘗試")
+            else:
+                self.logger.error(f"   批次 {batch['batch'] + 1}: {batch['recipients']} 人發送失敗 - {batch['status']} {batch['error']}")
+        
+        if summary['failed']:
+            self.logger.error(f"❌ LINE發送 {summary['delivered']}/{summary['recipients']} 人成功 ({summary['seconds']:.2f}s)")
+            return False
+        self.logger.info(f"✅ LINE訊息已發送給 {summary['recipients']} 人 ({summary['seconds']:.2f}s)")
+        return True
+
+    def deliver_report(self, report: str) -> bool:
+        """發送報告到LINE（有發送佇列時由背景執行緒投遞，失敗會自動重試）"""
+        if self.outbox is not None:
+            key = self.enqueue_report(report)
+            self.logger.info(f"📮 報告已排入LINE發送佇列 ({key[:8]})")
+            return True
+        return self.send_to_line(report)
+
     def generate_and_send_report(self) -> bool:
         """生成新聞報告並發送到LINE"""
         try:
@@ -253,6 +794,10 @@ class Web3NewsReporter:
                 self.logger.error("報告生成失敗")
                 return False
             
+            stats = self.cache_stats()
+            if stats:
+                self.logger.info(f"📦 回應快取: 命中 {stats['hits']} / 未命中 {stats['misses']} (命中率 {stats['hit_rate']:.1%})")
+            
             # 3. 保存報告到文件
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             report_filename = f"web3_news_report_{timestamp}.txt"
@@ -263,9 +808,7 @@ class Web3NewsReporter:
             self.logger.info(f"報告已保存到: {report_filename}")
             
             # 4. 發送到LINE
-            success = self.send_to_line(report)
-            
-            if success:
+            if self.deliver_report(report):
                 self.logger.info("🎉 Web3新聞報告生成並發送完成！")
                 return True
             else:
@@ -291,13 +834,17 @@ def main():
         print("1. OPENAI_API_KEY - OpenAI API 金鑰")
         print("2. LINE_ACCESS_TOKEN - LINE Channel Access Token")
         print("3. LINE_USER_ID - 你的LINE User ID")
-        return
+        return False
     
     # 創建新聞報告器
     reporter = Web3NewsReporter(
         openai_api_key=OPENAI_API_KEY,
         line_access_token=LINE_ACCESS_TOKEN,
-        line_user_id=LINE_USER_ID
+        line_user_id=LINE_USER_ID,
+        report_mode=os.getenv('REPORT_MODE', 'single'),
+        openai_api_base=os.getenv('OPENAI_API_BASE'),
+        line_api_base=os.getenv('LINE_API_BASE', 'https://api.line.me'),
+        line_recipients=[user_id.strip() for user_id in os.getenv('LINE_RECIPIENTS', '').split(',') if user_id.strip()] or None
     )
     
     # 生成並發送報告
@@ -307,6 +854,8 @@ def main():
         print("✅ 新聞報告已成功生成並發送到LINE")
     else:
         print("❌ 新聞報告生成或發送失敗，請檢查日誌")
+    return success
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 失敗時以非零狀態結束，排程器才會記錄為失敗並重試
+    sys.exit(0 if main() else 1)
\ No newline at end of file
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+本地 OpenAI 相容測試伺服器 - 實作 /v1/chat/completions
+可設定延遲、錯誤率與 token 用量，回應內容由提示詞決定（相同提示得到相同報告），
+讓爬取 → 報告 → 推送流程不需真實 OpenAI 調用也能完整執行與測量
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional
+
+# 導入 token 計算（與提示詞打包器一致）
+try:
+    from prompt_packer import count_tokens
+except ImportError:
+    def count_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+CATEGORY_PATTERN = re.compile(r'=== (.+?) 類別(?:摘要)? ===')
+SUMMARY_PATTERN = re.compile(r'「(.+?)」類別的重點')
+CASHTAG_PATTERN = re.compile(r'\$[A-Za-z]{2,10}\b')
+
+
+def build_report(prompt: str) -> str:
+    """依提示詞產生固定格式的報告（類別摘要提示回傳條列重點）"""
+    cashtags = sorted(set(tag.upper() for tag in CASHTAG_PATTERN.findall(prompt)))
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+
+    summary = SUMMARY_PATTERN.search(prompt)
+    if summary:
+        tweet_count = len(re.findall(r'^\d+\. 【', prompt, re.MULTILINE))
+        lines = [f"- {summary.group(1)} 類別共 {tweet_count} 條推文"]
+        if cashtags:
+            lines.append(f"- 主要提及: {'、'.join(cashtags[:5])}")
+        lines.append(f"- 摘要編號: {digest}")
+        return "\n".join(lines)
+
+    categories = list(dict.fromkeys(CATEGORY_PATTERN.findall(prompt)))
+    hot = "、".join(cashtags[:3]) if cashtags else "暫無明顯熱點"
+    sections = "\n".join(f"- **{category}**: 本地測試摘要" for category in categories) or "- 暫無類別數據"
+    return (
+        f"📅 **Web3 市場動態（本地測試）**\n\n"
+        f"🔥 **今日熱點**\n- {hot}\n\n"
+        f"📊 **各賽道觀察**\n{sections}\n\n"
+        f"💡 **市場洞察**\n- 共 {len(categories)} 個類別，報告編號 {digest}\n\n"
+        f"⚠️ **風險提醒**\n僅供參考，投資有風險，請自行判斷。"
+    )
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, model_latency: Optional[Dict[str, float]] = None, seed: int = 42):
+        """
+        測試伺服器設定
+
+        Args:
+            latency: 基本回應延遲（秒）
+            jitter: 延遲的隨機浮動範圍（秒）
+            error_rate: 回傳 500 錯誤的機率
+            rate_limit_rate: 回傳 429 錯誤的機率
+            model_latency: 個別模型的基本延遲，覆蓋 latency
+            seed: 亂數種子（延遲與錯誤注入可重現）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.model_latency = model_latency or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def draw(self, model: str):
+        """決定本次請求的延遲與結果（500、429 或 None 表示成功）"""
+        with self.lock:
+            self.stats['requests'] += 1
+            delay = self.model_latency.get(model, self.latency) + self.random.uniform(0, self.jitter)
+            roll = self.random.random()
+            if roll < self.error_rate:
+                self.stats['errors'] += 1
+                return delay, 500
+            if roll < self.error_rate + self.rate_limit_rate:
+                self.stats['rate_limited'] += 1
+                return delay, 429
+            return delay, None
+
+    def count(self, prompt_tokens: int, completion_tokens: int):
+        with self.lock:
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += completion_tokens
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config: StubConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            with self.config.lock:
+                self.send_json(200, dict(self.config.stats))
+        else:
+            self.send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self.send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            model = request['model']
+            messages: List[Dict[str, str]] = request['messages']
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': {'message': 'Invalid request body', 'type': 'invalid_request_error'}})
+            return
+
+        delay, status = self.config.draw(model)
+        time.sleep(delay)
+        if status == 500:
+            self.send_json(500, {'error': {'message': 'Injected server error', 'type': 'server_error'}})
+            return
+        if status == 429:
+            self.send_json(429, {'error': {'message': 'Injected rate limit', 'type': 'rate_limit_error'}},
+                           headers={'Retry-After': '1'})
+            return
+
+        prompt = "\n".join(message.get('content', '') for message in messages)
+        content = build_report(messages[-1].get('content', ''))
+        finish_reason = 'stop'
+        max_tokens = request.get('max_tokens')
+        if max_tokens and count_tokens(content) > max_tokens:
+            # 與真實 API 相同：超過 max_tokens 時截斷並標記 length
+            content = content[:max(1, len(content) * max_tokens // count_tokens(content))]
+            finish_reason = 'length'
+
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        self.config.count(prompt_tokens, completion_tokens)
+        self.send_json(200, {
+            'id': f"chatcmpl-stub-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': finish_reason
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+
+def start_server(config: StubConfig, host: str = '127.0.0.1', port: int = 8089) -> ThreadingHTTPServer:
+    """在背景執行緒啟動測試伺服器（port=0 時自動選擇可用埠號）"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_benchmark(server: ThreadingHTTPServer, runs: int, report_mode: str):
+    """以測試伺服器重複生成報告，統計端到端延遲與失敗次數"""
+    from news_reporter import Web3NewsReporter
+
+    host, port = server.server_address[:2]
+    # 測試伺服器的延遲不寫入正式的延遲狀態，也不建立發送佇列
+    state_dir = tempfile.mkdtemp(prefix='openai_stub_')
+    reporter = Web3NewsReporter(
+        openai_api_key='stub-key',
+        line_access_token='stub-token',
+        line_user_id='stub-user',
+        use_cache=False,
+        report_mode=report_mode,
+        openai_api_base=f"http://{host}:{port}/v1",
+        use_outbox=False,
+        latency_state_file=os.path.join(state_dir, 'model_latency_state.json')
+    )
+    tweets_data = reporter.load_latest_tweets()
+    if not tweets_data:
+        print("❌ 找不到推文數據，無法執行測試")
+        return
+
+    latencies, failures = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        report = reporter.analyze_tweets_with_openai(tweets_data)
+        latencies.append(time.perf_counter() - start)
+        if "錯誤" in report:
+            failures += 1
+
+    latencies.sort()
+    print(f"\n📊 {runs} 次報告生成 ({report_mode})")
+    print(f"   p50: {latencies[len(latencies) // 2]:.2f}s  p95: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f}s  最慢: {latencies[-1]:.2f}s")
+    print(f"   失敗: {failures}")
+    print(f"   伺服器統計: {server.RequestHandlerClass.config.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 OpenAI 相容測試伺服器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='基本回應延遲（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延遲的隨機浮動範圍（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回傳 500 錯誤的機率')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='回傳 429 錯誤的機率')
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SECONDS',
+                        help='個別模型的基本延遲，可重複指定')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--benchmark', type=int, default=0, metavar='RUNS',
+                        help='啟動後以最新推文數據生成報告 RUNS 次並輸出統計')
+    parser.add_argument('--report-mode', default='single', choices=['single', 'map_reduce'])
+    args = parser.parse_args()
+
+    model_latency = {}
+    for item in args.model_latency:
+        model, _, seconds = item.partition('=')
+        model_latency[model] = float(seconds)
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, model_latency, args.seed)
+    server = start_server(config, args.host, args.port)
+    print(f"🧪 OpenAI 測試伺服器: http://{args.host}:{server.server_address[1]}/v1")
+
+    if args.benchmark:
+        run_benchmark(server, args.benchmark, args.report_mode)
+        server.shutdown()
+        return
+
+    print("   設定 OPENAI_API_BASE 指向此網址即可使用，Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
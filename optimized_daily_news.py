@@ -10,6 +10,7 @@ import time
 from datetime import datetime
 from twitter_web3_crawler import TwitterWeb3Crawler
 from news_reporter import Web3NewsReporter
+from pipeline_dag import StagedPipeline
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -44,29 +45,31 @@ def run_optimized_pipeline():
     LINE_ACCESS_TOKEN = os.getenv('LINE_CHANNEL_ACCESS_TOKEN', 'your_line_channel_access_token_here')
     LINE_USER_ID = os.getenv('LINE_USER_ID', 'your_line_user_id_here')
     
-    success_count = 0
-    total_steps = 3
+    crawler = TwitterWeb3Crawler(TWITTER_BEARER_TOKEN)
+    reporter = Web3NewsReporter(
+        openai_api_key=OPENAI_API_KEY,
+        line_access_token=LINE_ACCESS_TOKEN, 
+        line_user_id=LINE_USER_ID,
+        line_api_base=os.getenv('LINE_API_BASE', 'https://api.line.me')
+    )
     
-    try:
-        # ===== 步驟1：優化版Twitter爬取 =====
+    # 優先級類別配置（基於重要性）
+    priority_categories = [
+        ("DeFi", 30),           # 最重要，多抓一些
+        ("Layer1_Layer2", 25),  # 重要
+        ("NFT_GameFi", 20),     # 中等重要
+        ("AI_Crypto", 15),      # 興趣類別
+        ("Infrastructure", 15), # 基礎設施
+        ("RWA", 10),           # 新興領域
+        ("Meme_Coins", 5)      # 娛樂類別，最少
+    ]
+    max_daily_tweets = 140  # 每日精選限制
+    
+    # ===== 步驟1：優化版Twitter爬取 =====
+    def crawl():
         logger.info("📊 步驟1/3：優化版Twitter精選爬取...")
-        
-        crawler = TwitterWeb3Crawler(TWITTER_BEARER_TOKEN)
-        
-        # 優先級類別配置（基於重要性）
-        priority_categories = [
-            ("DeFi", 30),           # 最重要，多抓一些
-            ("Layer1_Layer2", 25),  # 重要
-            ("NFT_GameFi", 20),     # 中等重要
-            ("AI_Crypto", 15),      # 興趣類別
-            ("Infrastructure", 15), # 基礎設施
-            ("RWA", 10),           # 新興領域
-            ("Meme_Coins", 5)      # 娛樂類別，最少
-        ]
-        
         all_tweets = {}
         total_crawled = 0
-        max_daily_tweets = 140  # 每日精選限制
         
         for category, target_count in priority_categories:
             if total_crawled >= max_daily_tweets:
@@ -113,42 +116,34 @@ def run_optimized_pipeline():
             # 如果完全失敗，嘗試加載之前的數據
             logger.warning("⚠️ 本次爬取失敗，嘗試使用之前的數據...")
             import glob
-            import os
             import json
             
             json_files = glob.glob("*web3_tweets*.json")
-            if json_files:
-                latest_file = max(json_files, key=os.path.getctime)
-                logger.info(f"使用數據文件: {latest_file}")
-                with open(latest_file, 'r', encoding='utf-8') as f:
-                    all_tweets = json.load(f)
-                total_crawled = sum(len(tweets) for tweets in all_tweets.values())
-            else:
-                logger.error("❌ 沒有任何可用數據")
-                return False
+            if not json_files:
+                raise ValueError("沒有任何可用數據")
+            latest_file = max(json_files, key=os.path.getctime)
+            logger.info(f"使用數據文件: {latest_file}")
+            with open(latest_file, 'r', encoding='utf-8') as f:
+                all_tweets = json.load(f)
+            total_crawled = sum(len(tweets) for tweets in all_tweets.values())
         
-        # 保存數據
+        logger.info(f"✅ 步驟1完成：成功獲得 {total_crawled} 條精選推文")
+        return all_tweets
+    
+    # 保存數據（與AI分析平行）
+    def export(all_tweets):
         crawler.save_to_json(all_tweets)
         crawler.save_to_csv(all_tweets)
-        
-        logger.info(f"✅ 步驟1完成：成功獲得 {total_crawled} 條精選推文")
-        success_count += 1
-        
-        # ===== 步驟2：AI新聞分析 =====
+    
+    # ===== 步驟2：AI新聞分析 =====
+    def generate_report(all_tweets):
         logger.info("🤖 步驟2/3：AI智能新聞分析...")
-        
-        reporter = Web3NewsReporter(
-            openai_api_key=OPENAI_API_KEY,
-            line_access_token=LINE_ACCESS_TOKEN, 
-            line_user_id=LINE_USER_ID
-        )
+        total_crawled = sum(len(tweets) for tweets in all_tweets.values())
         
         # 生成優化版提示，強調精選內容
         report = reporter.analyze_tweets_with_openai(all_tweets)
-        
         if not report or "錯誤" in report:
-            logger.error("❌ AI新聞分析失敗")
-            return False
+            raise ValueError("AI新聞分析失敗")
         
         # 保存報告
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -160,40 +155,52 @@ def run_optimized_pipeline():
             f.write(report)
         
         logger.info(f"✅ 步驟2完成：報告已保存到 {report_filename}")
-        success_count += 1
-        
-        # ===== 步驟3：LINE推播 =====
-        logger.info("📱 步驟3/3：發送精選新聞到LINE...")
         
         # 在報告前加入統計信息
         enhanced_report = f"📊 今日Web3精選 ({total_crawled}條推文)\n" + "="*30 + "\n\n" + report
-        
-        line_success = reporter.send_to_line(enhanced_report)
-        
-        if line_success:
-            logger.info("✅ 步驟3完成：精選新聞已推送到LINE")
-            success_count += 1
-        else:
-            logger.error("❌ LINE推送失敗")
-        
-        # ===== 總結 =====
-        logger.info("=" * 50)
-        logger.info(f"📋 優化流程完成摘要：")
-        logger.info(f"   成功步驟: {success_count}/{total_steps}")
-        logger.info(f"   精選推文: {total_crawled} 條")
-        logger.info(f"   報告文件: {report_filename}")
-        logger.info(f"   LINE推播: {'✅ 成功' if line_success else '❌ 失敗'}")
-        
-        if success_count == total_steps:
-            logger.info("🎉 優化版Web3新聞流程執行成功！")
-            return True
-        else:
-            logger.warning("⚠️ 流程部分成功，請檢查日誌")
-            return False
-            
+        return {'report': enhanced_report, 'report_file': report_filename}
+    
+    # ===== 步驟3：LINE推播 =====
+    def deliver(enhanced_report):
+        logger.info("📱 步驟3/3：發送精選新聞到LINE...")
+        if not reporter.send_to_line(enhanced_report):
+            raise RuntimeError("LINE推送失敗")
+        logger.info("✅ 步驟3完成：精選新聞已推送到LINE")
+    
+    # 同一天重新執行時，已完成的步驟沿用保存的產物（不重複爬取與推播）
+    pipeline = StagedPipeline('optimized_daily_news')
+    pipeline.add_stage('crawl', crawl, outputs=['tweets'], params={'date': datetime.now().strftime('%Y-%m-%d')})
+    pipeline.add_stage('export', export, inputs=['tweets'])
+    pipeline.add_stage('report', generate_report, inputs=['tweets'], outputs=['report', 'report_file'])
+    pipeline.add_stage('deliver', deliver, inputs=['report'])
+    
+    try:
+        summary = pipeline.run()
     except Exception as e:
         logger.error(f"❌ 流程執行錯誤: {str(e)}")
         return False
+    
+    stages = summary['stages']
+    succeeded = [name for name, stage in stages.items() if stage['status'] in ('completed', 'skipped')]
+    total_crawled = sum(len(tweets) for tweets in pipeline.load('tweets').values()) if 'crawl' in succeeded else 0
+    
+    # ===== 總結 =====
+    logger.info("=" * 50)
+    logger.info(f"📋 優化流程完成摘要：")
+    logger.info(f"   成功步驟: {len(succeeded)}/{len(stages)}")
+    for name, stage in stages.items():
+        logger.info(f"   {name}: {stage['status']} ({stage['seconds']:.1f}s)" + (f" - {stage['error']}" if stage['error'] else ""))
+    logger.info(f"   精選推文: {total_crawled} 條")
+    if 'report' in succeeded:
+        logger.info(f"   報告文件: {pipeline.load('report_file')}")
+    logger.info(f"   LINE推播: {'✅ 成功' if 'deliver' in succeeded else '❌ 失敗'}")
+    
+    if summary['ok']:
+        logger.info("🎉 優化版Web3新聞流程執行成功！")
+        return True
+    else:
+        logger.warning("⚠️ 流程部分成功，請檢查日誌")
+        return False
 
 def main():
     """主函數"""
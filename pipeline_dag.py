@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+分階段流程執行器 - 每個階段宣告輸入與輸出的產物，依相依關係組成 DAG
+產物保存到磁碟並記錄雜湊；輸入沒有變動的階段直接沿用上次的產物，
+因此後段失敗時重新執行不會再花一次爬蟲配額；互不相依的階段平行執行
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterable
+
+
+class StageDeferred(Exception):
+    """階段尚未完成、需要稍後繼續（例如爬取計畫在等待下一個賽道的時間）"""
+
+    def __init__(self, resume_at: float, message: str = ''):
+        super().__init__(message or f"延後至 {datetime.fromtimestamp(resume_at).strftime('%H:%M:%S')} 繼續")
+        self.resume_at = resume_at
+
+
+def artifact_hash(value: Any) -> str:
+    """產物內容的雜湊（JSON 正規化後計算）"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PipelineStage:
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = (), params: Any = None):
+        """
+        流程階段
+
+        Args:
+            name: 階段名稱
+            func: 依 inputs 的順序傳入輸入產物；單一輸出時直接回傳產物，多個輸出時回傳 {產物名稱: 值}
+            inputs: 輸入產物名稱
+            outputs: 輸出產物名稱（沒有輸出的階段例如推播，成功後相同輸入不會再執行）
+            params: 影響結果的額外參數，例如爬取日期（變動時重新執行）
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params
+
+
+class StagedPipeline:
+    def __init__(self, name: str, artifact_dir: str = 'pipeline_artifacts', max_workers: int = 4):
+        """
+        初始化流程
+
+        Args:
+            name: 流程名稱（產物保存在 artifact_dir/name）
+            artifact_dir: 產物根目錄
+            max_workers: 同時執行的階段數量
+        """
+        self.name = name
+        self.directory = os.path.join(artifact_dir, name)
+        self.max_workers = max_workers
+        self.stages: Dict[str, PipelineStage] = {}
+        self.producers: Dict[str, str] = {}
+        self.logger = logging.getLogger(__name__)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        self.values: Dict[str, Any] = {}
+
+    def add_stage(self, name: str, func: Callable[..., Any], inputs: Iterable[str] = (),
+                  outputs: Iterable[str] = (), params: Any = None) -> 'StagedPipeline':
+        """註冊階段（輸入必須由先前註冊的階段產生）"""
+        stage = PipelineStage(name, func, inputs, outputs, params)
+        for artifact in stage.inputs:
+            if artifact not in self.producers:
+                raise ValueError(f"階段 {name} 的輸入 {artifact} 沒有產生它的階段")
+        for artifact in stage.outputs:
+            if artifact in self.producers:
+                raise ValueError(f"產物 {artifact} 已由階段 {self.producers[artifact]} 產生")
+            self.producers[artifact] = name
+        self.stages[name] = stage
+        return self
+
+    def _artifact_path(self, artifact: str) -> str:
+        return os.path.join(self.directory, f"{artifact}.json")
+
+    def _save_artifact(self, artifact: str, value: Any):
+        path = self._artifact_path(artifact)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load(self, artifact: str) -> Any:
+        """讀取產物（沿用上次結果的階段，其產物只在下游需要時才載入）"""
+        if artifact not in self.values:
+            with open(self._artifact_path(artifact), 'r', encoding='utf-8') as f:
+                self.values[artifact] = json.load(f)
+        return self.values[artifact]
+
+    def _input_hash(self, stage: PipelineStage, hashes: Dict[str, str]) -> str:
+        return artifact_hash({'params': stage.params, 'inputs': {artifact: hashes[artifact] for artifact in stage.inputs}})
+
+    def _is_current(self, stage: PipelineStage, input_hash: str) -> bool:
+        record = self.manifest.get(stage.name)
+        return bool(record and record.get('input_hash') == input_hash
+                    and all(os.path.exists(self._artifact_path(artifact)) for artifact in stage.outputs))
+
+    def _execute(self, stage: PipelineStage) -> Dict[str, Any]:
+        """執行階段（工作執行緒）"""
+        result = stage.func(*[self.load(artifact) for artifact in stage.inputs])
+        if len(stage.outputs) == 1:
+            result = {stage.outputs[0]: result}
+        elif not stage.outputs:
+            result = {}
+        missing = [artifact for artifact in stage.outputs if artifact not in result]
+        if missing:
+            raise ValueError(f"階段 {stage.name} 沒有產生 {', '.join(missing)}")
+        for artifact in stage.outputs:
+            self._save_artifact(artifact, result[artifact])
+        return {artifact: result[artifact] for artifact in stage.outputs}
+
+    def run(self, force: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        執行流程
+
+        Args:
+            force: 忽略先前產物、一定重新執行的階段名稱
+
+        Returns:
+            包含 ok、stages（每階段的 status、seconds、error）、seconds 的字典；
+            status 為 completed / skipped / failed / deferred（稍後繼續）/ blocked（上游未完成）；
+            有延後的階段時 resume_at 為最早可繼續的時間
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        force = set(force)
+        start = time.perf_counter()
+        hashes: Dict[str, str] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in pending[:]:
+                    stage = self.stages[name]
+                    upstream = {self.producers[artifact] for artifact in stage.inputs}
+                    if any(results.get(dep, {}).get('status') in ('failed', 'blocked', 'deferred') for dep in upstream):
+                        results[name] = {'status': 'blocked', 'seconds': 0.0, 'error': None}
+                        self.logger.warning(f"⛔ 階段 {name} 因上游未完成未執行")
+                        pending.remove(name)
+                        continue
+                    if not all(dep in results for dep in upstream):
+                        continue
+
+                    pending.remove(name)
+                    input_hash = self._input_hash(stage, hashes)
+                    if name not in force and self._is_current(stage, input_hash):
+                        hashes.update(self.manifest[name]['outputs'])
+                        results[name] = {'status': 'skipped', 'seconds': 0.0, 'error': None}
+                        self.logger.info(f"⏭️ 階段 {name} 輸入未變動，沿用上次產物")
+                        continue
+                    self.logger.info(f"▶️ 階段 {name} 開始")
+                    running[executor.submit(self._execute, stage)] = (name, input_hash, time.perf_counter())
+
+                if not running:
+                    # 跳過的階段可能讓下游就緒，重新掃描
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, input_hash, started = running.pop(future)
+                    seconds = time.perf_counter() - started
+                    try:
+                        outputs = future.result()
+                    except StageDeferred as e:
+                        results[name] = {'status': 'deferred', 'seconds': seconds, 'error': None, 'resume_at': e.resume_at}
+                        self.logger.info(f"⏸️ 階段 {name} {str(e)}")
+                        continue
+                    except Exception as e:
+                        results[name] = {'status': 'failed', 'seconds': seconds, 'error': str(e)}
+                        self.manifest.pop(name, None)
+                        self._save_manifest()
+                        self.logger.error(f"❌ 階段 {name} 失敗 ({seconds:.1f}s): {str(e)}")
+                        continue
+
+                    self.values.update(outputs)
+                    output_hashes = {artifact: artifact_hash(value) for artifact, value in outputs.items()}
+                    hashes.update(output_hashes)
+                    self.manifest[name] = {
+                        'input_hash': input_hash,
+                        'outputs': output_hashes,
+                        'seconds': round(seconds, 3),
+                        'completed_at': datetime.now().isoformat()
+                    }
+                    self._save_manifest()
+                    results[name] = {'status': 'completed', 'seconds': seconds, 'error': None}
+                    self.logger.info(f"✅ 階段 {name} 完成 ({seconds:.1f}s)")
+
+        deferred = [result['resume_at'] for result in results.values() if result['status'] == 'deferred']
+        summary = {
+            'ok': all(result['status'] in ('completed', 'skipped') for result in results.values()),
+            'stages': results,
+            'resume_at': min(deferred) if deferred else None,
+            'seconds': time.perf_counter() - start
+        }
+        # 最近一次執行的結果（監控端點讀取各階段耗時與狀態）
+        self._save_artifact('last_run', dict(summary, finished_at=datetime.now().isoformat()))
+        return summary
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+提示詞預算打包 - 在固定的 token 預算內挑選資訊量最高的推文
+先清理網址、轉推前綴與重複的 Hashtag，移除重複內容，
+再依「每個 token 帶來的新資訊」貪婪挑選，讓提示詞成本可預測
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, List, Any, Callable, Optional
+
+from keyword_tokenizer import extract_tokens
+from near_duplicates import URL_PATTERN, normalize_text, engagement_of
+
+# 導入 tiktoken（若已安裝則精確計算 token 數）
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+RETWEET_PREFIX = re.compile(r'^RT @\w+:\s*')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+_TOKEN_PIECES = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]|[A-Za-z]+|\d+|[^\sA-Za-z\d]')
+
+
+def count_tokens(text: str) -> int:
+    """
+    計算文字的 token 數
+
+    未安裝 tiktoken 時以保守估計代替：中文字每字約1.5個 token，
+    英文單字每4個字母、數字每3位約1個 token，其他符號（含表情）各1個
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+
+    tokens = 0.0
+    for piece in _TOKEN_PIECES.findall(text):
+        if CJK_PATTERN.match(piece):
+            tokens += 1.5
+        elif piece.isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return math.ceil(tokens)
+
+
+def clean_text(text: str, max_hashtags: int = 3) -> str:
+    """移除網址與轉推前綴，重複的 Hashtag 只保留第一次，且最多保留 max_hashtags 個"""
+    text = RETWEET_PREFIX.sub('', URL_PATTERN.sub(' ', text or ''))
+    seen = set()
+
+    def keep_hashtag(match):
+        tag = match.group(0).upper()
+        if tag in seen or len(seen) >= max_hashtags:
+            return ' '
+        seen.add(tag)
+        return match.group(0)
+
+    text = HASHTAG_PATTERN.sub(keep_hashtag, text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截斷文字到 max_tokens 以內（以省略號結尾）"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle] + '…') <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + '…'
+
+
+def information_terms(text: str) -> set:
+    """推文的資訊單位：關鍵字、Cashtag、Hashtag 與中文二字詞"""
+    terms = set(extract_tokens(text))
+    for run in re.findall(r'[\u3400-\u9fff\uf900-\ufaff]+', text):
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class PromptPacker:
+    def __init__(self, budget_tokens: int = 3000, max_tweet_tokens: int = 120,
+                 max_per_category: int = 10, max_hashtags: int = 3):
+        """
+        初始化提示詞打包器
+
+        Args:
+            budget_tokens: 推文段落可使用的 token 總預算
+            max_tweet_tokens: 單條推文內容的 token 上限
+            max_per_category: 每個類別最多挑選的推文數
+            max_hashtags: 每條推文保留的 Hashtag 數量
+        """
+        self.budget_tokens = budget_tokens
+        self.max_tweet_tokens = max_tweet_tokens
+        self.max_per_category = max_per_category
+        self.max_hashtags = max_hashtags
+
+    def prepare_candidates(self, tweets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """清理推文內容，並移除清理後完全相同的推文（保留互動分數較高者）"""
+        best: Dict[str, Dict[str, Any]] = {}
+        for tweet in tweets:
+            text = truncate_to_tokens(clean_text(tweet.get('text', ''), self.max_hashtags), self.max_tweet_tokens)
+            if not text:
+                continue
+            key = normalize_text(text)
+            candidate = dict(tweet, text=text)
+            if key not in best or engagement_of(candidate) > engagement_of(best[key]):
+                best[key] = candidate
+        return list(best.values())
+
+    def pack(self, tweets_data: Dict[str, List[Dict[str, Any]]], format_entry: Callable[[Dict[str, Any]], str],
+             format_header: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+        """
+        在預算內挑選推文
+
+        每一步挑選「新資訊量 / token 成本」最高的推文：新資訊量是該類別尚未涵蓋的
+        資訊單位權重（類別內的 IDF）乘上互動分數與相似推文數的加成。資訊量只會遞減，
+        因此以延遲更新的堆積實作，不必每步重算所有候選
+
+        Args:
+            tweets_data: 按類別分組的推文數據
+            format_entry: 將推文格式化為提示詞段落的函數（用於計算實際成本）
+            format_header: 類別標題的格式化函數，第一次選入該類別時計入成本
+
+        Returns:
+            包含 tweets（各類別選中的推文，依原本的互動排序）、tokens（各類別使用的 token 數）、
+            total_tokens、budget、dropped（各類別未選入的候選數）的字典
+        """
+        candidates: Dict[str, List[Dict[str, Any]]] = {}
+        costs: Dict[str, List[int]] = {}
+        terms: Dict[str, List[set]] = {}
+        weights: Dict[str, Dict[str, float]] = {}
+        boosts: Dict[str, List[float]] = {}
+
+        for category, tweets in tweets_data.items():
+            pool = self.prepare_candidates(tweets)
+            if not pool:
+                continue
+            candidates[category] = pool
+            costs[category] = [count_tokens(format_entry(tweet)) for tweet in pool]
+            terms[category] = [information_terms(tweet['text']) for tweet in pool]
+
+            document_frequency: Dict[str, int] = {}
+            for tweet_terms in terms[category]:
+                for term in tweet_terms:
+                    document_frequency[term] = document_frequency.get(term, 0) + 1
+            weights[category] = {
+                term: math.log(1 + len(pool) / frequency) for term, frequency in document_frequency.items()
+            }
+            boosts[category] = [
+                (1 + math.log1p(engagement_of(tweet)) / 4) * (1 + math.log(tweet.get('cluster_size', 1) or 1))
+                for tweet in pool
+            ]
+
+        covered: Dict[str, set] = {category: set() for category in candidates}
+        selected: Dict[str, List[int]] = {category: [] for category in candidates}
+        tokens: Dict[str, int] = {}
+
+        def header_cost(category: str) -> int:
+            if category in tokens or format_header is None:
+                return 0
+            return count_tokens(format_header(category))
+
+        def gain(category: str, index: int) -> float:
+            new_terms = terms[category][index] - covered[category]
+            value = sum(weights[category][term] for term in new_terms) * boosts[category][index]
+            return value / (costs[category][index] + header_cost(category))
+
+        heap = [(-gain(category, index), category, index) for category in candidates for index in range(len(candidates[category]))]
+        heapq.heapify(heap)
+        used = 0
+
+        while heap:
+            _, category, index = heapq.heappop(heap)
+            if len(selected[category]) >= self.max_per_category:
+                continue
+            current = gain(category, index)
+            # 資訊量已下降（其他推文涵蓋了相同內容），重新排序後再比較
+            if heap and current < -heap[0][0]:
+                heapq.heappush(heap, (-current, category, index))
+                continue
+            if current <= 0:
+                break
+
+            cost = costs[category][index] + header_cost(category)
+            if used + cost > self.budget_tokens:
+                continue
+            used += cost
+            tokens[category] = tokens.get(category, 0) + cost
+            selected[category].append(index)
+            covered[category] |= terms[category][index]
+
+        packed_tweets = {}
+        for category, indexes in selected.items():
+            if not indexes:
+                continue
+            chosen = [candidates[category][index] for index in indexes]
+            packed_tweets[category] = sorted(chosen, key=engagement_of, reverse=True)
+
+        return {
+            'tweets': packed_tweets,
+            'tokens': tokens,
+            'total_tokens': used,
+            'budget': self.budget_tokens,
+            'dropped': {
+                category: len(candidates[category]) - len(selected[category]) for category in candidates
+            }
+        }
@@ -12,6 +12,13 @@ from dotenv import load_dotenv
 # 載入環境變數
 load_dotenv()
 
+# 導入OpenAI回應快取
+try:
+    from llm_cache import LLMResponseCache, cache_key
+    LLM_CACHE_AVAILABLE = True
+except ImportError:
+    LLM_CACHE_AVAILABLE = False
+
 def quick_test():
     print("🚀 快速測試Web3新聞生成...")
     
@@ -52,6 +59,8 @@ def quick_test():
     
     # AI分析
     openai.api_key = OPENAI_API_KEY
+    if os.getenv('OPENAI_API_BASE'):
+        openai.api_base = os.getenv('OPENAI_API_BASE')
     
     prompt = f"""
 請根據以下Web3推文數據，生成一份簡潔的新聞報告：
@@ -84,19 +93,33 @@ def quick_test():
 """
     
     print("🤖 正在生成AI新聞報告...")
+    system_prompt = "你是專業的Web3新聞分析師，為繁體中文用戶提供準確簡潔的加密貨幣新聞摘要。"
+    cache = LLMResponseCache() if LLM_CACHE_AVAILABLE else None
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "你是專業的Web3新聞分析師，為繁體中文用戶提供準確簡潔的加密貨幣新聞摘要。"},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=800,
-            temperature=0.7
-        )
+        key = cache_key("gpt-4o-mini", system_prompt, prompt, max_tokens=800, temperature=0.7) if cache else None
+        report = cache.get(key) if cache else None
+        
+        if report is not None:
+            print("♻️ 使用快取的AI報告")
+        else:
+            response = openai.ChatCompletion.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=800,
+                temperature=0.7
+            )
+            
+            report = response.choices[0].message.content.strip()
+            if cache:
+                cache.set(key, "gpt-4o-mini", report)
+            print("✅ AI報告生成成功")
         
-        report = response.choices[0].message.content.strip()
-        print("✅ AI報告生成成功")
+        if cache:
+            stats = cache.stats()
+            print(f"📦 回應快取: 命中 {stats['hits']} / 未命中 {stats['misses']} (命中率 {stats['hit_rate']:.1%})")
         
     except Exception as e:
         print(f"❌ AI分析失敗: {str(e)}")
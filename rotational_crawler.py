@@ -9,7 +9,7 @@ import json
 import time
 import csv
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 import os
 from dotenv import load_dotenv
@@ -26,10 +26,64 @@ except ImportError as e:
     NEWS_REPORTER_AVAILABLE = False
     print(f"❌ Failed to import news reporter: {e}")
 
+# 導入關鍵字熱度草圖
+try:
+    from keyword_sketch import KeywordTrendSketch
+    KEYWORD_SKETCH_AVAILABLE = True
+except ImportError:
+    KEYWORD_SKETCH_AVAILABLE = False
+
+# 導入每日彙總表
+try:
+    from daily_rollups import DailyRollupStore
+    DAILY_ROLLUPS_AVAILABLE = True
+except ImportError:
+    DAILY_ROLLUPS_AVAILABLE = False
+
+# 導入關鍵字爆量偵測器
+try:
+    from burst_detector import KeywordBurstDetector
+    BURST_DETECTOR_AVAILABLE = True
+except ImportError:
+    BURST_DETECTOR_AVAILABLE = False
+
+# 導入近似重複推文偵測
+try:
+    from near_duplicates import collapse_near_duplicates
+    NEAR_DUPLICATES_AVAILABLE = True
+except ImportError:
+    NEAR_DUPLICATES_AVAILABLE = False
+
+# 導入標籤共現圖
+try:
+    from cooccurrence_graph import CooccurrenceGraph
+    COOCCURRENCE_GRAPH_AVAILABLE = True
+except ImportError:
+    COOCCURRENCE_GRAPH_AVAILABLE = False
+
+# 導入無頭圖表渲染
+try:
+    import pandas as pd
+    from chart_renderer import prepare_chart_payloads, render_all
+    CHART_RENDERER_AVAILABLE = True
+except ImportError:
+    CHART_RENDERER_AVAILABLE = False
+
+# 導入執行統計紀錄（排程器的監控端點讀取）
+try:
+    from metrics_server import record_run_metrics
+    RUN_METRICS_AVAILABLE = True
+except ImportError:
+    RUN_METRICS_AVAILABLE = False
+
+from pipeline_dag import StagedPipeline, StageDeferred
+from crawl_plan import CrawlPlanStore, run_due_steps
+
 class RotationalWeb3Crawler:
     def __init__(self, bearer_token: str):
         """輪替式爬蟲 - 智能選擇今日要爬的賽道"""
         self.client = tweepy.Client(bearer_token=bearer_token)
+        self.client.session.hooks['response'].append(self.track_rate_limit)
         self.setup_logging()
         
         # 7個賽道的輪替計劃
@@ -45,6 +99,23 @@ class RotationalWeb3Crawler:
         
         # 輪替狀態檔案
         self.rotation_file = "crawler_rotation_state.json"
+        
+        # 可續跑的爬取計畫資料庫
+        self.crawl_plan_db = "crawl_plans.db"
+        
+        # 關鍵字熱度草圖狀態檔案（保留最近90天）
+        self.keyword_sketch_file = "keyword_sketch_state.json"
+        self.keyword_sketch_retention_days = 90
+        
+        # 每日彙總表資料庫（逐條推文的去重紀錄保留最近90天）
+        self.rollup_db = "daily_rollups.db"
+        self.rollup_tweet_retention_days = 90
+        
+        # 每小時關鍵字計數（爆量偵測）狀態檔案
+        self.burst_state_file = "keyword_burst_state.json"
+        
+        # Cashtag/Hashtag 共現圖狀態檔案
+        self.cooccurrence_file = "cooccurrence_graph_state.json"
 
     def setup_logging(self):
         """設置日誌"""
@@ -102,6 +173,20 @@ class RotationalWeb3Crawler:
         self.logger.info(f"📅 今日選定賽道: {', '.join(todays_categories)}")
         return todays_categories
 
+    def track_rate_limit(self, response, *args, **kwargs):
+        """從每個API回應的標頭記錄剩餘配額"""
+        remaining = response.headers.get('x-rate-limit-remaining')
+        if remaining is None or not RUN_METRICS_AVAILABLE:
+            return
+        try:
+            record_run_metrics('twitter_rate_limit', {
+                'remaining': int(remaining),
+                'limit': int(response.headers.get('x-rate-limit-limit', 0)),
+                'reset': int(response.headers.get('x-rate-limit-reset', 0))
+            })
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ 記錄API配額失敗: {str(e)}")
+
     def crawl_single_category(self, category: str, keywords: List[str], max_results: int = 40) -> List[Dict[str, Any]]:
         """爬取單一賽道 - 使用最簡單策略"""
         
@@ -246,45 +331,79 @@ class RotationalWeb3Crawler:
         print(f"🧪 測試資料生成: {category} - {len(test_tweets)} 條推文")
         return test_tweets
 
-    def run_daily_crawl(self) -> Dict[str, List[Dict[str, Any]]]:
-        """執行每日輪替爬取"""
+    def crawl_category_step(self, step: Dict[str, Any], attempt: int) -> Dict[str, Any]:
+        """爬取計畫中的一個賽道；成功時下一個賽道需間隔5分鐘"""
+        category = step['category']
+        self.logger.info(f"📊 處理 {category} ({step['index'] + 1}/{step['total']})...")
+        
+        keywords = self.web3_categories[category]
+        tweets = self.crawl_single_category(category, keywords, max_results=50)
+        
+        # 收斂複製貼上的洗版推文
+        if NEAR_DUPLICATES_AVAILABLE and tweets:
+            before = len(tweets)
+            tweets = collapse_near_duplicates({category: tweets})[category]
+            if len(tweets) < before:
+                self.logger.info(f"🧹 {category}: 收斂 {before - len(tweets)} 條近似重複推文")
+        
+        # 類別間延遲 - 只有成功才延遲
+        delay_minutes = 5 if tweets else 0
+        if delay_minutes and step['index'] < step['total'] - 1:
+            self.logger.info(f"⏰ 成功爬取，{delay_minutes} 分鐘後由排程器繼續下一個賽道")
+        return {'result': tweets, 'delay': delay_minutes * 60}
+
+    def run_daily_crawl(self, run_date: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        執行每日輪替爬取（可續跑）
         
-        self.logger.info("🚀 開始輪替式Web3爬取...")
+        執行所有已到期的賽道步驟；還有賽道需要等待時拋出 StageDeferred，
+        由排程器在下一步可執行時呼叫 resume() 繼續，不在行程內睡眠
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        plan_id = f"rotational:{run_date}"
+        store = CrawlPlanStore(self.crawl_plan_db)
         
-        # 選擇今日賽道
-        todays_categories = self.get_todays_categories()
+        try:
+            plan = store.get(plan_id)
+            if plan is None:
+                self.logger.info("🚀 開始輪替式Web3爬取...")
+                
+                # 選擇今日賽道
+                todays_categories = self.get_todays_categories()
+                steps = [{'category': category, 'index': i, 'total': len(todays_categories)}
+                         for i, category in enumerate(todays_categories)]
+                store.create(plan_id, 'rotational', run_date, steps)
+            
+            plan = run_due_steps(store, plan_id, self.crawl_category_step)
+        finally:
+            store.close()
         
-        all_tweets = {}
-        total_crawled = 0
+        if plan['status'] == 'failed':
+            raise RuntimeError(f"{run_date} 的爬取計畫已失敗（步驟超過嘗試上限或已過期）")
+        if plan['status'] != 'done':
+            raise StageDeferred(plan['not_before'], f"還有 {len(plan['steps']) - plan['cursor']} 個賽道，"
+                                f"{datetime.fromtimestamp(plan['not_before']).strftime('%H:%M')} 繼續")
         
-        for i, category in enumerate(todays_categories):
-            self.logger.info(f"📊 處理 {category} ({i+1}/{len(todays_categories)})...")
-            
-            keywords = self.web3_categories[category]
-            tweets = self.crawl_single_category(category, keywords, max_results=50)
-            
-            all_tweets[category] = tweets
-            total_crawled += len(tweets)
-            
-            # 類別間延遲 - 如果不是最後一個
-            if i < len(todays_categories) - 1 and tweets:  # 只有成功才延遲
-                delay_minutes = 5  # 5分鐘延遲
-                self.logger.info(f"⏰ 成功爬取，等待 {delay_minutes} 分鐘後處理下一個賽道...")
-                time.sleep(delay_minutes * 60)
+        all_tweets = plan['results']
+        todays_categories = [step['category'] for step in plan['steps']]
+        total_crawled = sum(len(tweets) for tweets in all_tweets.values())
         
         # 為未爬取的賽道填入空陣列（保持結構完整）
         for category in self.web3_categories.keys():
             if category not in all_tweets:
                 all_tweets[category] = []
         
+        if RUN_METRICS_AVAILABLE:
+            record_run_metrics('tweets_fetched', {category: len(all_tweets[category]) for category in todays_categories})
+        
         self.logger.info(f"🎉 今日輪替爬取完成！")
         self.logger.info(f"📈 爬取賽道: {', '.join([k for k, v in all_tweets.items() if v])}")
         self.logger.info(f"📊 總推文數: {total_crawled}")
         
         return all_tweets
 
-    def save_results(self, data: Dict[str, List[Dict[str, Any]]]):
-        """保存結果"""
+    def save_results(self, data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, str]:
+        """保存結果，回傳輸出的檔案路徑"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # JSON
@@ -292,6 +411,8 @@ class RotationalWeb3Crawler:
         with open(json_filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
+        files = {'json': json_filename}
+        
         # CSV
         all_tweets = []
         for category, tweets in data.items():
@@ -305,10 +426,119 @@ class RotationalWeb3Crawler:
                 writer = csv.DictWriter(csvfile, fieldnames=all_tweets[0].keys())
                 writer.writeheader()
                 writer.writerows(all_tweets)
+            files['csv'] = csv_filename
         
         self.logger.info(f"💾 結果已保存: {json_filename}")
+        
+        # 更新累積統計
+        self.update_trend_stores(data)
+        return files
+
+    def update_trend_stores(self, data: Dict[str, List[Dict[str, Any]]]):
+        """將本次爬取結果增量更新到累積統計"""
+        if KEYWORD_SKETCH_AVAILABLE:
+            try:
+                sketch = KeywordTrendSketch.load(self.keyword_sketch_file, retention_days=self.keyword_sketch_retention_days)
+                sketch.ingest_tweets(data)
+                sketch.save(self.keyword_sketch_file)
+                self.logger.info(f"📈 關鍵字熱度草圖已更新: {self.keyword_sketch_file}")
+            except Exception as e:
+                self.logger.warning(f"⚠️ 更新關鍵字熱度草圖失敗: {str(e)}")
+        
+        if DAILY_ROLLUPS_AVAILABLE:
+            try:
+                store = DailyRollupStore(self.rollup_db)
+                try:
+                    new_tweets = store.ingest_tweets(data)
+                    store.prune_tweets(self.rollup_tweet_retention_days)
+                finally:
+                    store.close()
+                self.logger.info(f"📊 每日彙總表已更新: 新增 {new_tweets} 條推文")
+            except Exception as e:
+                self.logger.warning(f"⚠️ 更新每日彙總表失敗: {str(e)}")
+        
+        if BURST_DETECTOR_AVAILABLE:
+            try:
+                detector = KeywordBurstDetector.load(self.burst_state_file)
+                detector.ingest_tweets(data)
+                detector.save(self.burst_state_file)
+                self.logger.info(f"🔥 每小時關鍵字計數已更新: {self.burst_state_file}")
+            except Exception as e:
+                self.logger.warning(f"⚠️ 更新每小時關鍵字計數失敗: {str(e)}")
+        
+        if COOCCURRENCE_GRAPH_AVAILABLE:
+            try:
+                graph = CooccurrenceGraph.load(self.cooccurrence_file)
+                graph.ingest_tweets(data)
+                graph.save(self.cooccurrence_file)
+                self.logger.info(f"🔗 標籤共現圖已更新: {self.cooccurrence_file}")
+            except Exception as e:
+                self.logger.warning(f"⚠️ 更新標籤共現圖失敗: {str(e)}")
 
-def main():
+def render_charts(data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """將本次爬取結果渲染為圖表"""
+    all_tweets = [tweet for tweets in data.values() for tweet in tweets]
+    if not all_tweets:
+        return {}
+    df = pd.DataFrame(all_tweets)
+    # 只有幾張圖，在流程的工作執行緒內直接渲染，不另開行程
+    return render_all(prepare_chart_payloads(df), output_dir='charts', prefix='rotational_', workers=1)
+
+def build_pipeline(crawler: RotationalWeb3Crawler, run_date: str) -> StagedPipeline:
+    """
+    爬取 → (保存/CSV、圖表、AI報告) → LINE推播
+
+    爬取以日期為參數，同一天重新執行時沿用已爬取的推文，不再消耗API配額；
+    爬取計畫還在等待下一個賽道時，後續階段留到 resume() 再執行；
+    保存、圖表與報告只依賴推文，平行執行
+    """
+    pipeline = StagedPipeline('rotational')
+    pipeline.add_stage('crawl', lambda: crawler.run_daily_crawl(run_date), outputs=['tweets'],
+                       params={'date': run_date})
+    pipeline.add_stage('export', crawler.save_results, inputs=['tweets'], outputs=['exports'])
+    if CHART_RENDERER_AVAILABLE:
+        pipeline.add_stage('charts', render_charts, inputs=['tweets'], outputs=['charts'])
+    
+    # LINE Bot 推播功能
+    openai_key = os.getenv('OPENAI_API_KEY')
+    line_token = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
+    line_user_id = os.getenv('LINE_USER_ID')
+    if not NEWS_REPORTER_AVAILABLE or not (openai_key and line_token and line_user_id):
+        print("⚠️ 缺少 API 設定，跳過 LINE 推播")
+        return pipeline
+    
+    reporter = Web3NewsReporter(
+        openai_api_key=openai_key,
+        line_access_token=line_token,
+        line_user_id=line_user_id,
+        line_api_base=os.getenv('LINE_API_BASE', 'https://api.line.me')
+    )
+    
+    def generate_report(tweets: Dict[str, List[Dict[str, Any]]]) -> str:
+        if not any(tweets.values()):
+            raise ValueError("今日沒有成功爬取的推文")
+        report = reporter.analyze_tweets_with_openai(tweets)
+        if not report or "錯誤" in report:
+            raise ValueError("報告生成失敗")
+        return report
+    
+    def deliver(report: str):
+        if not reporter.deliver_report(report):
+            raise RuntimeError("LINE 新聞報告推播失敗")
+    
+    pipeline.add_stage('report', generate_report, inputs=['tweets'], outputs=['report'])
+    pipeline.add_stage('deliver', deliver, inputs=['report'])
+    return pipeline
+
+def main(run_date: Optional[str] = None, follow: bool = False):
+    """
+    執行今日（或指定日期）的輪替爬取流程
+
+    Args:
+        run_date: 爬取日期（續跑既有計畫時指定）
+        follow: 在行程內等待並完成整個爬取計畫（單獨由 cron/launchd 執行時）；
+                否則賽道間的等待交由排程器的 resume() 繼續
+    """
     BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN', "AAAAAAAAAAAAAAAAAAAAAF833wEAAAAAVK2bhuSiu%2FaikoUWzmEQvdS%2BJhE%3DjNPAILRXsZOyy1waEYDjahABCRLjG8d9LLyLMAF0CQ3LCckCPq")
     
     print("🔄 輪替式Web3爬蟲")
@@ -320,11 +550,24 @@ def main():
     
     crawler = RotationalWeb3Crawler(BEARER_TOKEN)
     
-    # 執行爬取
-    results = crawler.run_daily_crawl()
+    # 執行爬取、保存、圖表、報告與推播
+    run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+    pipeline = build_pipeline(crawler, run_date)
+    summary = pipeline.run()
+    while follow and summary['stages']['crawl']['status'] == 'deferred':
+        wait_seconds = max(0.0, summary['resume_at'] - time.time())
+        print(f"⏰ {wait_seconds / 60:.1f} 分鐘後繼續下一個賽道...")
+        time.sleep(wait_seconds)
+        summary = pipeline.run()
     
-    # 保存結果
-    crawler.save_results(results)
+    if summary['stages']['crawl']['status'] == 'failed':
+        print(f"❌ 今日爬取失敗: {summary['stages']['crawl']['error']}")
+        return False
+    if summary['stages']['crawl']['status'] == 'deferred':
+        resume_at = datetime.fromtimestamp(summary['resume_at']).strftime('%H:%M')
+        print(f"⏸️ {run_date} 的爬取計畫將於 {resume_at} 由排程器繼續")
+        return True
+    results = pipeline.load('tweets')
     
     # 顯示結果摘要
     print("\n📊 今日爬取摘要:")
@@ -339,42 +582,32 @@ def main():
             print(f"   ✅ {category}: {len(tweets)} 條推文 (平均互動: {avg_engagement:.1f})")
     
     print(f"\n🎉 成功爬取 {successful_categories} 個賽道，共 {total_tweets} 條推文")
-    print(f"🔍 Debug: successful_categories = {successful_categories}, NEWS_REPORTER_AVAILABLE = {NEWS_REPORTER_AVAILABLE}")
+    for name, stage in summary['stages'].items():
+        print(f"   {name}: {stage['status']} ({stage['seconds']:.1f}s)" + (f" - {stage['error']}" if stage['error'] else ""))
     
-    # LINE Bot 推播功能
-    if successful_categories >= 1 and NEWS_REPORTER_AVAILABLE:
-        try:
-            print("\n📱 開始生成並推播 LINE 新聞報告...")
-            
-            # 獲取環境變數
-            openai_key = os.getenv('OPENAI_API_KEY')
-            line_token = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
-            line_user_id = os.getenv('LINE_USER_ID')
-            
-            if openai_key and line_token and line_user_id:
-                # 初始化新聞報告器
-                reporter = Web3NewsReporter(
-                    openai_api_key=openai_key,
-                    line_access_token=line_token,
-                    line_user_id=line_user_id
-                )
-                
-                # 生成並發送報告
-                success = reporter.generate_and_send_report(results)
-                if success:
-                    print("✅ LINE 新聞報告已成功推播！")
-                else:
-                    print("❌ LINE 新聞報告推播失敗")
-            else:
-                print("⚠️ 缺少 API 設定，跳過 LINE 推播")
-                
-        except Exception as e:
-            print(f"❌ LINE 推播過程發生錯誤: {str(e)}")
+    if 'deliver' in summary['stages']:
+        if summary['stages']['deliver']['status'] in ('completed', 'skipped'):
+            print("✅ LINE 新聞報告已成功推播！")
+        else:
+            print("❌ LINE 新聞報告推播失敗")
     
     if successful_categories >= 1:
         print("✅ 輪替策略成功！建議每日執行以實現完整覆蓋")
     else:
         print("❌ 今日爬取失敗，可能需要等待更長時間")
+    return summary['ok']
+
+def resume():
+    """繼續所有已到期的輪替爬取計畫（由排程器在計畫的下一步可執行時呼叫）"""
+    store = CrawlPlanStore()
+    plans = store.due_plans('rotational')
+    store.close()
+    
+    ok = True
+    for plan in plans:
+        ok = main(plan['run_date']) is not False and ok
+    return ok
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 單獨執行（cron/launchd）時沒有排程器續跑，在行程內完成整個計畫
+    main(follow=True)
\ No newline at end of file
@@ -1,15 +1,63 @@
 #!/usr/bin/env python3
 """
 Zeabur 排程器 - 替代 cron job 的解決方案
-每分鐘檢查是否到了執行時間（每天早上8點台灣時間）
+依 cron 表達式排程爬蟲（預設每天早上8點台灣時間）、報告與狀態清理任務，
+睡到下一個排程時間；重啟時依補跑策略補上錯過的執行
 """
 
 import time
 import subprocess
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
+from dotenv import load_dotenv
+
+# 載入環境變數
+load_dotenv()
+
+# 導入LINE發送佇列（爬蟲排入的報告由排程器常駐投遞）
+try:
+    from line_client import LineClient
+    from line_outbox import LineOutbox, OutboxWorker
+    LINE_OUTBOX_AVAILABLE = True
+except ImportError:
+    LINE_OUTBOX_AVAILABLE = False
+
+# 導入暖啟動任務執行器（forkserver 預先載入爬蟲模組，執行時從中 fork 並逐行轉送輸出）
+try:
+    from job_runner import JobRunner
+    JOB_RUNNER_AVAILABLE = True
+except ImportError:
+    JOB_RUNNER_AVAILABLE = False
+
+# 導入 cron 排程（缺少時退回每分鐘檢查）
+try:
+    from cron_scheduler import CronScheduler, JobStore, CATCHUP_POLICIES
+    CRON_SCHEDULER_AVAILABLE = True
+except ImportError:
+    CRON_SCHEDULER_AVAILABLE = False
+
+# 導入健康檢查與監控指標伺服器
+try:
+    from metrics_server import HealthServer, MetricsCollector
+    METRICS_SERVER_AVAILABLE = True
+except ImportError:
+    METRICS_SERVER_AVAILABLE = False
+
+# 導入可續跑的爬取計畫（爬蟲在賽道之間結束行程，由排程器到時繼續）
+try:
+    from crawl_plan import CrawlPlanStore
+    CRAWL_PLAN_AVAILABLE = True
+except ImportError:
+    CRAWL_PLAN_AVAILABLE = False
+
+# 導入LLM回應快取（清理任務使用）
+try:
+    from llm_cache import LLMResponseCache
+    LLM_CACHE_AVAILABLE = True
+except ImportError:
+    LLM_CACHE_AVAILABLE = False
 
 # 設置日誌
 logging.basicConfig(
@@ -22,6 +70,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 單一任務（爬蟲、報告、計畫續跑）的逾時秒數
+JOB_TIMEOUT_SECONDS = 1800
+
+job_runner = JobRunner(preload=['rotational_crawler'], logger=logger) if JOB_RUNNER_AVAILABLE else None
+
 def is_execution_time():
     """檢查是否為執行時間（每天早上8點台灣時間）"""
     taipei_tz = pytz.timezone('Asia/Taipei')
@@ -52,30 +105,202 @@ def mark_as_run():
 
 def run_crawler():
     """執行爬蟲"""
+    if job_runner:
+        logger.info("開始執行爬蟲...")
+        result = job_runner.run('rotational_crawler', timeout=JOB_TIMEOUT_SECONDS)
+        if result['timed_out']:
+            logger.error("爬蟲執行超時")
+        elif result['ok']:
+            logger.info(f"爬蟲執行成功 (啟動 {result['startup_seconds'] * 1000:.0f}ms, 總計 {result['seconds']:.0f}s)")
+            mark_as_run()
+        else:
+            logger.error(f"爬蟲執行失敗: 結束代碼 {result['exit_code']}")
+        return result['ok']
+    
     try:
         logger.info("開始執行爬蟲...")
+        # 不經 __main__（單獨執行時會在行程內等完整個計畫），賽道間的等待交由 crawl_resume
         result = subprocess.run(
-            ['python3', 'rotational_crawler.py'],
+            ['python3', '-c', 'import rotational_crawler; rotational_crawler.main()'],
             capture_output=True,
             text=True,
-            timeout=1800  # 30分鐘超時
+            timeout=JOB_TIMEOUT_SECONDS
         )
         
         if result.returncode == 0:
             logger.info("爬蟲執行成功")
             mark_as_run()
-        else:
-            logger.error(f"爬蟲執行失敗: {result.stderr}")
+            return True
+        logger.error(f"爬蟲執行失敗: {result.stderr}")
             
     except subprocess.TimeoutExpired:
         logger.error("爬蟲執行超時")
     except Exception as e:
         logger.error(f"爬蟲執行異常: {e}")
+    return False
+
+def run_report():
+    """從最新的爬取資料生成並發送報告"""
+    if job_runner:
+        return job_runner.run('news_reporter', timeout=JOB_TIMEOUT_SECONDS)['ok']
+    return subprocess.run(['python3', 'news_reporter.py'], timeout=JOB_TIMEOUT_SECONDS).returncode == 0
+
+# 計畫種類對應的爬蟲模組（模組提供 resume() 繼續到期的計畫）
+CRAWL_PLAN_MODULES = {
+    'rotational': 'rotational_crawler',
+    'full_coverage': 'full_coverage_crawler'
+}
+
+def next_crawl_step():
+    """最近一個未完成的爬取計畫可以繼續的時間（epoch 秒）"""
+    store = CrawlPlanStore()
+    try:
+        expired = store.expire_stale()
+        if expired:
+            logger.warning(f"{expired} 個爬取計畫已過執行日期，標記為失敗")
+        return store.next_due()
+    finally:
+        store.close()
+
+def run_crawl_continuations():
+    """繼續到期的爬取計畫，每個爬蟲執行到下一段等待為止"""
+    store = CrawlPlanStore()
+    try:
+        kinds = {plan['kind'] for plan in store.due_plans()}
+    finally:
+        store.close()
+    
+    ok = True
+    for kind in sorted(kinds):
+        module = CRAWL_PLAN_MODULES.get(kind)
+        if not module:
+            logger.warning(f"未知的爬取計畫種類: {kind}")
+            continue
+        logger.info(f"繼續爬取計畫: {kind}")
+        if job_runner:
+            ok = job_runner.run(module, 'resume', timeout=JOB_TIMEOUT_SECONDS)['ok'] and ok
+        else:
+            ok = subprocess.run(['python3', '-c', f'import {module}; {module}.resume()'],
+                                timeout=JOB_TIMEOUT_SECONDS).returncode == 0 and ok
+    return ok
+
+def compact_stores():
+    """清理累積的狀態：過期的LLM快取、已送達的發送佇列項目"""
+    if LLM_CACHE_AVAILABLE:
+        cache = LLMResponseCache()
+        removed = cache.prune()
+        cache.close()
+        logger.info(f"LLM快取清理: 移除 {removed} 個項目")
+    if LINE_OUTBOX_AVAILABLE:
+        outbox = LineOutbox()
+        removed = outbox.purge_delivered(float(os.getenv('OUTBOX_RETENTION_DAYS', '30')))
+        outbox.close()
+        logger.info(f"LINE發送佇列清理: 移除 {removed} 個已送達項目")
+
+def start_outbox_worker():
+    """啟動常駐的LINE發送佇列投遞執行緒（含重啟前未完成的項目）"""
+    token = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
+    if not LINE_OUTBOX_AVAILABLE or not token:
+        logger.info("未啟用LINE發送佇列投遞")
+        return None
+    
+    outbox = LineOutbox()
+    # LINE_API_BASE 與報告器一致（指向本地測試伺服器時，佇列也投遞到測試伺服器）
+    worker = OutboxWorker(outbox, LineClient(token, api_base=os.getenv('LINE_API_BASE', 'https://api.line.me')))
+    worker.start()
+    logger.info(f"LINE發送佇列投遞已啟動: {outbox.counts()}")
+    return worker
+
+def build_cron_scheduler():
+    """
+    依環境變數註冊排程任務
+
+    CRAWL_CRON（預設 "0 8 * * *"）、REPORT_CRON（未設定則不啟用，爬蟲結束時已發送報告）、
+    COMPACTION_CRON（預設 "30 3 * * *"，設為空字串停用）、CATCHUP_POLICY（skip / once / all，預設 once）；
+    未完成的爬取計畫另以延續任務 crawl_resume 在下一步到期時繼續
+    """
+    scheduler = CronScheduler(JobStore())
+    catchup = os.getenv('CATCHUP_POLICY', 'once')
+    if catchup not in CATCHUP_POLICIES:
+        logger.error(f"未知的補跑策略 CATCHUP_POLICY={catchup}，改用 once")
+        catchup = 'once'
+    
+    # 沿用舊版 last_run.txt：今天尚未執行時，8點後重啟仍會補跑
+    crawl_baseline = None
+    try:
+        with open('last_run.txt', 'r') as f:
+            last_day = datetime.strptime(f.read().strip(), '%Y-%m-%d')
+        crawl_baseline = pytz.timezone('Asia/Taipei').localize(last_day + timedelta(days=1))
+    except (FileNotFoundError, ValueError):
+        pass
+    
+    try:
+        scheduler.add_job('crawl', os.getenv('CRAWL_CRON', '0 8 * * *'), run_crawler,
+                          catchup=catchup, baseline=crawl_baseline)
+    except ValueError as e:
+        # 爬蟲是主要任務，設定錯誤時退回預設時間而不是停止排程
+        logger.error(f"CRAWL_CRON 無效，改用預設 0 8 * * *: {e}")
+        scheduler.add_job('crawl', '0 8 * * *', run_crawler, catchup=catchup, baseline=crawl_baseline)
+    for name, expression, func, job_catchup in (('report', os.getenv('REPORT_CRON'), run_report, catchup),
+                                                ('compaction', os.getenv('COMPACTION_CRON', '30 3 * * *'),
+                                                 compact_stores, 'once')):
+        if not expression:
+            continue
+        try:
+            scheduler.add_job(name, expression, func, catchup=job_catchup)
+        except ValueError as e:
+            logger.error(f"任務 {name} 的 cron 表達式無效，未啟用: {e}")
+    if CRAWL_PLAN_AVAILABLE:
+        # 爬取計畫的下一步不依 cron，到了計畫記錄的時間就繼續（重啟後同樣接續）
+        scheduler.add_continuation('crawl_resume', run_crawl_continuations, next_crawl_step)
+    return scheduler
+
+def start_health_server(outbox_worker=None):
+    """在背景執行緒啟動健康檢查與指標端點（PORT，預設8080）"""
+    if not METRICS_SERVER_AVAILABLE:
+        return None
+    
+    try:
+        server = HealthServer(MetricsCollector(outbox_worker=outbox_worker), port=int(os.getenv('PORT', '8080')))
+    except OSError as e:
+        logger.warning(f"健康檢查端點啟動失敗: {e}")
+        return None
+    server.start()
+    logger.info(f"健康檢查端點已啟動: http://0.0.0.0:{server.port}/healthz /readyz /metrics")
+    return server
 
 def main():
-    """主循環 - 每分鐘檢查一次"""
+    """主循環 - 睡到下一個排程時間"""
     logger.info("排程器啟動")
+    # 先啟動 forkserver 再啟動背景執行緒；任務一律由單執行緒的 forkserver fork 出來
+    if job_runner:
+        job_runner.preload()
+    health_server = start_health_server(start_outbox_worker())
+    
+    scheduler = None
+    if CRON_SCHEDULER_AVAILABLE:
+        try:
+            scheduler = build_cron_scheduler()
+        except Exception as e:
+            # 例如狀態檔無法寫入：退回每分鐘檢查，不讓排程器就此停止
+            logger.error(f"cron 排程建立失敗，改用每分鐘檢查: {e}")
+    
+    if scheduler:
+        if health_server:
+            # 每個任務開始與結束時都會更新心跳；最長的單一任務是依序續跑各種爬取計畫，
+            # 超過一次最長睡眠加上該任務的逾時仍沒有活動，才視為卡住
+            longest_job = JOB_TIMEOUT_SECONDS * max(1, len(CRAWL_PLAN_MODULES))
+            liveness_timeout = scheduler.max_sleep_seconds + longest_job + 600
+            health_server.live_check = lambda: time.time() - scheduler.last_tick < liveness_timeout
+            health_server.ready = True
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            logger.info("排程器停止")
+        return
     
+    if health_server:
+        health_server.ready = True
     while True:
         try:
             taipei_tz = pytz.timezone('Asia/Taipei')
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+多檔案推文快照載入 - 依日期範圍與來源類型挑選各爬蟲的輸出檔案
+以平行分塊載入，按 tweet_id 去重並保留最新一次的互動數
+"""
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+from typing import Dict, List, Any, Iterable, Optional, Tuple, Union
+
+# 來源類型 -> 檔名前綴（對應各爬蟲的 save 方法）
+SNAPSHOT_SOURCES = {
+    'standard': 'web3_tweets_',
+    'smart': 'smart_web3_tweets_',
+    'improved': 'improved_web3_tweets_',
+    'rotational': 'rotational_web3_',
+    'hybrid': 'hybrid_daily_',
+    'full_coverage': 'full_coverage_web3_',
+    'free_tier': 'free_tier_',
+    'safe_free': 'safe_free_'
+}
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _to_date(value: DateLike) -> Optional[date]:
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def find_snapshots(start: DateLike = None, end: DateLike = None, sources: Optional[Iterable[str]] = None,
+                   directory: str = '.') -> List[Tuple[datetime, str, str]]:
+    """
+    找出日期範圍內的快照檔案
+
+    Args:
+        start: 起始日期（含），YYYY-MM-DD 或 date
+        end: 結束日期（含）
+        sources: 來源類型列表（SNAPSHOT_SOURCES 的鍵），None 表示全部
+        directory: 搜尋目錄
+
+    Returns:
+        依時間排序的 (快照時間, 來源類型, 檔案路徑) 列表
+    """
+    sources = list(sources) if sources else list(SNAPSHOT_SOURCES)
+    unknown = [source for source in sources if source not in SNAPSHOT_SOURCES]
+    if unknown:
+        raise ValueError(f"未知的來源類型: {', '.join(unknown)}")
+
+    patterns = {
+        source: re.compile(rf'^{re.escape(SNAPSHOT_SOURCES[source])}(\d{{8}}_\d{{6}})\.json$')
+        for source in sources
+    }
+    start_date, end_date = _to_date(start), _to_date(end)
+
+    snapshots = []
+    for filename in os.listdir(directory):
+        for source, pattern in patterns.items():
+            match = pattern.match(filename)
+            if not match:
+                continue
+            timestamp = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+            if (start_date is None or timestamp.date() >= start_date) and (end_date is None or timestamp.date() <= end_date):
+                snapshots.append((timestamp, source, os.path.join(directory, filename)))
+            break
+
+    snapshots.sort()
+    return snapshots
+
+
+def _load_chunk(paths: List[str]) -> List[Dict[str, List[Dict[str, Any]]]]:
+    """載入一組快照檔案（工作行程入口），無法解析的檔案以空字典代替"""
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        results.append({category: tweets for category, tweets in data.items() if isinstance(tweets, list)})
+    return results
+
+
+def load_snapshots(snapshots: List[Tuple[datetime, str, str]], workers: Optional[int] = None,
+                   chunk_size: int = 8) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    平行分塊載入快照並合併
+
+    快照依時間先後套用，同一類別中的同一 tweet_id 以最新快照的數據為準；
+    合併結果只保留推文參照，不複製也不重複串接 DataFrame
+
+    Args:
+        snapshots: find_snapshots 的輸出
+        workers: 工作行程數量，1 表示在目前行程內依序載入
+        chunk_size: 每個工作分塊的檔案數
+
+    Returns:
+        按類別分組的推文數據（與單一快照檔案格式相同）
+    """
+    paths = [path for _, _, path in snapshots]
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    workers = workers or min(len(chunks), os.cpu_count() or 1)
+
+    if workers <= 1 or len(chunks) <= 1:
+        loaded = [data for chunk in chunks for data in _load_chunk(chunk)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map 保持分塊順序，確保時間先後正確
+            loaded = [data for chunk_result in executor.map(_load_chunk, chunks) for data in chunk_result]
+
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for data in loaded:
+        for category, tweets in data.items():
+            for tweet in tweets:
+                if not isinstance(tweet, dict):
+                    continue
+                if 'category' not in tweet:
+                    tweet['category'] = category
+                # 同一推文被不同賽道收錄時各自保留
+                tweet_id = tweet.get('tweet_id')
+                key = (tweet['category'], str(tweet_id) if tweet_id is not None else tweet.get('text'))
+                latest[key] = tweet
+
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    for tweet in latest.values():
+        merged.setdefault(tweet['category'], []).append(tweet)
+    return merged
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+推文主題群集 - 雜湊 TF-IDF 向量 + 近似 k-means
+每個主題只保留一條高互動的代表推文，群集大小作為話題熱度訊號
+"""
+
+import zlib
+from typing import Dict, List, Any
+import numpy as np
+
+from near_duplicates import engagement_of
+from prompt_packer import clean_text, information_terms
+
+
+def hashed_tfidf(texts: List[str], dim: int = 4096) -> np.ndarray:
+    """
+    以雜湊技巧建立 TF-IDF 向量（不需要詞彙表），每列已做 L2 正規化
+
+    Args:
+        texts: 推文內容
+        dim: 向量維度
+
+    Returns:
+        (len(texts), dim) 的 float32 矩陣
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for term in information_terms(clean_text(text)):
+            index = zlib.crc32(term.encode('utf-8')) % dim
+            matrix[row, index] += 1
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    matrix *= idf.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def cluster_tweets(vectors: np.ndarray, order: List[int], threshold: float = 0.35,
+                   iterations: int = 2) -> np.ndarray:
+    """
+    近似 k-means：先依 order 順序做領導者分群決定 k 與初始中心，
+    再做幾輪「重新指派 → 更新中心」
+
+    Args:
+        vectors: 正規化後的推文向量
+        order: 建立初始中心的順序（互動分數高的推文優先成為中心）
+        threshold: 與中心的餘弦相似度低於此值時開新群集
+        iterations: k-means 迭代次數
+
+    Returns:
+        每條推文的群集編號
+    """
+    labels = np.full(len(vectors), -1, dtype=np.int64)
+    centroids = np.zeros_like(vectors)
+    k = 0
+    for position in order:
+        if k:
+            similarities = centroids[:k] @ vectors[position]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                labels[position] = best
+                continue
+        labels[position] = k
+        centroids[k] = vectors[position]
+        k += 1
+    centroids = centroids[:k]
+
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        occupied = norms[:, 0] > 0
+        centroids = sums[occupied] / norms[occupied]
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def cluster_representatives(tweets: List[Dict[str, Any]], threshold: float = 0.35,
+                            dim: int = 4096) -> List[Dict[str, Any]]:
+    """
+    將同主題的推文收斂為一條代表推文
+
+    每個群集保留互動分數最高的推文，cluster_size 為群集內推文（含已收斂的近似重複推文）的總數
+
+    Returns:
+        代表推文列表，依群集大小、互動分數由高到低排序
+    """
+    if len(tweets) <= 1:
+        return [dict(tweet, cluster_size=tweet.get('cluster_size', 1)) for tweet in tweets]
+
+    vectors = hashed_tfidf([tweet.get('text', '') for tweet in tweets], dim)
+    engagement = [engagement_of(tweet) for tweet in tweets]
+
+    # 沒有任何關鍵字的推文（例如只有表情或網址）無法比較，各自成為一個群集
+    clusters: Dict[Any, List[int]] = {}
+    with_terms = [index for index in range(len(tweets)) if vectors[index].any()]
+    for index in range(len(tweets)):
+        if not vectors[index].any():
+            clusters[('single', index)] = [index]
+
+    if with_terms:
+        order = sorted(range(len(with_terms)), key=lambda position: engagement[with_terms[position]], reverse=True)
+        labels = cluster_tweets(vectors[with_terms], order, threshold)
+        for position, label in enumerate(labels):
+            clusters.setdefault(int(label), []).append(with_terms[position])
+
+    representatives = []
+    for members in clusters.values():
+        best = max(members, key=lambda index: engagement[index])
+        size = sum(tweets[index].get('cluster_size', 1) for index in members)
+        representatives.append(dict(tweets[best], cluster_size=size))
+
+    representatives.sort(key=lambda tweet: (tweet['cluster_size'], engagement_of(tweet)), reverse=True)
+    return representatives
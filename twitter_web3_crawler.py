@@ -7,6 +7,13 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import logging
 
+# 導入近似重複推文偵測
+try:
+    from near_duplicates import collapse_near_duplicates
+    NEAR_DUPLICATES_AVAILABLE = True
+except ImportError:
+    NEAR_DUPLICATES_AVAILABLE = False
+
 class TwitterWeb3Crawler:
     def __init__(self, bearer_token: str):
         """
@@ -163,8 +170,17 @@ class TwitterWeb3Crawler:
         except Exception as e:
             self.logger.error(f"保存CSV文件時發生錯誤: {str(e)}")
 
-    def analyze_trending_topics(self, data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
-        """分析熱門主題和趨勢"""
+    def analyze_trending_topics(self, data: Dict[str, List[Dict[str, Any]]], collapse_duplicates: bool = True) -> Dict[str, Any]:
+        """
+        分析熱門主題和趨勢
+        
+        Args:
+            data: 按類別分組的推文數據
+            collapse_duplicates: 是否先收斂近似重複的洗版推文
+        """
+        if collapse_duplicates and NEAR_DUPLICATES_AVAILABLE:
+            data = collapse_near_duplicates(data)
+            
         analysis = {
             'category_stats': {},
             'top_tweets': {},
@@ -1,25 +1,122 @@
 #!/usr/bin/env python3
 import json
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
-from collections import Counter
-import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional
+from keyword_tokenizer import KeywordTokenizer
 import matplotlib
+
+# 導入標籤共現圖
+try:
+    from cooccurrence_graph import CooccurrenceGraph
+    COOCCURRENCE_GRAPH_AVAILABLE = True
+except ImportError:
+    COOCCURRENCE_GRAPH_AVAILABLE = False
+
+# 導入無頭圖表渲染
+try:
+    from chart_renderer import prepare_chart_payloads, draw_overview, render_overview, render_all
+    CHART_RENDERER_AVAILABLE = True
+except ImportError:
+    CHART_RENDERER_AVAILABLE = False
+
+# 導入多快照載入
+try:
+    from snapshot_loader import find_snapshots, load_snapshots, SNAPSHOT_SOURCES
+    SNAPSHOT_LOADER_AVAILABLE = True
+except ImportError:
+    SNAPSHOT_LOADER_AVAILABLE = False
+
+# 導入每日彙總表
+try:
+    from daily_rollups import DailyRollupStore
+    DAILY_ROLLUPS_AVAILABLE = True
+except ImportError:
+    DAILY_ROLLUPS_AVAILABLE = False
 matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
+# 推文欄位型別定義
+CATEGORY_COLUMNS = ['category', 'username']
+COUNT_COLUMNS = ['retweet_count', 'like_count', 'reply_count', 'quote_count', 'cluster_size']
+ID_COLUMNS = ['tweet_id', 'author_id']
+FLOAT_COLUMNS = ['engagement_score']
+BOOL_COLUMNS = ['verified']
+DATETIME_COLUMNS = ['created_at']
+
+def build_typed_column(name: str, values: List[Any]) -> pd.Series:
+    """依欄位名稱建立對應型別的欄位"""
+    if name in CATEGORY_COLUMNS:
+        return pd.Series(values, dtype='category')
+    if name in COUNT_COLUMNS:
+        return pd.to_numeric(pd.Series(values).fillna(0), downcast='unsigned')
+    if name in FLOAT_COLUMNS:
+        return pd.Series(values, dtype='float64').fillna(0).astype('float32')
+    if name in BOOL_COLUMNS:
+        return pd.Series(values).fillna(False).astype(bool)
+    if name in DATETIME_COLUMNS:
+        return pd.to_datetime(pd.Series(values), utc=True, errors='coerce', format='ISO8601')
+    if name in ID_COLUMNS:
+        # 全部為整數ID時使用 int64，測試資料的字串ID則保留原樣
+        series = pd.Series(values)
+        if series.dtype == object:
+            try:
+                converted = pd.to_numeric(series, errors='raise')
+                if converted.dtype.kind in 'iu':
+                    return converted.astype('int64')
+            except (ValueError, TypeError):
+                pass
+        return series
+    return pd.Series(values)
+
+def load_period_stats(days: int, rollup_db: str = 'daily_rollups.db', end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    從每日彙總表取得最近N天各類別統計（欄位同 generate_category_report，不含熱門推文）
+
+    只加總彙總列，不需載入快照；彙總表不存在時回傳空字典
+    """
+    if not DAILY_ROLLUPS_AVAILABLE or not os.path.exists(rollup_db):
+        return {}
+    store = DailyRollupStore(rollup_db)
+    try:
+        stats = store.period_stats(days, end)
+    finally:
+        store.close()
+    return {
+        category: {
+            'total_tweets': values['tweet_count'],
+            'avg_likes': values['avg_likes'],
+            'avg_retweets': values['avg_retweets'],
+            'avg_replies': values['avg_replies'],
+            'verified_ratio': values['verified_ratio'],
+            'engagement_score': values['engagement_score']
+        }
+        for category, values in stats.items()
+    }
+
 class Web3TweetAnalyzer:
-    def __init__(self, json_file: str):
+    def __init__(self, json_file: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                 sources: Optional[Iterable[str]] = None, workers: Optional[int] = None,
+                 rollup_db: str = 'daily_rollups.db'):
         """
         初始化Web3推文分析器
         
         Args:
-            json_file: 包含推文數據的JSON文件路徑
+            json_file: 包含推文數據的JSON文件路徑；未指定時依日期範圍載入多個快照
+            start: 起始日期 (YYYY-MM-DD，含)
+            end: 結束日期 (YYYY-MM-DD，含)
+            sources: 快照來源類型（見 snapshot_loader.SNAPSHOT_SOURCES），None 表示全部
+            workers: 平行載入的工作行程數量
+            rollup_db: 每日彙總表路徑（週/月統計使用）
         """
-        self.data = self.load_data(json_file)
+        self.rollup_db = rollup_db
+        if json_file:
+            self.data = self.load_data(json_file)
+        else:
+            self.data = self.load_date_range(start, end, sources, workers)
         self.df = self.create_dataframe()
         
     def load_data(self, json_file: str) -> Dict[str, List[Dict[str, Any]]]:
@@ -31,19 +128,68 @@ class Web3TweetAnalyzer:
             print(f"載入數據文件時發生錯誤: {str(e)}")
             return {}
     
+    def load_date_range(self, start: Optional[str] = None, end: Optional[str] = None,
+                        sources: Optional[Iterable[str]] = None, workers: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """依日期範圍與來源類型載入多個快照，按 tweet_id 去重並保留最新數據"""
+        if not SNAPSHOT_LOADER_AVAILABLE:
+            print("缺少 snapshot_loader 模組，無法依日期範圍載入快照")
+            return {}
+        try:
+            snapshots = find_snapshots(start, end, sources)
+            if not snapshots:
+                print("找不到符合條件的推文數據文件")
+                return {}
+            
+            data = load_snapshots(snapshots, workers=workers)
+            total_tweets = sum(len(tweets) for tweets in data.values())
+            print(f"已載入 {len(snapshots)} 個快照，去重後共 {total_tweets} 條推文")
+            return data
+        except Exception as e:
+            print(f"載入快照時發生錯誤: {str(e)}")
+            return {}
+    
     def create_dataframe(self) -> pd.DataFrame:
-        """將JSON數據轉換為pandas DataFrame"""
-        all_tweets = []
-        for category, tweets in self.data.items():
-            all_tweets.extend(tweets)
+        """
+        依欄位型別定義將JSON數據轉換為pandas DataFrame
         
-        if not all_tweets:
+        逐欄直接從原始數據建立，不經過中間的推文字典列表；
+        類別欄位使用 category、互動數使用最小的無號整數寬度、時間轉為 UTC 時區
+        """
+        tweet_count = sum(len(tweets) for tweets in self.data.values())
+        if not tweet_count:
             return pd.DataFrame()
-            
-        df = pd.DataFrame(all_tweets)
-        if 'created_at' in df.columns:
-            df['created_at'] = pd.to_datetime(df['created_at'])
-        return df
+        
+        def iter_tweets():
+            for category, tweets in self.data.items():
+                for tweet in tweets:
+                    yield category, tweet
+        
+        field_names = list(dict.fromkeys(key for _, tweet in iter_tweets() for key in tweet))
+        if 'category' not in field_names:
+            field_names.insert(0, 'category')
+        
+        columns = {}
+        for name in field_names:
+            if name == 'category':
+                values = [tweet.get('category', category) for category, tweet in iter_tweets()]
+            else:
+                values = [tweet.get(name) for _, tweet in iter_tweets()]
+            columns[name] = build_typed_column(name, values)
+        
+        return pd.DataFrame(columns, copy=False)
+    
+    def report_memory_usage(self) -> int:
+        """顯示DataFrame各欄位的記憶體用量，回傳總位元組數"""
+        if self.df.empty:
+            return 0
+        
+        usage = self.df.memory_usage(deep=True, index=True)
+        total = int(usage.sum())
+        print(f"DataFrame 記憶體用量: {total / 1024 / 1024:.2f} MB ({len(self.df)} 條推文)")
+        for column, size in usage.items():
+            dtype = self.df[column].dtype if column in self.df.columns else 'index'
+            print(f"  {column}: {size / 1024:.1f} KB ({dtype})")
+        return total
     
     def generate_category_report(self) -> Dict[str, Any]:
         """生成各類別詳細報告"""
@@ -66,91 +212,93 @@ class Web3TweetAnalyzer:
                     'url': category_df.loc[category_df['like_count'].idxmax(), 'url'] if not category_df.empty else ''
                 },
                 'verified_ratio': (category_df['verified'].sum() / len(category_df)) * 100,
-                'engagement_score': (category_df['like_count'] + category_df['retweet_count'] + category_df['reply_count']).mean()
+                # 互動數為窄整數型別，先加寬再相加避免溢位
+                'engagement_score': category_df[['like_count', 'retweet_count', 'reply_count']].astype('int64').sum(axis=1).mean()
             }
             
         return report
     
-    def find_trending_keywords(self, min_frequency: int = 3) -> Dict[str, List[tuple]]:
-        """找出各類別中的熱門關鍵字"""
+    def generate_period_report(self, days: int = 7, end: Optional[str] = None) -> Dict[str, Any]:
+        """從每日彙總表生成最近N天各類別報告（例如 days=7 為週報、days=30 為月報）"""
+        return load_period_stats(days, self.rollup_db, end)
+    
+    def find_trending_keywords(self, min_frequency: int = 3, top_n: int = 10,
+                               stop_words: Optional[Iterable[str]] = None) -> Dict[str, List[tuple]]:
+        """找出各類別中的熱門關鍵字（單次掃描整個語料）"""
         if self.df.empty:
             return {}
             
-        trending_keywords = {}
-        
-        for category in self.df['category'].unique():
-            category_df = self.df[self.df['category'] == category]
-            
-            # 合併所有推文文字
-            all_text = ' '.join(category_df['text'].fillna('').astype(str))
-            
-            # 提取關鍵字（去除常見詞彙、URL、用戶名等）
-            words = re.findall(r'#\w+|\$\w+|\b[A-Z]{2,}\b|\b\w{4,}\b', all_text.upper())
-            
-            # 過濾常見詞彙
-            stop_words = {'THE', 'AND', 'FOR', 'ARE', 'WITH', 'THIS', 'THAT', 'HAVE', 'FROM', 'THEY', 'BEEN', 'WILL', 'MORE', 'THAN', 'HTTPS', 'HTTP'}
-            filtered_words = [word for word in words if word not in stop_words]
-            
-            # 計算詞頻
-            word_counts = Counter(filtered_words)
-            trending_keywords[category] = [(word, count) for word, count in word_counts.most_common(10) if count >= min_frequency]
-            
-        return trending_keywords
+        tokenizer = KeywordTokenizer(stop_words=stop_words, min_frequency=min_frequency)
+        keyword_counts = tokenizer.count_tokens(self.df)
+        return tokenizer.top_keywords(keyword_counts, top_n=top_n, categories=self.df['category'].unique())
     
-    def create_visualizations(self, save_path: str = 'web3_analysis_plots.png'):
-        """創建數據視覺化圖表"""
+    def find_related_assets(self, min_count: int = 2) -> List[List[tuple]]:
+        """找出經常在同一推文中出現的 Cashtag/Hashtag 群集"""
+        if not COOCCURRENCE_GRAPH_AVAILABLE:
+            return []
+        graph = CooccurrenceGraph(retention_days=None)
+        graph.ingest_tweets(self.data)
+        return graph.related_clusters(min_count=min_count)
+    
+    def create_visualizations(self, save_path: str = 'web3_analysis_plots.png', dpi: int = 300,
+                              show: Optional[bool] = None, max_points: int = 5000):
+        """
+        創建數據視覺化圖表
+        
+        Args:
+            save_path: 圖片保存路徑
+            dpi: 圖片解析度
+            show: 是否顯示視窗，預設只在互動式後端時顯示（無頭環境不會阻塞）
+            max_points: 散佈圖超過此數量時改為分箱顯示
+        """
         if self.df.empty:
             print("沒有數據可視覺化")
             return
+        if not CHART_RENDERER_AVAILABLE:
+            print("缺少 chart_renderer 模組，無法產生圖表")
+            return
             
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Web3 Twitter 趨勢分析', fontsize=16, fontweight='bold')
-        
-        # 1. 各類別推文數量
-        category_counts = self.df['category'].value_counts()
-        axes[0, 0].bar(range(len(category_counts)), category_counts.values)
-        axes[0, 0].set_xticks(range(len(category_counts)))
-        axes[0, 0].set_xticklabels(category_counts.index, rotation=45, ha='right')
-        axes[0, 0].set_title('各類別推文數量')
-        axes[0, 0].set_ylabel('推文數')
-        
-        # 2. 互動度分布（讚數 vs 轉推數）
-        axes[0, 1].scatter(self.df['like_count'], self.df['retweet_count'], alpha=0.6, c=pd.Categorical(self.df['category']).codes)
-        axes[0, 1].set_xlabel('讚數')
-        axes[0, 1].set_ylabel('轉推數')
-        axes[0, 1].set_title('互動度分布')
-        axes[0, 1].set_xscale('log')
-        axes[0, 1].set_yscale('log')
-        
-        # 3. 各類別平均互動度
-        engagement_by_category = self.df.groupby('category').agg({
-            'like_count': 'mean',
-            'retweet_count': 'mean',
-            'reply_count': 'mean'
-        })
-        
-        x_pos = range(len(engagement_by_category))
-        width = 0.25
-        
-        axes[1, 0].bar([x - width for x in x_pos], engagement_by_category['like_count'], width, label='平均讚數', alpha=0.8)
-        axes[1, 0].bar(x_pos, engagement_by_category['retweet_count'], width, label='平均轉推數', alpha=0.8)
-        axes[1, 0].bar([x + width for x in x_pos], engagement_by_category['reply_count'], width, label='平均回復數', alpha=0.8)
-        
-        axes[1, 0].set_xticks(x_pos)
-        axes[1, 0].set_xticklabels(engagement_by_category.index, rotation=45, ha='right')
-        axes[1, 0].set_title('各類別平均互動度')
-        axes[1, 0].legend()
-        axes[1, 0].set_ylabel('互動次數')
-        
-        # 4. 認證用戶比例
-        verified_ratio = self.df.groupby('category')['verified'].mean() * 100
-        axes[1, 1].pie(verified_ratio.values, labels=verified_ratio.index, autopct='%1.1f%%', startangle=90)
-        axes[1, 1].set_title('各類別認證用戶比例')
-        
-        plt.tight_layout()
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.show()
+        payloads = prepare_chart_payloads(self.df, max_points=max_points)
+        
+        # 1. 各類別推文數量  2. 互動度分布  3. 各類別平均互動度  4. 認證用戶比例
+        # 保存一律使用 Agg 畫布，不論 pyplot 選了哪個後端
+        render_overview(payloads, save_path, dpi=dpi)
         print(f"圖表已保存到 {save_path}")
+        
+        if show is None:
+            show = matplotlib.get_backend().lower() not in ('agg', 'pdf', 'ps', 'svg', 'cairo', 'template')
+        if show:
+            fig = plt.figure(figsize=(15, 12), layout='tight')
+            draw_overview(fig, payloads)
+            plt.show()
+            plt.close(fig)
+    
+    def render_charts(self, output_dir: str = 'charts', dpi: int = 100, workers: Optional[int] = None,
+                      max_points: int = 5000) -> Dict[str, Dict[str, Any]]:
+        """
+        無頭模式平行渲染各張圖表（每張圖一個PNG）
+        
+        Args:
+            output_dir: 輸出目錄
+            dpi: 圖片解析度
+            workers: 工作行程數量，預設為圖表數量與CPU數量的較小值
+            max_points: 散佈圖超過此數量時改為分箱顯示
+            
+        Returns:
+            各圖表的檔案路徑與渲染秒數
+        """
+        if self.df.empty:
+            print("沒有數據可視覺化")
+            return {}
+        if not CHART_RENDERER_AVAILABLE:
+            print("缺少 chart_renderer 模組，無法產生圖表")
+            return {}
+            
+        payloads = prepare_chart_payloads(self.df, max_points=max_points)
+        results = render_all(payloads, output_dir=output_dir, dpi=dpi, workers=workers)
+        for kind, result in results.items():
+            print(f"圖表已保存到 {result['path']} ({result['seconds']:.2f}秒)")
+        return results
     
     def generate_summary_report(self, save_path: str = 'web3_summary_report.txt'):
         """生成綜合分析報告"""
@@ -180,6 +328,19 @@ class Web3TweetAnalyzer:
             report_lines.append(f"  推文連結: {stats['top_tweet']['url']}")
             report_lines.append("")
         
+        # 週/月統計（來自每日彙總表）
+        for title, days in [("最近7天", 7), ("最近30天", 30)]:
+            period_report = self.generate_period_report(days)
+            if not period_report:
+                continue
+            report_lines.append(f"【{title}】")
+            for category, stats in period_report.items():
+                report_lines.append(f"{category}: {stats['total_tweets']} 條推文，"
+                                    f"平均讚數 {stats['avg_likes']:.1f}，"
+                                    f"認證比例 {stats['verified_ratio']:.1f}%，"
+                                    f"互動度 {stats['engagement_score']:.1f}")
+            report_lines.append("")
+        
         # 熱門關鍵字
         trending_keywords = self.find_trending_keywords()
         report_lines.append("【熱門關鍵字】")
@@ -188,12 +349,20 @@ class Web3TweetAnalyzer:
                 report_lines.append(f"{category}: {', '.join([f'{word}({count})' for word, count in keywords[:5]])}")
         report_lines.append("")
         
+        # 聯動資產
+        related_clusters = self.find_related_assets()
+        if related_clusters:
+            report_lines.append("【聯動資產】")
+            for cluster in related_clusters[:5]:
+                report_lines.append(f"• {', '.join([f'{tag}({count})' for tag, count in cluster[:6]])}")
+            report_lines.append("")
+        
         # 整體趨勢洞察
         report_lines.append("【趋勢洞察】")
         most_active_category = self.df['category'].value_counts().index[0]
         report_lines.append(f"• 最活躍賽道: {most_active_category}")
         
-        highest_engagement_category = self.df.groupby('category')['like_count'].mean().idxmax()
+        highest_engagement_category = self.df.groupby('category', observed=True)['like_count'].mean().idxmax()
         report_lines.append(f"• 最高互動賽道: {highest_engagement_category}")
         
         # 保存報告
@@ -204,21 +373,49 @@ class Web3TweetAnalyzer:
         print(f"\n完整報告已保存到 {save_path}")
 
 def main():
-    # 分析最新的推文數據文件
-    import glob
-    import os
-    
-    # 尋找最新的JSON數據文件
-    json_files = glob.glob("web3_tweets_*.json")
-    if not json_files:
-        print("找不到推文數據文件，請先執行 twitter_web3_crawler.py")
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Web3推文趨勢分析')
+    parser.add_argument('--start', help='起始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', help='結束日期 (YYYY-MM-DD)')
+    parser.add_argument('--sources', nargs='+', choices=list(SNAPSHOT_SOURCES) if SNAPSHOT_LOADER_AVAILABLE else None,
+                        help='快照來源類型，預設全部')
+    parser.add_argument('--days', type=int, help='只從每日彙總表輸出截至 --end 的最近N天各類別統計（不載入快照）')
+    args = parser.parse_args()
+    
+    if args.days:
+        period_report = load_period_stats(args.days, end=args.end)
+        if not period_report:
+            print("尚無彙總數據，請先執行 rotational_crawler.py")
+            return
+        print(f"最近 {args.days} 天各類別統計（截至 {args.end or '今天'}）")
+        for category, stats in period_report.items():
+            print(f"【{category}】 推文數量 {stats['total_tweets']}，平均讚數 {stats['avg_likes']:.1f}，"
+                  f"平均轉推數 {stats['avg_retweets']:.1f}，認證用戶比例 {stats['verified_ratio']:.1f}%，"
+                  f"互動度評分 {stats['engagement_score']:.1f}")
         return
     
-    latest_file = max(json_files, key=os.path.getctime)
-    print(f"分析數據文件: {latest_file}")
+    if args.start or args.end:
+        # 分析日期範圍內的所有快照
+        print(f"分析日期範圍: {args.start or '最早'} ~ {args.end or '最新'}")
+        analyzer = Web3TweetAnalyzer(start=args.start, end=args.end, sources=args.sources)
+    else:
+        # 分析最新的推文數據文件（涵蓋所有爬蟲的輸出；缺少 snapshot_loader 時只找 web3_tweets_*.json）
+        if SNAPSHOT_LOADER_AVAILABLE:
+            snapshots = find_snapshots(sources=args.sources)
+            latest_file = snapshots[-1][2] if snapshots else None
+        else:
+            import glob
+            json_files = glob.glob("web3_tweets_*.json")
+            latest_file = max(json_files, key=os.path.getctime) if json_files else None
+        if not latest_file:
+            print("找不到推文數據文件，請先執行 twitter_web3_crawler.py 或 rotational_crawler.py")
+            return
+        
+        print(f"分析數據文件: {latest_file}")
+        analyzer = Web3TweetAnalyzer(latest_file)
     
-    # 創建分析器
-    analyzer = Web3TweetAnalyzer(latest_file)
+    analyzer.report_memory_usage()
     
     # 生成分析報告
     analyzer.generate_summary_report()